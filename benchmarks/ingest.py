@@ -0,0 +1,130 @@
+"""Time and peak memory of `wals3.scripts.initializedb.main` for growing ValueTables.
+
+The CLDF tables shipped in `cldf/` are copied to a temporary directory and a synthetic
+`values.csv` with the requested number of rows is added. Each size is loaded into a
+fresh SQLite database in a separate process, so peak RSS is measured per run:
+
+    python benchmarks/ingest.py 10000 100000 1000000
+
+With ``--orm REV`` the same tables are also loaded by the ORM-based initializedb of the
+given revision, e.g. the one before the bulk loader was introduced (SQLite, one process):
+
+    $ python benchmarks/ingest.py --orm 5db367a 10000 100000
+    values  seconds  peak RSS (MB)  ORM seconds  ORM peak RSS (MB)
+    10000   7.4      135            9.9          151
+    100000  20.2     135            46.5         595
+"""
+import sys
+import csv
+import time
+import random
+import shutil
+import logging
+import pathlib
+import argparse
+import resource
+import tempfile
+import subprocess
+
+REPOS = pathlib.Path(__file__).resolve().parent.parent
+
+
+def make_cldf(d, nvalues, seed=1):
+    """Copy the repos' CLDF metadata and tables to `d`, adding `nvalues` random values."""
+    for p in REPOS.joinpath('cldf').iterdir():
+        if p.is_file():
+            shutil.copy(str(p), str(d / p.name))
+    random.seed(seed)
+    with d.joinpath('languages.csv').open(encoding='utf8') as f:
+        languages = [r['Glottocode'] for r in csv.DictReader(f)]
+    with d.joinpath('codes.csv').open(encoding='utf8') as f:
+        codes = [(r['ParameterID'], r['CodeID']) for r in csv.DictReader(f)]
+    sources = [
+        line.split('{')[1].split(',')[0].strip()
+        for line in d.joinpath('sources.bib').open(encoding='utf8') if line.startswith('@')]
+    languages = random.sample(languages, min(len(languages), max(nvalues // 50, 1)))
+    with d.joinpath('values.csv').open('w', encoding='utf8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            ['ID', 'LanguageID', 'ParameterID', 'Value', 'CodeID', 'Remark', 'Source', 'Coder'])
+        for i in range(nvalues):
+            pid, cid = random.choice(codes)
+            writer.writerow([
+                'v{0}'.format(i),
+                random.choice(languages),
+                pid,
+                cid.split('_')[0],
+                cid,
+                '',
+                '{0}[{1}]'.format(random.choice(sources), random.randint(1, 300)),
+                'DI'])
+
+
+def load(cldf_dir, db, tree=None):
+    """Run initializedb.main in this process and print elapsed seconds and peak RSS.
+
+    If `tree` is given, the wals3 package of this exported tree is loaded instead; its
+    `main` reads the CLDF dataset from `tree/cldf`.
+    """
+    if tree:
+        sys.path.insert(0, tree)
+    import transaction
+    import pycldf
+    import sqlalchemy as sa
+    from clld.db.meta import Base, DBSession
+    from wals3.scripts import initializedb
+
+    engine = sa.create_engine('sqlite:///{0}'.format(db))
+    Base.metadata.create_all(engine)
+    DBSession.configure(bind=engine)
+    args = argparse.Namespace(
+        cldf=pycldf.Dataset.from_metadata(cldf_dir / 'StructureDataset-metadata.json'),
+        log=logging.getLogger(__name__),
+        settings={})
+    start = time.time()
+    with transaction.manager:
+        initializedb.main(args)
+    # ru_maxrss is reported in KB on Linux.
+    print('{0:.1f}\t{1:.0f}'.format(
+        time.time() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+def run(cldf_dir, db, tree=None):
+    out = subprocess.check_output(
+        [sys.executable, __file__, '--load', str(cldf_dir), str(db)] + ([tree] if tree else []),
+        stderr=subprocess.DEVNULL)
+    return out.decode('utf8').strip().split('\n')[-1]
+
+
+def main(sizes, orm=None):
+    print('values\tseconds\tpeak RSS (MB)' + ('\tORM seconds\tORM peak RSS (MB)' if orm else ''))
+    with tempfile.TemporaryDirectory() as old:
+        if orm:
+            # The ORM loader only runs against the models of its own revision.
+            archive = subprocess.check_output(['git', 'archive', orm], cwd=str(REPOS))
+            subprocess.run(['tar', '-x', '-C', old], input=archive, check=True)
+        for size in sizes:
+            with tempfile.TemporaryDirectory() as tmp:
+                tmp = pathlib.Path(tmp)
+                make_cldf(tmp, size)
+                res = [str(size), run(tmp, tmp / 'db.sqlite')]
+                if orm:
+                    cldf = pathlib.Path(old) / 'cldf'
+                    shutil.rmtree(str(cldf))
+                    shutil.copytree(str(tmp), str(cldf), ignore=shutil.ignore_patterns('db.*'))
+                    res.append(run(cldf, tmp / 'orm.sqlite', old))
+                print('\t'.join(res))
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--load']:
+        load(pathlib.Path(sys.argv[2]), sys.argv[3], *sys.argv[4:])
+    else:
+        parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+        parser.add_argument('sizes', nargs='*', type=int, default=[10000, 100000, 1000000])
+        parser.add_argument(
+            '--orm', metavar='REV',
+            help='also time the ORM-based initializedb of git revision REV, e.g. the parent '
+                 'of the commit introducing the bulk loader')
+        args = parser.parse_args()
+        main(args.sizes, args.orm)
@@ -0,0 +1,94 @@
+"""Response time of the `Units` datatable for a database loaded from synthetic CLDF data.
+
+A database with the requested number of values is built as in `ingest.py`, then typical
+datatable requests - first page, a deep sorted page and a filtered page - are timed.
+Deep pages are timed with keyset pagination and with plain OFFSET: a single page requested
+cold, i.e. with no page boundaries known, and paging through 5 pages sequentially, as a
+user clicking "next" does, starting cold. Totals and filtered counts are served from the
+count cache after the first request.
+
+A cold keyset page looks up the key of its first row by offset, reading only the sort key
+columns, and reads its rows from there. On SQLite, with 100000 values, seconds per page:
+
+    $ python benchmarks/units_datatable.py 100000
+    request                                     seconds
+    first page                                  0.019
+    sorted, offset 50000, OFFSET                0.079
+    sorted, offset 50000, keyset                0.051
+    offset 99000, OFFSET                        0.071
+    offset 99000, keyset                        0.043
+    sorted, 5 pages from offset 99000, OFFSET   0.108
+    sorted, 5 pages from offset 99000, keyset   0.028
+"""
+import sys
+import time
+import pathlib
+import tempfile
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent))
+import ingest  # noqa: E402
+
+REQUESTS = [
+    ('first page', dict(iDisplayStart='0')),
+    ('sorted, offset 50000', dict(
+        iDisplayStart='50000', iSortingCols='1', iSortCol_0='1', sSortDir_0='asc')),
+    ('filtered', dict(iDisplayStart='0', sSearch_1='12')),
+]
+SORTED = dict(iSortingCols='1', iSortCol_0='1', sSortDir_0='asc')
+DEEP_PAGES = [
+    ('sorted, offset 50000', SORTED, 50000, 1),
+    ('offset 99000', {}, 99000, 1),
+    ('sorted, 5 pages from offset 50000', SORTED, 50000, 5),
+    ('sorted, 5 pages from offset 99000', SORTED, 99000, 5),
+]
+
+
+def rows(params, keyset=True):
+    """Run the queries of one datatable XHR request and format the rows."""
+    from pyramid import testing
+    from ooa.datatables import KeysetPagination
+    from wals3.datatables import Units
+    from wals3.models import OOAUnit
+
+    params = dict(params, sEcho='1', iDisplayLength='100')
+    req = testing.DummyRequest(params=params)
+    req.translate = lambda s: s
+    req.resource_url = lambda obj, **kw: '/units/{0}'.format(obj.id)
+    dt = Units(req, OOAUnit)
+    query = dt.get_query() if keyset else super(KeysetPagination, dt).get_query()
+    return [[col.format(item) for col in dt.cols] for item in query]
+
+
+def main(nvalues, repeat=5):
+    import sqlalchemy as sa
+    from pyramid import testing
+    from clld.db.meta import DBSession
+    from ooa.datatables import count_cache_stats, BOUNDARIES
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = pathlib.Path(tmp)
+        ingest.make_cldf(tmp, nvalues)
+        ingest.load(tmp, str(tmp / 'db.sqlite'))
+        DBSession.configure(bind=sa.create_engine('sqlite:///{0}'.format(tmp / 'db.sqlite')))
+        testing.setUp()
+        print('request\tseconds')
+        for name, params in REQUESTS:
+            rows(params)
+            start = time.time()
+            for _ in range(repeat):
+                rows(params)
+            print('{0}\t{1:.3f}'.format(name, (time.time() - start) / repeat))
+        for name, params, offset, pages in DEEP_PAGES:
+            for keyset in [False, True]:
+                # No page boundaries are known, as after a restart or in another process.
+                BOUNDARIES.clear()
+                start = time.time()
+                for page in range(pages):
+                    rows(dict(params, iDisplayStart=str(offset + page * 100)), keyset=keyset)
+                print('{0}, {1}\t{2:.3f}'.format(
+                    name, 'keyset' if keyset else 'OFFSET', (time.time() - start) / pages))
+        print('count cache: {0}'.format(count_cache_stats()))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,47 @@
+"""OOA codes and the columns for the counts computed in prime_cache
+
+Revision ID: 1d7a5c3e9f42
+Revises:
+Create Date: 2026-10-18 15:50:00.000000
+
+Codes used to be loaded as plain domain elements; existing ones become OOA codes. The counts
+are empty until prime_cache runs.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '1d7a5c3e9f42'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+COLUMNS = [
+    ('ooalanguage', 'representation'),
+    ('ooaparameter', 'representation'),
+    ('ooafeatureset', 'count_parameters'),
+    ('ooafeatureset', 'representation'),
+]
+
+
+def upgrade():
+    # The primary key is turned into an integer by the next but one revision, like those
+    # of the other OOA tables.
+    op.create_table(
+        'ooacode',
+        sa.Column(
+            'pk', sa.Unicode, sa.ForeignKey('domainelement.pk'), primary_key=True),
+        sa.Column('representation', sa.Integer))
+    op.execute('INSERT INTO ooacode (pk) SELECT pk FROM domainelement')
+    op.execute("UPDATE domainelement SET polymorphic_type = 'custom'")
+    for table, col in COLUMNS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column(col, sa.Integer))
+
+
+def downgrade():
+    for table, col in reversed(COLUMNS):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column(col)
+    op.execute("UPDATE domainelement SET polymorphic_type = 'base'")
+    op.drop_table('ooacode')
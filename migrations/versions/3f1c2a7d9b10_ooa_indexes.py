@@ -0,0 +1,35 @@
+"""Indexes for OOA foreign keys and lookup columns
+
+Revision ID: 3f1c2a7d9b10
+Revises: 1d7a5c3e9f42
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a7d9b10'
+down_revision = '1d7a5c3e9f42'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_ooaunit_parameter_id_code_id', 'ooaunit', ['parameter_id', 'code_id']),
+    ('ix_ooaunit_language_id_parameter_id', 'ooaunit', ['language_id', 'parameter_id']),
+    ('ix_ooaunit_code_id', 'ooaunit', ['code_id']),
+    ('ix_ooaunit_source', 'ooaunit', ['source']),
+    ('ix_ooalanguage_glottocode', 'ooalanguage', ['glottocode']),
+    ('ix_ooalanguage_macroarea', 'ooalanguage', ['macroarea']),
+    ('ix_ooalanguage_family_id', 'ooalanguage', ['family_id']),
+    ('ix_ooaparameter_feature_set', 'ooaparameter', ['feature_set']),
+]
+
+
+def upgrade():
+    for name, table, cols in INDEXES:
+        op.create_index(name, table, cols)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
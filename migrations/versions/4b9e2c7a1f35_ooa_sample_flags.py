@@ -0,0 +1,59 @@
+"""Boolean sample columns and sample bitmask for OOA languages
+
+Revision ID: 4b9e2c7a1f35
+Revises: e5b1d83c0f27
+Create Date: 2026-10-18 21:00:00.000000
+
+The loader used to write the column name instead of the value into `north_america`, so
+after the upgrade no language is in this sample until the data is reloaded.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '4b9e2c7a1f35'
+down_revision = 'e5b1d83c0f27'
+branch_labels = None
+depends_on = None
+
+# The samples and their bits at this revision, copied from `ooa.samples`, so that later
+# changes to the app do not change what the migration does.
+SAMPLES = ['balanced', 'isolates', 'american', 'world', 'north_america', 'noun']
+BITS = {
+    'balanced': 1,
+    'isolates': 2,
+    'american': 4,
+    'world': 8,
+    'north_america': 16,
+    'noun': 32,
+}
+
+
+def upgrade():
+    for name in SAMPLES:
+        op.execute(
+            "UPDATE ooalanguage SET {0} = CASE WHEN lower({0}) IN ('1', 'true') "
+            "THEN '1' ELSE '0' END".format(name))
+    # SQLite cannot alter column types, so the table is recreated in batch mode.
+    with op.batch_alter_table('ooalanguage') as batch_op:
+        for name in SAMPLES:
+            batch_op.alter_column(
+                name,
+                existing_type=sa.Unicode,
+                type_=sa.Boolean,
+                postgresql_using='{0}::boolean'.format(name))
+        batch_op.add_column(
+            sa.Column('samples', sa.Integer, nullable=False, server_default='0'))
+    op.execute('UPDATE ooalanguage SET samples = {0}'.format(' + '.join(
+        'CASE WHEN {0} THEN {1} ELSE 0 END'.format(name, BITS[name]) for name in SAMPLES)))
+
+
+def downgrade():
+    with op.batch_alter_table('ooalanguage') as batch_op:
+        batch_op.drop_column('samples')
+        for name in SAMPLES:
+            batch_op.alter_column(
+                name,
+                existing_type=sa.Boolean,
+                type_=sa.Unicode,
+                postgresql_using="CASE WHEN {0} THEN '1' END".format(name))
@@ -0,0 +1,44 @@
+"""Integer primary keys for the OOA tables
+
+Revision ID: 8a4e5b0c2d71
+Revises: 3f1c2a7d9b10
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '8a4e5b0c2d71'
+down_revision = '3f1c2a7d9b10'
+branch_labels = None
+depends_on = None
+
+COLUMNS = [
+    ('ooalanguage', 'pk'),
+    ('ooaparameter', 'pk'),
+    ('ooacode', 'pk'),
+    ('ooafeatureset', 'pk'),
+    ('ooaunit', 'pk'),
+    ('ooaunit', 'parameter_id'),
+]
+
+
+def _alter(from_, to):
+    for table, col in COLUMNS:
+        # SQLite cannot alter column types, so the tables are recreated in batch mode.
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(
+                col,
+                existing_type=from_,
+                type_=to,
+                postgresql_using='{0}::{1}'.format(
+                    col, 'integer' if to is sa.Integer else 'varchar'))
+
+
+def upgrade():
+    _alter(sa.Unicode, sa.Integer)
+
+
+def downgrade():
+    _alter(sa.Integer, sa.Unicode)
@@ -0,0 +1,22 @@
+"""Index for paging the units datatable by parameter
+
+Revision ID: 9c3f6e1b2a84
+Revises: 4b9e2c7a1f35
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '9c3f6e1b2a84'
+down_revision = '4b9e2c7a1f35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_ooaunit_parameter_id_pk', 'ooaunit', ['parameter_id', 'pk'])
+
+
+def downgrade():
+    op.drop_index('ix_ooaunit_parameter_id_pk', table_name='ooaunit')
@@ -0,0 +1,44 @@
+"""Unit-source association table replacing OOAUnit.source
+
+Revision ID: c27d9e4f6a18
+Revises: 8a4e5b0c2d71
+Create Date: 2026-10-18 18:00:00.000000
+
+The links are not derived from the dropped column; run the update command afterwards to
+load them from the CLDF data.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c27d9e4f6a18'
+down_revision = '8a4e5b0c2d71'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'ooaunitreference',
+        sa.Column('pk', sa.Integer, primary_key=True),
+        sa.Column('created', sa.DateTime(timezone=True)),
+        sa.Column('updated', sa.DateTime(timezone=True)),
+        sa.Column('active', sa.Boolean),
+        sa.Column('jsondata', sa.Unicode),
+        sa.Column('key', sa.Unicode),
+        sa.Column('description', sa.Unicode),
+        sa.Column('source_pk', sa.Integer, sa.ForeignKey('source.pk')),
+        sa.Column('unit_pk', sa.Integer, sa.ForeignKey('unit.pk'), nullable=False))
+    op.create_index('ix_ooaunitreference_unit_pk', 'ooaunitreference', ['unit_pk'])
+    op.create_index(
+        'ix_ooaunitreference_source_pk_unit_pk', 'ooaunitreference', ['source_pk', 'unit_pk'])
+    op.drop_index('ix_ooaunit_source', table_name='ooaunit')
+    with op.batch_alter_table('ooaunit') as batch_op:
+        batch_op.drop_column('source')
+
+
+def downgrade():
+    with op.batch_alter_table('ooaunit') as batch_op:
+        batch_op.add_column(sa.Column('source', sa.Unicode))
+    op.create_index('ix_ooaunit_source', 'ooaunit', ['source'])
+    op.drop_table('ooaunitreference')
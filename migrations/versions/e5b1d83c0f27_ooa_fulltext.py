@@ -0,0 +1,55 @@
+"""Full-text index over features, codes, values and languages
+
+Revision ID: e5b1d83c0f27
+Revises: c27d9e4f6a18
+Create Date: 2026-10-18 19:00:00.000000
+
+The index is filled from the current data; the loader rebuilds it on every load.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'e5b1d83c0f27'
+down_revision = 'c27d9e4f6a18'
+branch_labels = None
+depends_on = None
+
+# The index at this revision, copied from `ooa.fulltext`, so that later changes to the app
+# do not change what the migration does.
+CREATE = {
+    'postgresql':
+        'CREATE TABLE fulltext (kind VARCHAR NOT NULL, pk INTEGER NOT NULL, text TEXT, '
+        'tsv TSVECTOR)',
+    'sqlite':
+        "CREATE VIRTUAL TABLE fulltext USING fts5("
+        "kind UNINDEXED, pk UNINDEXED, text, tokenize='unicode61 remove_diacritics 2')",
+}
+#: Kind of object and query for the pk and the text of the objects of this kind.
+KINDS = [
+    ('parameter', 'SELECT pk, question FROM ooaparameter WHERE question IS NOT NULL'),
+    ('code',
+     'SELECT d.pk, d.description FROM ooacode AS c JOIN domainelement AS d ON d.pk = c.pk '
+     'WHERE d.description IS NOT NULL'),
+    ('unit', 'SELECT pk, remark FROM ooaunit WHERE remark IS NOT NULL'),
+    ('language',
+     'SELECT l.pk, l.name FROM ooalanguage AS o JOIN language AS l ON l.pk = o.pk '
+     'WHERE l.name IS NOT NULL'),
+]
+
+
+def upgrade():
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    op.execute('DROP TABLE IF EXISTS fulltext')
+    op.execute(CREATE['postgresql' if postgresql else 'sqlite'])
+    for kind, query in KINDS:
+        op.execute(
+            "INSERT INTO fulltext (kind, pk, text) SELECT '{0}', q.* FROM ({1}) AS q".format(
+                kind, query))
+    if postgresql:
+        op.execute("UPDATE fulltext SET tsv = to_tsvector('simple', text)")
+        op.execute('CREATE INDEX fulltext_tsv ON fulltext USING gin(tsv)')
+        op.execute('CREATE INDEX fulltext_kind_pk ON fulltext (kind, pk)')
+
+
+def downgrade():
+    op.execute('DROP TABLE IF EXISTS fulltext')
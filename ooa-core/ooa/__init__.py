@@ -0,0 +1,5 @@
+"""The OOA data model and the code working on it, shared by the wals3 and ooaclld apps.
+
+The modules here must not import either app: ooaclld uses the glottolog family plugin,
+whose ``family`` table clashes with the one of `wals3.models`.
+"""
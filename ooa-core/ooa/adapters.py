@@ -0,0 +1,150 @@
+"""The language x parameter matrix of the OOA values, a download of both apps."""
+import csv
+import gzip
+import json
+import hashlib
+import pathlib
+import contextlib
+import collections
+from itertools import groupby, islice
+
+from clld.web.adapters.download import Download, download_dir
+from clld.db.meta import DBSession
+from clld.util import safe_overwrite
+
+from ooa.models import OOALanguage, OOAParameter, OOAUnit
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+__all__ = ['Matrix']
+
+
+def _sha256(p):
+    h = hashlib.sha256()
+    with p.open('rb') as f:
+        for block in iter(lambda: f.read(2 ** 16), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class Matrix(Download):
+
+    """Language x parameter matrix of the OOA values.
+
+    One row per language with values: the language metadata in `md_fields`, followed by
+    the value for each parameter. `create` - run by `prime_cache` - streams a single query,
+    ordered by language, into a CSV file, a gzipped copy and, if pyarrow is installed, a
+    Parquet file. Rows are written in chunks, so memory use does not grow with the number
+    of languages. The files are served by the `matrix` view, with the SHA-256 digests
+    recorded in a JSON manifest as ETags.
+    """
+
+    ext = 'csv'
+    md_fields = [
+        ('glottocode', OOALanguage.glottocode),
+        ('name', OOALanguage.name),
+        ('latitude', OOALanguage.latitude),
+        ('longitude', OOALanguage.longitude),
+        ('macroarea', OOALanguage.macroarea),
+        ('family', OOALanguage.family_name),
+    ]
+    #: Media types of the matrix files by extension.
+    formats = collections.OrderedDict([
+        ('csv', 'text/csv'),
+        ('csv.gz', 'application/gzip'),
+        ('parquet', 'application/vnd.apache.parquet'),
+    ])
+
+    def __init__(self, model, pkg, directory=None, chunksize=1000, **kw):
+        super(Matrix, self).__init__(model, pkg, **kw)
+        self.directory = directory
+        self.chunksize = chunksize
+
+    def abspath(self, req):
+        return pathlib.Path(self.directory or download_dir(self.pkg)) / 'ooa-matrix.csv'
+
+    def files(self, req):
+        """Paths of the matrix files by extension, and of the manifest."""
+        p = self.abspath(req)
+        return collections.OrderedDict([
+            ('csv', p),
+            ('csv.gz', p.parent / (p.name + '.gz')),
+            ('parquet', p.with_suffix('.parquet')),
+            ('json', p.with_suffix('.json')),
+        ])
+
+    def url(self, req):
+        return req.route_url('matrix', ext=self.ext)
+
+    def manifest(self, req):
+        """Size and SHA-256 digest of the matrix files by extension."""
+        p = self.files(req)['json']
+        if p.exists():
+            return json.loads(p.read_text(encoding='utf8'))
+        return {}
+
+    def parameters(self):
+        return DBSession.query(OOAParameter.pk, OOAParameter.id).order_by(OOAParameter.pk).all()
+
+    def query(self, req):
+        # The ordering is served by the index on (language_id, parameter_id).
+        return DBSession.query(
+            OOAUnit.language_pk,
+            *[col for _, col in self.md_fields] + [OOAUnit.parameter_id, OOAUnit.value])\
+            .join(OOALanguage, OOALanguage.pk == OOAUnit.language_pk)\
+            .order_by(OOAUnit.language_id, OOAUnit.parameter_id)
+
+    def rows(self, req, parameters):
+        index = {pk: i for i, (pk, _) in enumerate(parameters)}
+        query = self.query(req).yield_per(self.chunksize)
+        for _, units in groupby(query, key=lambda r: r[0]):
+            values = [None] * len(parameters)
+            for unit in units:
+                i = index[unit.parameter_id]
+                values[i] = unit.value if values[i] is None else \
+                    '{0}; {1}'.format(values[i], unit.value)
+            md = [None if v is None else str(v) for v in unit[1:len(self.md_fields) + 1]]
+            yield md + values
+
+    def create(self, req, filename=None, verbose=True, outfile=None):
+        files = self.files(req)
+        parameters = self.parameters()
+        header = [name for name, _ in self.md_fields] + [pid for _, pid in parameters]
+        with contextlib.ExitStack() as stack:
+            tmp = {
+                ext: stack.enter_context(safe_overwrite(files[ext]))
+                for ext in self.formats if ext != 'parquet' or pyarrow}
+            writers = [
+                csv.writer(stack.enter_context(tmp['csv'].open('w', encoding='utf8', newline=''))),
+                csv.writer(stack.enter_context(
+                    gzip.open(str(tmp['csv.gz']), 'wt', encoding='utf8', newline=''))),
+            ]
+            parquet = None
+            if pyarrow:
+                schema = pyarrow.schema([(name, pyarrow.string()) for name in header])
+                parquet = stack.enter_context(pyarrow.parquet.ParquetWriter(
+                    str(tmp['parquet']), schema, compression='zstd'))
+            for writer in writers:
+                writer.writerow(header)
+            rows = self.rows(req, parameters)
+            while True:
+                chunk = list(islice(rows, self.chunksize))
+                if not chunk:
+                    break
+                for writer in writers:
+                    writer.writerows(chunk)
+                if parquet:
+                    parquet.write_table(pyarrow.Table.from_arrays(
+                        [pyarrow.array(col, pyarrow.string()) for col in zip(*chunk)],
+                        schema=schema))
+
+        manifest = {
+            ext: {'size': files[ext].stat().st_size, 'sha256': _sha256(files[ext])}
+            for ext in self.formats if files[ext].exists()}
+        with safe_overwrite(files['json']) as tmp:
+            tmp.write_text(json.dumps(manifest, indent=2), encoding='utf8')
+        return manifest
@@ -0,0 +1,197 @@
+"""Combinations of the codes of 2 or 3 parameters, computed from a bitmap index.
+
+For each parameter the index holds a boolean matrix with one row per language and one
+column per code of the parameter - `True` if the language has a unit with this code. All
+matrices share the same rows, so the languages with a combination of codes are the rows
+where the columns of the codes are all `True`, and the contingency table of two or three
+parameters is a single matrix product.
+
+Matrices are computed from the units of a parameter on first use and kept in an LRU cache
+keyed by parameter and data version, just like the rows - i.e. the languages.
+"""
+import threading
+import collections
+
+import numpy
+
+from clld.db.meta import DBSession
+
+from ooa.models import OOALanguage, OOAParameter, OOAUnit, OOACode
+from ooa.util import data_version, normalized_icon, pie_url
+
+__all__ = ['Combination', 'combination']
+
+#: Decimal places of coordinates, i.e. a precision of about 100m.
+PRECISION = 3
+#: Matrices per (parameter pk, data version), least recently used first.
+MATRICES = collections.OrderedDict()
+MAX_MATRICES = 500
+LANGUAGES = {}
+_lock = threading.Lock()
+
+#: The icon specs are those of the codes, see `ooa.util.with_icons`.
+CodeMatrix = collections.namedtuple('CodeMatrix', 'codes matrix icons')
+
+
+class Languages(object):
+
+    """The rows of the code matrices."""
+
+    def __init__(self, rows):
+        self.pks, self.ids, self.names, self.coordinates = [], [], [], []
+        for pk, id_, name, latitude, longitude in rows:
+            self.pks.append(pk)
+            self.ids.append(id_)
+            self.names.append(name)
+            self.coordinates.append(
+                None if latitude is None or longitude is None else
+                [round(longitude, PRECISION), round(latitude, PRECISION)])
+        self.index = {pk: i for i, pk in enumerate(self.pks)}
+
+    def __len__(self):
+        return len(self.pks)
+
+
+def languages(version):
+    with _lock:
+        if version and version in LANGUAGES:
+            return LANGUAGES[version]
+    res = Languages(DBSession.query(
+        OOALanguage.pk, OOALanguage.id, OOALanguage.name, OOALanguage.latitude,
+        OOALanguage.longitude).order_by(OOALanguage.pk))
+    if version:
+        with _lock:
+            LANGUAGES.clear()
+            LANGUAGES[version] = res
+    return res
+
+
+def code_matrix(parameter, version):
+    """The `CodeMatrix` of a parameter, from the cache if possible."""
+    key = (parameter.pk, version)
+    with _lock:
+        if key in MATRICES:
+            MATRICES.move_to_end(key)
+            return MATRICES[key]
+
+    rows = languages(version)
+    # The query is served by the index on (parameter_id, code_id).
+    units = DBSession.query(OOAUnit.language_pk, OOAUnit.code_id)\
+        .filter(OOAUnit.parameter_id == parameter.pk)\
+        .filter(OOAUnit.code_id.isnot(None))\
+        .filter(OOAUnit.code_id != '')\
+        .order_by(OOAUnit.code_id)\
+        .all()
+    codes = sorted(set(code for _, code in units))
+    icons = {
+        code.id: normalized_icon(code.jsondata.get('icon', 'c000000')) for code in
+        DBSession.query(OOACode).filter(OOACode.parameter_pk == parameter.pk)}
+    columns = {code: i for i, code in enumerate(codes)}
+    matrix = numpy.zeros((len(rows), len(codes)), dtype=bool)
+    for language_pk, code in units:
+        matrix[rows.index[language_pk], columns[code]] = True
+    res = CodeMatrix(codes, matrix, [icons.get(code, 'c000000') for code in codes])
+    if version:
+        with _lock:
+            MATRICES[key] = res
+            while len(MATRICES) > MAX_MATRICES:
+                MATRICES.popitem(last=False)
+    return res
+
+
+class Combination(object):
+
+    """The combinations of the codes of some parameters.
+
+    :ivar table: The contingency table, i.e. a `numpy` array with a dimension per parameter\
+    holding the number of languages for each combination of codes.
+    """
+
+    def __init__(self, parameters, matrices, languages):
+        self.parameters = parameters
+        self.codes = [m.codes for m in matrices]
+        self.matrices = [m.matrix for m in matrices]
+        self.icons = [m.icons for m in matrices]
+        self.languages = languages
+        operands = []
+        for i, m in enumerate(self.matrices):
+            operands.extend([m.astype(numpy.int32), [0, i + 1]])
+        self.table = numpy.einsum(*operands, list(range(1, len(matrices) + 1)))
+
+    @property
+    def id(self):
+        return '_'.join(p.id for p in self.parameters)
+
+    @property
+    def name(self):
+        return ' / '.join(p.name or p.id for p in self.parameters)
+
+    def cells(self):
+        """The combinations with languages, as pairs (`tuple` of codes, number of languages)
+        in order of decreasing frequency."""
+        res = []
+        for index in zip(*numpy.nonzero(self.table)):
+            res.append((
+                tuple(codes[i] for codes, i in zip(self.codes, index)),
+                int(self.table[index])))
+        return sorted(res, key=lambda c: (-c[1], c[0]))
+
+    def rows(self, codes):
+        """Indices of the languages with a combination of codes."""
+        mask = numpy.ones(len(self.languages), dtype=bool)
+        for matrix, all_codes, code in zip(self.matrices, self.codes, codes):
+            mask &= matrix[:, all_codes.index(code)]
+        return numpy.nonzero(mask)[0]
+
+    def icon(self, codes):
+        """The marker of a combination of codes - a pie with the colours of the codes."""
+        return pie_url(tuple(
+            icons[all_codes.index(code)]
+            for icons, all_codes, code in zip(self.icons, self.codes, codes)))
+
+    def layers(self, req):
+        """GeoJSON FeatureCollections, one per combination with languages."""
+        for codes, count in self.cells():
+            features = []
+            for row in self.rows(codes):
+                if self.languages.coordinates[row]:
+                    features.append({
+                        'type': 'Feature',
+                        'geometry': {
+                            'type': 'Point', 'coordinates': self.languages.coordinates[row]},
+                        'properties': {'language': {
+                            'id': self.languages.ids[row],
+                            'name': self.languages.names[row]}}})
+            yield {
+                'type': 'FeatureCollection',
+                'properties': {
+                    'layer': '_'.join(codes),
+                    'name': ' / '.join(codes),
+                    'icon': self.icon(codes),
+                    'count': count},
+                'features': features}
+
+    def __json__(self, req):
+        return {
+            'parameters': [p.id for p in self.parameters],
+            'codes': self.codes,
+            'table': self.table.tolist(),
+            'cells': [{'codes': codes, 'count': count} for codes, count in self.cells()],
+        }
+
+
+def combination(req, ids):
+    """The `Combination` of the parameters with the given ids, or `None`.
+
+    :param ids: `list` of 2 or 3 parameter ids.
+    """
+    if not 2 <= len(ids) <= 3 or len(set(ids)) != len(ids):
+        return None
+    parameters = {
+        p.id: p for p in DBSession.query(OOAParameter).filter(OOAParameter.id.in_(ids))}
+    if len(parameters) != len(ids):
+        return None
+    version = data_version(req)
+    parameters = [parameters[id_] for id_ in ids]
+    return Combination(
+        parameters, [code_matrix(p, version) for p in parameters], languages(version))
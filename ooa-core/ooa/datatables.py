@@ -0,0 +1,242 @@
+"""Datatable columns and mixins shared by the datatables of the wals3 and ooaclld apps.
+
+`CountCache` and `KeysetPagination` are mixed into a `clld.web.datatables` class - before
+it in the bases - to cache its row counts and to page it by sort key rather than by OFFSET.
+With setting ``ooa.count_cache_stats`` the hit/miss statistics of the count cache are
+served as JSON from ``/_datatables/counts``.
+"""
+import threading
+import collections
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+from pyramid.settings import asbool
+
+from clld.web.datatables.base import Col, LinkCol
+from clld.web.datatables.base import DISPLAY_LENGTH, DISPLAY_LIMIT, type_coerce
+
+from ooa.util import data_version
+from ooa import fulltext, samples
+
+__all__ = [
+    'FullTextCol', 'FullTextLinkCol', 'SamplesCol', 'CountCache', 'KeysetPagination',
+    'count_cache_stats']
+
+
+class FullTextCol(Col):
+
+    """A column searched through the full-text index, see `ooa.fulltext`."""
+
+    def __init__(self, dt, name, kind, **kw):
+        self.kind = kind
+        super(FullTextCol, self).__init__(dt, name, **kw)
+
+    def search(self, qs):
+        return fulltext.match(self.kind, qs)
+
+
+class FullTextLinkCol(FullTextCol, LinkCol):
+    pass
+
+
+#: Row counts of datatable queries, see `CountCache`.
+COUNTS = collections.OrderedDict()
+MAX_COUNTS = 10000
+COUNT_STATS = collections.Counter(hits=0, misses=0)
+_counts_lock = threading.Lock()
+
+
+def count_cache_stats():
+    with _counts_lock:
+        return dict(COUNT_STATS, size=len(COUNTS))
+
+
+def count_cache_view(req):
+    """Hit/miss statistics of the datatable count cache."""
+    return count_cache_stats()
+
+
+class _CountCachedQuery(Query):
+
+    """A query which looks up its `count` in `COUNTS` first."""
+
+    count_key = None
+
+    @classmethod
+    def from_query(cls, query, count_key):
+        res = cls.__new__(cls)
+        res.__dict__ = dict(query.__dict__, count_key=count_key)
+        return res
+
+    def count(self):
+        if self.count_key is None:
+            return super(_CountCachedQuery, self).count()
+        # Filters are normalized by compiling them: searches which result in the same SQL
+        # share an entry.
+        compiled = self.statement.compile()
+        key = self.count_key + (
+            str(compiled), tuple(sorted((k, repr(v)) for k, v in compiled.params.items())))
+        with _counts_lock:
+            if key in COUNTS:
+                COUNT_STATS['hits'] += 1
+                COUNTS.move_to_end(key)
+                return COUNTS[key]
+            COUNT_STATS['misses'] += 1
+        # The query runs without the lock, so concurrent misses may count twice.
+        res = super(_CountCachedQuery, self).count()
+        with _counts_lock:
+            COUNTS[key] = res
+            if len(COUNTS) > MAX_COUNTS:
+                COUNTS.popitem(last=False)
+        return res
+
+
+class CountCache(object):
+
+    """Serve `count_all` and `count_filtered` from a cache.
+
+    Counts are cached per datatable, filter and data version - see `data_version` - so a
+    reload of the database invalidates them. Paging and sorting reuse the counts, and
+    `count_all` is shared by all searches.
+    """
+
+    def get_query(self, limit=DISPLAY_LIMIT, offset=0, undefer_cols=()):
+        version = data_version(self.req)
+        base_query = self.base_query
+        # The count queries are derived from the query returned by `base_query`.
+        self.base_query = lambda query: _CountCachedQuery.from_query(
+            base_query(query),
+            (self.__class__.__name__, version) if version else None)
+        try:
+            return super(CountCache, self).get_query(
+                limit=limit, offset=offset, undefer_cols=undefer_cols)
+        finally:
+            del self.base_query
+
+
+#: Known page boundaries per datatable query, see `KeysetPagination`.
+BOUNDARIES = collections.OrderedDict()
+MAX_BOUNDARY_QUERIES = 1000
+_boundaries_lock = threading.Lock()
+
+
+def _seek(order, key):
+    """Condition selecting the rows at or after `key` in the given `order`."""
+    clauses = []
+    for i, ((col, desc), value) in enumerate(zip(order, key)):
+        same = [c == v for (c, _), v in zip(order[:i], key[:i])]
+        clauses.append(and_(*(same + [col < value if desc else col > value])))
+    clauses.append(and_(*[c == v for (c, _), v in zip(order, key)]))
+    # The redundant range on the first column lets the database seek in an index.
+    (col, desc), value = order[0], key[0]
+    return and_(col <= value if desc else col >= value, or_(*clauses))
+
+
+class KeysetPagination(object):
+
+    """Locate pages by the sort key of their first row rather than with OFFSET.
+
+    DataTables requests pages by offset. If a table is ordered by `keyset_cols` only -
+    indexed columns which are never NULL - followed by the primary key, the sort key of the
+    first row of a page is looked up by offset, reading only the sort key columns - which an
+    index covers - rather than the full rows before the page. The rows of the page are then
+    read with a WHERE clause on this key. Keys found this way are remembered, so the lookup
+    for a later page starts from the closest known page before it - when paging forward it
+    is a single step. Other orderings are paged with OFFSET as before.
+    """
+
+    keyset_cols = ()
+
+    def keyset_order(self):
+        """
+        :return: `list` of pairs (column, descending) or `None`.
+        """
+        order = []
+        for index in range(min(type_coerce(int, self.req.params.get('iSortingCols', 0), 0), 10)):
+            try:
+                col = self.cols[int(self.req.params.get('iSortCol_%s' % index))]
+            except (TypeError, ValueError, IndexError):
+                continue
+            if not col.js_args.get('bSortable', True) or col.order() is None:
+                continue
+            if not any(col.order() is c for c in self.keyset_cols):
+                return None
+            order.append((col.order(), self.req.params.get('sSortDir_%s' % index) == 'desc'))
+        return order + [(self.default_order(), False)]
+
+    def get_query(self, limit=DISPLAY_LIMIT, offset=0, undefer_cols=()):
+        query = super(KeysetPagination, self).get_query(
+            limit=limit, offset=offset, undefer_cols=undefer_cols)
+        order = self.keyset_order()
+        if order is None:
+            return query
+
+        start = type_coerce(int, self.req.params.get('iDisplayStart', offset), offset)
+        if 'iDisplayLength' in self.req.params:
+            limit = min(
+                type_coerce(int, self.req.params['iDisplayLength'], DISPLAY_LENGTH),
+                DISPLAY_LIMIT)
+        limit = DISPLAY_LIMIT if limit == -1 else limit
+        signature = (
+            self.__class__.__name__,
+            self.count_all,
+            self.count_filtered,
+            tuple(sorted(
+                (k, v) for k, v in self.req.params.items()
+                if k not in ['iDisplayStart', 'sEcho', '_'])))
+        with _boundaries_lock:
+            boundaries = BOUNDARIES.pop(signature, {})
+            BOUNDARIES[signature] = boundaries
+            if len(BOUNDARIES) > MAX_BOUNDARY_QUERIES:
+                BOUNDARIES.popitem(last=False)
+            known = max([o for o in boundaries if o <= start], default=None)
+            boundary = boundaries.get(known)
+
+        unbounded = query.limit(None).offset(None)
+        cols = [c for c, _ in order]
+        if start != (known or 0):
+            keys = unbounded.with_entities(*cols)
+            if known is not None:
+                keys = keys.filter(_seek(order, boundary))
+            key = keys.offset(start - (known or 0)).limit(1).first()
+            if key is None or None in key:
+                # Beyond the last row, or not a key we can seek to.
+                return query
+            boundary = tuple(key)
+        if boundary is not None:
+            unbounded = unbounded.filter(_seek(order, boundary))
+        # The key of the first row of the next page is a step of a single page.
+        key = unbounded.with_entities(*cols).offset(limit).limit(1).first()
+        with _boundaries_lock:
+            if boundary is not None:
+                boundaries[start] = boundary
+            if key is not None and None not in key:
+                boundaries[start + limit] = tuple(key)
+        return unbounded.limit(limit)
+
+
+class SamplesCol(Col):
+
+    """The samples of a language, searched by bitmask - see `ooa.samples`."""
+
+    __kw__ = dict(bSortable=False)
+
+    def __init__(self, dt, name, **kw):
+        kw.setdefault('choices', list(samples.SAMPLES))
+        super(SamplesCol, self).__init__(dt, name, **kw)
+
+    def format(self, item):
+        return ', '.join(samples.names(item.samples))
+
+    def search(self, qs):
+        try:
+            mask = samples.mask(n.strip() for n in qs.split(',') if n.strip())
+        except ValueError:
+            return None
+        return samples.condition(mask) if mask else None
+
+
+def includeme(config):
+    if asbool(config.registry.settings.get('ooa.count_cache_stats')):
+        config.add_route('count_cache', '/_datatables/counts')
+        config.add_view(count_cache_view, route_name='count_cache', renderer='json')
@@ -0,0 +1,119 @@
+"""Full-text index over the searchable text of the OOA objects.
+
+The index is a single table `fulltext` with one row per object: its kind, its pk and its
+text. On SQLite it is an FTS5 virtual table, on PostgreSQL a table with a `tsvector` column
+and a GIN index. The table is not part of the ORM metadata; `rebuild` - called by the
+loader - (re)creates and fills it.
+
+Search terms are split into words, and all words must match as prefixes, i.e.
+``"appr mor"`` matches "Apprehensional Morphology".
+"""
+import re
+import collections
+
+import sqlalchemy as sa
+from pyramid.httpexceptions import HTTPBadRequest
+from clld.db.meta import DBSession
+
+from ooa import models
+
+__all__ = ['KINDS', 'rebuild', 'match', 'search', 'request_kinds']
+
+#: Models and text columns per kind of object in the index.
+KINDS = collections.OrderedDict([
+    ('parameter', (models.OOAParameter, 'question')),
+    ('code', (models.OOACode, 'description')),
+    ('unit', (models.OOAUnit, 'remark')),
+    ('language', (models.OOALanguage, 'name')),
+])
+
+fulltext = sa.table(
+    'fulltext', sa.column('kind'), sa.column('pk'), sa.column('text'), sa.column('tsv'))
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def _dialect(bind):
+    return (getattr(bind, 'dialect', None) or bind.bind.dialect).name
+
+
+def rebuild(bind):
+    """(Re)create the index from the current data.
+
+    :param bind: A connection or session.
+    """
+    postgresql = _dialect(bind) == 'postgresql'
+    bind.execute('DROP TABLE IF EXISTS fulltext')
+    if postgresql:
+        bind.execute(
+            'CREATE TABLE fulltext (kind VARCHAR NOT NULL, pk INTEGER NOT NULL, text TEXT, '
+            'tsv TSVECTOR)')
+    else:
+        bind.execute(
+            "CREATE VIRTUAL TABLE fulltext USING fts5("
+            "kind UNINDEXED, pk UNINDEXED, text, tokenize='unicode61 remove_diacritics 2')")
+    for kind, (model, attr) in KINDS.items():
+        col = getattr(model, attr)
+        # An ORM query, to get the joins for joined table inheritance right.
+        query = DBSession.query(sa.literal(kind), model.pk, col).filter(col != None)  # noqa
+        bind.execute(fulltext.insert().from_select(['kind', 'pk', 'text'], query.statement))
+    if postgresql:
+        bind.execute("UPDATE fulltext SET tsv = to_tsvector('simple', text)")
+        bind.execute('CREATE INDEX fulltext_tsv ON fulltext USING gin(tsv)')
+        bind.execute('CREATE INDEX fulltext_kind_pk ON fulltext (kind, pk)')
+
+
+def _tsquery(words):
+    return sa.func.to_tsquery('simple', ' & '.join('{0}:*'.format(w) for w in words))
+
+
+def _condition(words):
+    if _dialect(DBSession) == 'postgresql':
+        return fulltext.c.tsv.op('@@')(_tsquery(words))
+    return fulltext.c.text.op('MATCH')(' '.join('"{0}"*'.format(w) for w in words))
+
+
+def match(kind, qs):
+    """A filter condition for objects of `kind` matching the search string `qs`.
+
+    Suitable as return value of `Col.search`.
+    """
+    words = WORD_PATTERN.findall(qs or '')
+    if not words:
+        return None
+    return KINDS[kind][0].pk.in_(
+        sa.select([fulltext.c.pk]).where(fulltext.c.kind == kind).where(_condition(words)))
+
+
+def search(qs, kinds=None, limit=20):
+    """Search the index.
+
+    :return: `list` of (kind, pk, snippet) triples, best matches first.
+    """
+    words = WORD_PATTERN.findall(qs or '')
+    if not words:
+        return []
+    if _dialect(DBSession) == 'postgresql':
+        rank = sa.func.ts_rank(fulltext.c.tsv, _tsquery(words)).desc()
+        snippet = sa.func.ts_headline('simple', fulltext.c.text, _tsquery(words))
+    else:
+        # bm25 scores are negative, better matches have lower scores.
+        rank = sa.func.bm25(sa.literal_column('fulltext'))
+        snippet = sa.func.snippet(sa.literal_column('fulltext'), 2, '<b>', '</b>', '…', 12)
+    select = sa.select([fulltext.c.kind, fulltext.c.pk, snippet])\
+        .where(_condition(words)).order_by(rank).limit(limit)
+    if kinds:
+        select = select.where(fulltext.c.kind.in_(list(kinds)))
+    return [tuple(row) for row in DBSession.execute(select)]
+
+
+def request_kinds(req):
+    """The kinds of objects to search, from the comma separated request parameter `kind`.
+
+    :raises HTTPBadRequest: for kinds not in `KINDS`.
+    """
+    kinds = [k.strip() for k in req.params.get('kind', '').split(',') if k.strip()]
+    unknown = [k for k in kinds if k not in KINDS]
+    if unknown:
+        raise HTTPBadRequest('unknown kind: {0}'.format(', '.join(unknown)))
+    return kinds
@@ -0,0 +1,214 @@
+"""HTTP caching of the responses of the app.
+
+The data only changes when `initializedb` or `prime_cache` runs, i.e. with the data version
+stamp, see `ooa.util.data_version` - or when new code is deployed. So a response is
+identified by its route, parameters, the request headers selecting its representation, the
+data version and the app version - setting ``ooa.app_version``, by default the version of
+the app's distribution: Its strong ETag is a hash of these, and its Last-Modified date the
+time of the stamp. Validators set by a view are kept. Conditional requests are evaluated
+against the response of the view - or the cached response, see below - so only responses
+with status 200 become 304 Not Modified, and a request for a missing object still gets 404.
+
+Optionally, rendered responses are cached, too - per process in memory, or on disk, shared
+by all processes - with setting ``ooa.response_cache``, either ``memory`` or the path of
+a directory.
+"""
+import os
+import json
+import pickle
+import shutil
+import hashlib
+import pathlib
+import datetime
+import tempfile
+import threading
+import collections
+import importlib.metadata
+
+from pyramid.interfaces import IRoutesMapper
+from pyramid.response import Response
+from pyramid.tweens import EXCVIEW, INGRESS
+from webob.datetime_utils import serialize_date
+
+from ooa.util import data_version
+
+__all__ = ['MemoryCache', 'DiskCache', 'etag', 'last_modified', 'app_version']
+
+#: Routes serving the state of the process rather than data.
+UNCACHED_ROUTES = {'count_cache', 'sql_stats'}
+#: Request headers selecting the representation of a resource.
+VARY = ('Accept', 'Accept-Encoding', 'X-Requested-With')
+
+
+def request_key(req, route, match):
+    """The parts of a request which determine the response for a data version."""
+    return [
+        req.host_url,
+        route.name,
+        sorted((k, v) for k, v in match.items() if isinstance(v, str)),
+        sorted(req.GET.items()),
+        [req.headers.get(name, '') for name in VARY]]
+
+
+def etag(version, key):
+    return hashlib.sha1(json.dumps([version, key]).encode('utf8')).hexdigest()
+
+
+def app_version(registry):
+    """The version of the code - setting ``ooa.app_version`` or the version of the app."""
+    if registry.settings.get('ooa.app_version'):
+        return registry.settings['ooa.app_version']
+    try:
+        return importlib.metadata.version(registry.package_name)
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def vary(response):
+    """The ``Vary`` header of a response, with `VARY` appended."""
+    res = list(response.vary or [])
+    res.extend(n for n in VARY if n.lower() not in {v.lower() for v in res})
+    return ', '.join(res)
+
+
+def last_modified(version):
+    """The time of a data version stamp, in whole seconds as for HTTP dates - or `None`."""
+    try:
+        res = datetime.datetime.fromisoformat(version)
+    except (TypeError, ValueError):
+        return None
+    if res.tzinfo is None:
+        res = res.replace(tzinfo=datetime.timezone.utc)
+    return res.replace(microsecond=0)
+
+
+class MemoryCache(object):
+
+    """LRU cache of rendered responses for the current data version."""
+
+    def __init__(self, size=1000):
+        self.size = size
+        self.version = None
+        self.items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version, tag):
+        with self._lock:
+            if version == self.version and tag in self.items:
+                self.items.move_to_end(tag)
+                return self.items[tag]
+
+    def set(self, version, tag, value):
+        with self._lock:
+            if version != self.version:
+                self.items.clear()
+                self.version = version
+            self.items[tag] = value
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+
+class DiskCache(object):
+
+    """Rendered responses as files, in a subdirectory per data version of `directory`."""
+
+    def __init__(self, directory):
+        self.directory = pathlib.Path(directory)
+
+    def _dir(self, version):
+        return self.directory / hashlib.sha1(version.encode('utf8')).hexdigest()
+
+    def get(self, version, tag):
+        try:
+            with self._dir(version).joinpath(tag).open('rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def set(self, version, tag, value):
+        d = self._dir(version)
+        if not d.exists():
+            # Only the responses for the current data version are kept.
+            if self.directory.exists():
+                for p in self.directory.iterdir():
+                    if p.is_dir():
+                        shutil.rmtree(str(p), ignore_errors=True)
+            d.mkdir(parents=True, exist_ok=True)
+        # Written to a temporary file first, so other processes never read partial files.
+        fd, tmp = tempfile.mkstemp(dir=str(d))
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(value, f)
+        os.replace(tmp, str(d / tag))
+
+
+def response_cache(settings):
+    """The response cache configured with ``ooa.response_cache`` - or `None`."""
+    spec = settings.get('ooa.response_cache')
+    if not spec:
+        return None
+    if spec == 'memory':
+        return MemoryCache(int(settings.get('ooa.response_cache_size', 1000)))
+    return DiskCache(spec)
+
+
+def http_cache_tween_factory(handler, registry):
+    max_age = int(registry.settings.get('ooa.http_max_age', 0))
+    cache = response_cache(registry.settings)
+    code = app_version(registry)
+
+    def http_cache_tween(request):
+        mapper = request.registry.queryUtility(IRoutesMapper)
+        if request.method not in ('GET', 'HEAD') or mapper is None:
+            return handler(request)
+        info = mapper(request)
+        route = info['route']
+        if route is None or route.name.startswith('__') or route.name in UNCACHED_ROUTES:
+            return handler(request)
+        version = data_version(request)
+        if not version:
+            return handler(request)
+
+        tag = etag([version, code], request_key(request, route, info['match']))
+        modified = last_modified(version)
+        headers = [
+            ('ETag', '"{0}"'.format(tag)),
+            ('Cache-Control', 'public, max-age={0}'.format(max_age)),
+            ('Vary', ', '.join(VARY))]
+        if modified:
+            headers.append(('Last-Modified', serialize_date(modified)))
+
+        # Responses of older code are dropped from the cache, too.
+        version = '{0} {1}'.format(version, code)
+        cached = cache.get(version, tag) if cache else None
+        if cached:
+            status, headerlist, body = cached
+            return Response(
+                status=status, headerlist=list(headerlist), body=body,
+                conditional_response=True)
+
+        response = handler(request)
+        if response.status_int != 200 or 'Set-Cookie' in response.headers:
+            return response
+        for name, value in headers:
+            if name == 'Vary':
+                response.headers[name] = vary(response)
+            elif name not in response.headers:
+                # Cache-Control, ETag and Last-Modified of the view are kept.
+                response.headers[name] = value
+        # Streamed responses and files are not cached.
+        if cache and isinstance(response.app_iter, (list, tuple)):
+            cache.set(version, tag, (response.status, response.headerlist, response.body))
+        # The response is turned into 304 Not Modified when it is served, if the conditions
+        # of the request - If-None-Match or If-Modified-Since - match its validators.
+        response.conditional_response = True
+        return response
+
+    return http_cache_tween
+
+
+def includeme(config):
+    # Inside the transaction of pyramid_tm, because the data version is read from the db.
+    config.add_tween(
+        'ooa.httpcache.http_cache_tween_factory',
+        under=('pyramid_tm.tm_tween_factory', INGRESS),
+        over=EXCVIEW)
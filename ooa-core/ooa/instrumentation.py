@@ -0,0 +1,166 @@
+"""Per-request SQL instrumentation.
+
+Listeners on all SQLAlchemy engines time each statement, and a tween collects the timings
+of the statements of a request - in a thread-local `Timing`. The totals are sent as
+``Server-Timing`` header and added to per-route statistics. With setting ``ooa.sql_stats``
+the statistics are served as JSON from ``/_sql``, together with the slowest statements seen
+so far - they expose SQL text, so this is meant for development. Statements slower than
+``ooa.slow_query_ms`` are logged with the name of the route.
+
+Statements run after the tween returned - i.e. while a streamed response is written - are
+not counted.
+"""
+import heapq
+import logging
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from pyramid.settings import asbool
+
+__all__ = ['Timing', 'sql_stats']
+
+log = logging.getLogger(__name__)
+
+#: Number of requests, statements and DB time per route name.
+ROUTES = {}
+#: The slowest statements, as min-heap of (milliseconds, route name, statement).
+SLOWEST = []
+MAX_SLOWEST = 20
+_lock = threading.Lock()
+_current = threading.local()
+
+
+def _route_name(req):
+    return req.matched_route.name if getattr(req, 'matched_route', None) else None
+
+
+class Timing(object):
+
+    """Timings of the SQL statements of a request.
+
+    :param threshold: Statements slower than this many milliseconds are logged.
+    """
+
+    def __init__(self, req, threshold=None, slowest=5):
+        self.req = req
+        self.threshold = threshold
+        self.statements = 0
+        self.time = 0.0
+        self.slowest = []
+        self._max_slowest = slowest
+
+    def add(self, statement, ms):
+        self.statements += 1
+        self.time += ms
+        item = (ms, statement)
+        if len(self.slowest) < self._max_slowest:
+            heapq.heappush(self.slowest, item)
+        elif item > self.slowest[0]:
+            heapq.heapreplace(self.slowest, item)
+        if self.threshold is not None and ms >= self.threshold:
+            log.warning(
+                'slow query (%.1fms) on route %s: %s', ms, _route_name(self.req), statement)
+
+    def server_timing(self, total=None):
+        """The value of the ``Server-Timing`` header."""
+        res = ['db;dur={0:.1f};desc="{1} statements"'.format(self.time, self.statements)]
+        if self.slowest:
+            res.append('db-max;dur={0:.1f}'.format(max(self.slowest)[0]))
+        if total is not None:
+            res.append('app;dur={0:.1f}'.format(total))
+        return ', '.join(res)
+
+    def __json__(self, req=None):
+        return {
+            'statements': self.statements,
+            'time': round(self.time, 3),
+            'slowest': [
+                {'time': round(ms, 3), 'statement': s}
+                for ms, s in sorted(self.slowest, reverse=True)],
+        }
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['ooa.query_start'] = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Statements on a connection are executed one after the other.
+    start = conn.info.pop('ooa.query_start', None)
+    timing = getattr(_current, 'timing', None)
+    if timing is not None and start is not None:
+        timing.add(statement, (time.perf_counter() - start) * 1000)
+
+
+def record(timing):
+    """Add the timings of a finished request to the per-route statistics."""
+    route = _route_name(timing.req)
+    with _lock:
+        stats = ROUTES.setdefault(
+            route, {'requests': 0, 'statements': 0, 'time': 0.0, 'max_time': 0.0})
+        stats['requests'] += 1
+        stats['statements'] += timing.statements
+        stats['time'] += timing.time
+        for ms, statement in timing.slowest:
+            stats['max_time'] = max(stats['max_time'], ms)
+            item = (ms, route or '', statement)
+            if len(SLOWEST) < MAX_SLOWEST:
+                heapq.heappush(SLOWEST, item)
+            elif item > SLOWEST[0]:
+                heapq.heapreplace(SLOWEST, item)
+
+
+def sql_stats():
+    """Per-route statistics and the slowest statements, slowest first."""
+    with _lock:
+        routes = {
+            str(name): dict(
+                stats,
+                time=round(stats['time'], 3),
+                max_time=round(stats['max_time'], 3),
+                mean_time=round(stats['time'] / stats['requests'], 3))
+            for name, stats in ROUTES.items()}
+        slowest = [
+            {'time': round(ms, 3), 'route': route or None, 'statement': statement}
+            for ms, route, statement in sorted(SLOWEST, reverse=True)]
+    return {'routes': routes, 'slowest': slowest}
+
+
+def sql_stats_view(request):
+    return sql_stats()
+
+
+def sql_timing_tween_factory(handler, registry):
+    threshold = registry.settings.get('ooa.slow_query_ms')
+    threshold = float(threshold) if threshold else None
+    slowest = int(registry.settings.get('ooa.slowest_queries', 5))
+
+    def sql_timing_tween(request):
+        timing = _current.timing = Timing(request, threshold=threshold, slowest=slowest)
+        start = time.perf_counter()
+        try:
+            response = handler(request)
+        finally:
+            _current.timing = None
+            record(timing)
+        request.sql_timing = timing
+        response.headers['Server-Timing'] = timing.server_timing(
+            (time.perf_counter() - start) * 1000)
+        return response
+
+    return sql_timing_tween
+
+
+def includeme(config):
+    for name, listener in [
+        ('before_cursor_execute', before_cursor_execute),
+        ('after_cursor_execute', after_cursor_execute),
+    ]:
+        if not event.contains(Engine, name, listener):
+            event.listen(Engine, name, listener)
+    config.add_tween('ooa.instrumentation.sql_timing_tween_factory')
+    if asbool(config.registry.settings.get('ooa.sql_stats')):
+        config.add_route('sql_stats', '/_sql')
+        config.add_view(sql_stats_view, route_name='sql_stats', renderer='json')
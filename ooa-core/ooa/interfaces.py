@@ -0,0 +1,6 @@
+from zope.interface import Interface
+
+
+class IFeatureSet(Interface):
+
+    """marker."""
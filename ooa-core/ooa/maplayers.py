@@ -0,0 +1,122 @@
+"""GeoJSON for the parameter maps, with one layer per code.
+
+The units of a parameter are grouped by `code_id`, each group becomes a FeatureCollection
+of the languages with this code. Properties which are the same for all features of a
+layer - code and its marker icon, assigned on load - are set once, on the collection;
+features only carry the language. Coordinates are rounded to `PRECISION` decimal places.
+
+The gzipped JSON is kept in an LRU cache, keyed by parameter, data version and combination
+of samples - see `ooa.samples` - so it is computed once per parameter and load, and a
+map request is a cache read.
+"""
+import gzip
+import json
+import hashlib
+import threading
+import collections
+from itertools import groupby
+
+from clld.db.meta import DBSession
+
+from ooa.models import OOALanguage, OOAUnit
+from ooa.util import data_version, icon_url, normalized_icon
+from ooa import samples
+
+__all__ = ['Document', 'layers', 'cache_stats']
+
+#: Decimal places of coordinates, i.e. a precision of about 100m.
+PRECISION = 3
+#: Layers per (parameter pk, data version, samples), least recently used first.
+LAYERS = collections.OrderedDict()
+MAX_LAYERS = 500
+STATS = collections.Counter(hits=0, misses=0)
+_layers_lock = threading.Lock()
+
+Document = collections.namedtuple('Document', 'etag body')
+
+
+def cache_stats():
+    with _layers_lock:
+        return dict(STATS, size=len(LAYERS))
+
+
+def _layers(req, parameter, mask):
+    # The detail page of the parameter loads the codes with it.
+    codes = parameter.domain
+    names = {code.id: code.name for code in codes}
+    # Codes loaded before icons were assigned - i.e. in upgraded databases - have none.
+    icons = {
+        code.id: icon_url(normalized_icon(code.jsondata.get('icon', 'c000000')))
+        for code in codes}
+    # The ordering is served by the index on (parameter_id, code_id).
+    query = DBSession.query(
+        OOAUnit.code_id, OOALanguage.id, OOALanguage.name, OOALanguage.latitude,
+        OOALanguage.longitude)\
+        .join(OOALanguage, OOALanguage.pk == OOAUnit.language_pk)\
+        .filter(OOAUnit.parameter_id == parameter.pk)\
+        .filter(OOAUnit.code_id.isnot(None))\
+        .filter(OOAUnit.code_id != '')\
+        .filter(OOALanguage.latitude.isnot(None))\
+        .filter(OOALanguage.longitude.isnot(None))\
+        .order_by(OOAUnit.code_id, OOALanguage.id)
+    if mask:
+        query = query.filter(samples.condition(mask))
+    res = []
+    for code_id, rows in groupby(query, key=lambda r: r[0]):
+        features, seen = [], set()
+        for _, lid, name, lat, lon in rows:
+            # Languages with more than one unit for the code are shown once.
+            if lid not in seen:
+                seen.add(lid)
+                features.append({
+                    'type': 'Feature',
+                    'geometry': {
+                        'type': 'Point',
+                        'coordinates': [
+                            round(float(lon), PRECISION), round(float(lat), PRECISION)]},
+                    'properties': {'language': {'id': lid, 'name': name}}})
+        res.append({
+            'type': 'FeatureCollection',
+            'properties': {
+                'layer': code_id,
+                'name': names.get(code_id) or code_id,
+                'parameter': parameter.id,
+                'icon': icons.get(code_id, '')},
+            'features': features})
+    return res
+
+
+def _document(obj):
+    # mtime=0 makes the output - and thus the ETag - depend on the content only.
+    body = gzip.compress(
+        json.dumps(obj, separators=(',', ':')).encode('utf8'), compresslevel=9, mtime=0)
+    return Document(hashlib.md5(body).hexdigest(), body)
+
+
+def layers(req, parameter, mask=0):
+    """The GeoJSON documents of a parameter map, from the cache if possible.
+
+    :param parameter: An `OOAParameter` instance.
+    :param mask: Bitmask of samples - only languages in all these samples are included.
+    :return: `dict` mapping code ids to the gzipped FeatureCollection of the code and \
+    `None` to the gzipped list of all layers, as `Document`s.
+    """
+    version = data_version(req)
+    key = (parameter.pk, version, mask)
+    with _layers_lock:
+        if key in LAYERS:
+            STATS['hits'] += 1
+            LAYERS.move_to_end(key)
+            return LAYERS[key]
+        STATS['misses'] += 1
+
+    fcs = _layers(req, parameter, mask)
+    res = {fc['properties']['layer']: _document(fc) for fc in fcs}
+    res[None] = _document(fcs)
+    if version:
+        # Without a data version we could not tell when the layers are stale.
+        with _layers_lock:
+            LAYERS[key] = res
+            while len(LAYERS) > MAX_LAYERS:
+                LAYERS.popitem(last=False)
+    return res
@@ -0,0 +1,50 @@
+"""Maps of the OOA data shared by the wals3 and ooaclld apps."""
+from clld.web.maps import ParameterMap, Map, Layer
+from clld.web.util.htmllib import HTML
+
+from ooa import maplayers, samples
+
+__all__ = ['OOAParameterMap', 'OOACombinationMap']
+
+
+class OOAParameterMap(ParameterMap):
+
+    """Map of the units of a parameter, with one layer per code - see `ooa.maplayers`."""
+
+    def get_options(self):
+        return {
+            'icon_size': 20,
+            'max_zoom': 9,
+            'worldCopyJump': True,
+            'info_query': {'parameter': self.ctx.pk}}
+
+    def get_layers(self):
+        # The layers are read from the cached GeoJSON; the map requests each one with its
+        # id as parameter `layer`.
+        names = {de.id: de.name for de in self.ctx.domain}
+        mask = samples.request_mask(self.req)
+        url = self.req.route_url(
+            'parameter_geojson',
+            id=self.ctx.id,
+            _query={'samples': ','.join(samples.names(mask))} if mask else {})
+        layers = maplayers.layers(self.req, self.ctx, mask)
+        # The layer ids are the ids of the codes, i.e. of the elements of `ctx.domain`.
+        for code_id in sorted(k for k in layers if k):
+            yield Layer(code_id, names.get(code_id) or code_id, url)
+
+
+class OOACombinationMap(Map):
+
+    """Map of the code combinations of some parameters, see `ooa.combinations`."""
+
+    def get_options(self):
+        return {'icon_size': 20, 'max_zoom': 9, 'worldCopyJump': True, 'hash': True}
+
+    def get_layers(self):
+        for fc in self.ctx.layers(self.req):
+            yield Layer(
+                fc['properties']['layer'],
+                fc['properties']['name'],
+                fc,
+                marker=HTML.img(src=fc['properties']['icon'], height='20', width='20'),
+                representation=fc['properties']['count'])
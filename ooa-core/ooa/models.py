@@ -0,0 +1,118 @@
+"""The OOA models, shared by the wals3 and ooaclld apps."""
+from zope.interface import implementer
+from sqlalchemy import (
+    Column,
+    Unicode,
+    Integer,
+    Boolean,
+    ForeignKey,
+    Index,
+)
+from sqlalchemy.orm import relationship
+
+from clld import interfaces
+from clld.db.meta import Base, CustomModelMixin
+from clld.db.models.common import (
+    Language,
+    Parameter,
+    Unit,
+    UnitDomainElement,
+    DomainElement,
+    HasSourceMixin,
+)
+from ooa import interfaces as ooa_interfaces
+
+__all__ = [
+    'OOALanguage', 'OOAParameter', 'OOACode', 'OOAFeatureSet', 'OOAUnit', 'OOAUnitReference']
+
+
+@implementer(interfaces.ILanguage)
+class OOALanguage(CustomModelMixin, Language):
+    pk = Column(Integer, ForeignKey('language.pk'), primary_key=True)
+    glottocode = Column(Unicode, index=True)
+    macroarea = Column(Unicode, index=True)
+    iso = Column(Unicode)
+    family_id = Column(Unicode, index=True)
+    language_id = Column(Unicode)
+    family_name = Column(Unicode)
+    balanced = Column(Boolean, default=False)
+    isolates = Column(Boolean, default=False)
+    american = Column(Boolean, default=False)
+    world = Column(Boolean, default=False)
+    north_america = Column(Boolean, default=False)
+    noun = Column(Boolean, default=False)
+    # Bitmask of the samples above, see `ooa.samples`.
+    samples = Column(Integer, nullable=False, default=0)
+    # Number of datapoints, computed in prime_cache.
+    representation = Column(Integer)
+
+
+@implementer(interfaces.IParameter)
+class OOAParameter(CustomModelMixin, Parameter):
+
+    """TODO"""
+
+    #__table_args__ = (UniqueConstraint('contribution_pk', 'ordinal_qualifier'),)
+
+    pk = Column(Integer, ForeignKey('parameter.pk'), primary_key=True)
+    #parameter_id = Column(Unicode)
+    feature_set = Column(Unicode, index=True) # Column(Integer, ForeignKey('featureset.pk'))
+    question = Column(Unicode)
+    datatype = Column(Unicode)
+    visualization = Column(Unicode)
+    # Number of languages with a value, computed in prime_cache.
+    representation = Column(Integer)
+
+
+@implementer(interfaces.IDomainElement)
+class OOACode(CustomModelMixin, DomainElement):
+    pk = Column(Integer, ForeignKey('domainelement.pk'), primary_key=True)
+    # Number of values with this code, computed in prime_cache.
+    representation = Column(Integer)
+
+
+@implementer(ooa_interfaces.IFeatureSet)
+class OOAFeatureSet(CustomModelMixin, UnitDomainElement):
+    pk = Column(Integer, ForeignKey('unitdomainelement.pk'), primary_key=True)
+    domains = Column(Unicode)
+    authors = Column(Unicode)
+    contributors = Column(Unicode)
+    filename = Column(Unicode)
+    # Number of features and of languages with values for any of them, computed in
+    # prime_cache.
+    count_parameters = Column(Integer)
+    representation = Column(Integer)
+
+
+@implementer(interfaces.IUnit)
+class OOAUnit(CustomModelMixin, Unit):
+    # The single column indexes on language_id and parameter_id are covered by the
+    # composite ones. The units datatable is paged in the order of (parameter_id, pk).
+    __table_args__ = (
+        Index('ix_ooaunit_parameter_id_code_id', 'parameter_id', 'code_id'),
+        Index('ix_ooaunit_language_id_parameter_id', 'language_id', 'parameter_id'),
+        Index('ix_ooaunit_parameter_id_pk', 'parameter_id', 'pk'),
+    )
+
+    pk = Column(Integer, ForeignKey('unit.pk'), primary_key=True)
+
+    # The glottocode of the language - the language itself is referenced by language_pk.
+    language_id = Column(Unicode)
+    parameter_id = Column(Integer, ForeignKey('parameter.pk'))
+    parameter = relationship(Parameter)
+    code_id = Column(Unicode, index=True)
+    value = Column(Unicode)
+    remark = Column(Unicode)
+    coder = Column(Unicode)
+
+
+class OOAUnitReference(Base, HasSourceMixin):
+
+    """Link between a unit and one of the sources cited in its Source cell."""
+
+    __table_args__ = (
+        Index('ix_ooaunitreference_source_pk_unit_pk', 'source_pk', 'unit_pk'),
+    )
+
+    unit_pk = Column(Integer, ForeignKey('unit.pk'), nullable=False, index=True)
+    unit = relationship(OOAUnit, innerjoin=True, backref='references')
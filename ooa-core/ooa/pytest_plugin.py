@@ -0,0 +1,78 @@
+"""Fixtures shared by the tests of wals3 and ooaclld.
+
+The conftest of an app loads them with ``pytest_plugins = ['ooa.pytest_plugin']`` and
+provides the fixtures `settings_prefix` - the prefix of the settings of the app - and
+`cldf_metadata` - the path of the metadata of the real CLDF dataset.
+"""
+import shutil
+import logging
+import argparse
+
+import pytest
+
+
+@pytest.fixture
+def cldf_dir(tmp_path, cldf_metadata):
+    """A tiny CLDF dataset, using the metadata of the real one."""
+    shutil.copy(str(cldf_metadata), str(tmp_path))
+    tables = {
+        'parameters.csv': '\n'.join([
+            'ParameterID,FeatureSet,Question,datatype,VisualizationOnly',
+            'Appr-01,Appr,Does the language have apprehensional morphology?,,',
+            'Attr-01,Attr,Are there attributives?,"""integer""",',
+            '']),
+        'codes.csv': """\
+CodeID,ParameterID,Description,Visualization
+yes_Appr-01,Appr-01,yes,solid
+no._Appr-01,Appr-01,no,outline
+""",
+        'languages.csv': """\
+Glottocode,Name,Macroarea,Latitude,Longitude,ISO639P3code,Family_ID,Language_ID,\
+Family_Name,Isolates_Balanced_Sample,Isolates_Sample,American_Sample,Worldwide_Sample,\
+North_America_25_Sample,Noun_Poss_Sample
+abcd1234,Abc,Africa,10.5,20.25,abc,,,,true,,,true,,
+efgh1234,Efg,Eurasia,-5,151.5,efg,fam11234,,Fam,,,,,true,
+unus1234,Unused,Papunesia,,,,,,,,,,,,
+""",
+        'values.csv': """\
+ID,LanguageID,ParameterID,Value,CodeID,Remark,Source,Coder
+1,efgh1234,Appr-01,yes,yes_Appr-01,,meier2000,DI
+2,efgh1234,Attr-01,3,,a remark,meier2000[12],DI
+3,abcd1234,Appr-01,no,no._Appr-01,,"(Meier 2000, 5); unknown1999",NCP
+""",
+        'contributors.csv': """\
+ContributorID,Name
+DI,David Inman
+NCP,Natalia Chousou-Polydouri
+""",
+        'featuresets.csv': """\
+FeatureSetID,Name,Domain,Authors,Contributors,Filename
+Appr,Apprehensional Morphology,Morphosyntax,MV,MV;DP,
+Attr,Attributives,Morphosyntax,,NM,
+""",
+        'sources.bib': """\
+@book{meier2000,
+    author = {Meier, Hans},
+    year = {2000},
+    title = {A grammar}
+}
+""",
+    }
+    for name, text in tables.items():
+        tmp_path.joinpath(name).write_text(text, encoding='utf8')
+    return tmp_path
+
+
+@pytest.fixture
+def initializedb_args(cldf_dir, settings_prefix):
+    import pycldf
+
+    return argparse.Namespace(
+        cldf=pycldf.Dataset.from_metadata(cldf_dir / 'StructureDataset-metadata.json'),
+        log=logging.getLogger(__name__),
+        settings={
+            settings_prefix + '.load_batch_size': '2',
+            settings_prefix + '.load_processes': '2',
+            settings_prefix + '.load_diagnostics': str(cldf_dir / 'diagnostics.csv'),
+            settings_prefix + '.download_dir': str(cldf_dir / 'download'),
+        })
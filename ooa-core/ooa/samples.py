@@ -0,0 +1,129 @@
+"""Sample membership of the OOA languages.
+
+A language belongs to any number of the samples in `SAMPLES`. Besides a Boolean column per
+sample, `OOALanguage.samples` holds the membership as bitmask, with bit `i` set for the
+`i`-th sample. A combination of samples is a mask, too, so selecting the languages in all
+samples of a combination is a bitwise operation - ``samples & mask = mask`` in SQL, or an
+AND of the bitmaps of the in-memory `SampleIndex`.
+
+Views accept a combination of samples as parameter ``samples``, a comma separated list of
+sample names, e.g. ``?samples=world,noun``.
+"""
+import threading
+import collections
+
+from pyramid.httpexceptions import HTTPBadRequest
+from clld.db.meta import DBSession
+
+from ooa.models import OOALanguage
+from ooa.util import data_version
+
+__all__ = ['SAMPLES', 'mask', 'names', 'request_mask', 'condition', 'SampleIndex', 'index']
+
+#: Samples - i.e. `OOALanguage` columns - and the corresponding columns of the CLDF
+#: LanguageTable, in the order of their bits.
+SAMPLES = collections.OrderedDict([
+    ('balanced', 'Isolates_Balanced_Sample'),
+    ('isolates', 'Isolates_Sample'),
+    ('american', 'American_Sample'),
+    ('world', 'Worldwide_Sample'),
+    ('north_america', 'North_America_25_Sample'),
+    ('noun', 'Noun_Poss_Sample'),
+])
+BITS = {name: 1 << i for i, name in enumerate(SAMPLES)}
+
+INDEX = {}
+_index_lock = threading.Lock()
+
+
+def mask(names):
+    """The bitmask of a combination of samples.
+
+    >>> mask(['balanced', 'world'])
+    9
+    """
+    res = 0
+    for name in names:
+        if name not in BITS:
+            raise ValueError('unknown sample: {0}'.format(name))
+        res |= BITS[name]
+    return res
+
+
+def names(mask):
+    """The names of the samples in a bitmask.
+
+    >>> names(9)
+    ['balanced', 'world']
+    """
+    return [name for name in SAMPLES if mask & BITS[name]]
+
+
+def request_mask(req):
+    """The bitmask of the samples requested with parameter ``samples`` - or 0."""
+    try:
+        return mask(n.strip() for n in req.params.get('samples', '').split(',') if n.strip())
+    except ValueError as e:
+        raise HTTPBadRequest(str(e))
+
+
+def condition(mask):
+    """A filter condition for the languages in all samples of `mask`."""
+    return OOALanguage.samples.op('&')(mask) == mask
+
+
+class SampleIndex(object):
+
+    """The languages of each sample as a bitmap, i.e. an `int` with the bits of their pks set.
+
+    >>> index = SampleIndex([(1, 1), (2, 3), (5, 2)])
+    >>> index.pks(mask(['balanced']))
+    [1, 2]
+
+    :param languages: Iterable of (pk, samples) pairs.
+    """
+
+    def __init__(self, languages):
+        languages = list(languages)
+        size = max([pk for pk, _ in languages] or [0]) // 8 + 1
+        arrays = [bytearray(size) for _ in range(len(SAMPLES) + 1)]
+        for pk, samples in languages:
+            for i in range(len(SAMPLES)):
+                if samples & (1 << i):
+                    arrays[i][pk >> 3] |= 1 << (pk & 7)
+            arrays[-1][pk >> 3] |= 1 << (pk & 7)
+        self.bitmaps = [int.from_bytes(bytes(a), 'little') for a in arrays]
+
+    def bitmap(self, mask):
+        """Bitmap of the languages in all samples of `mask` - or of all languages for 0."""
+        res = self.bitmaps[-1]
+        for i in range(len(SAMPLES)):
+            if mask & (1 << i):
+                res &= self.bitmaps[i]
+        return res
+
+    def count(self, mask):
+        return bin(self.bitmap(mask)).count('1')
+
+    def pks(self, mask):
+        """Sorted pks of the languages in all samples of `mask`."""
+        bitmap = self.bitmap(mask)
+        res = []
+        for i, byte in enumerate(bitmap.to_bytes(bitmap.bit_length() // 8 + 1, 'little')):
+            if byte:
+                res.extend(i * 8 + j for j in range(8) if byte & (1 << j))
+        return res
+
+
+def index(req):
+    """The `SampleIndex` for the current data version."""
+    version = data_version(req)
+    with _index_lock:
+        if version and version in INDEX:
+            return INDEX[version]
+        res = SampleIndex(DBSession.query(OOALanguage.pk, OOALanguage.samples))
+        if version:
+            # Only the index for the current data version is kept.
+            INDEX.clear()
+            INDEX[version] = res
+        return res
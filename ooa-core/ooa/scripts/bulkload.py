@@ -0,0 +1,124 @@
+"""Batched inserts for the clld joined-table inheritance models.
+
+Instead of creating one ORM object per CSV row, rows are buffered per table and written
+with one ``executemany`` per batch (or ``COPY`` on PostgreSQL). Primary keys are assigned
+client-side, so callers can reference freshly loaded rows without a round trip. On PostgreSQL
+the serial sequences of the primary keys are advanced past them when the rows are written,
+so that later inserts through the ORM get new primary keys.
+"""
+import io
+import csv
+import datetime
+import collections
+
+import sqlalchemy as sa
+
+__all__ = ['BulkLoader']
+
+
+class BulkLoader(object):
+
+    """Buffer rows for model classes and write them in batches.
+
+    >>> loader = BulkLoader(DBSession, batch_size=1000)
+    >>> pk = loader.add(models.OOAParameter, id='Appr-01', question='...')
+    >>> loader.flush()
+    """
+
+    def __init__(self, session, batch_size=5000):
+        self.connection = session.connection()
+        self.batch_size = batch_size
+        self.counts = collections.Counter()
+        self._buffers = collections.OrderedDict()
+        self._next_pk = {}
+        self._pending = 0
+        self._now = datetime.datetime.utcnow()
+
+    def _pk(self, table):
+        if table.name not in self._next_pk:
+            self._next_pk[table.name] = self.connection.execute(
+                sa.select([sa.func.max(table.c.pk)])).scalar() or 0
+        self._next_pk[table.name] += 1
+        return self._next_pk[table.name]
+
+    def add(self, model, **kw):
+        """Buffer a row for `model` and all the tables it inherits from.
+
+        :return: The primary key assigned to the new row.
+        """
+        if '.' in (kw.get('id') or ''):
+            # same restriction as for objects added via clld.cliutil.Data
+            raise ValueError('Object id contains illegal character "."')
+        mapper = sa.inspect(model)
+        tables = [m.local_table for m in reversed(list(mapper.iterate_to_root()))]
+        pk = self._pk(tables[0])
+        kw.setdefault('jsondata', {})
+        if mapper.polymorphic_on is not None:
+            kw.setdefault(mapper.polymorphic_on.key, mapper.polymorphic_identity)
+        for table in tables:
+            row = {}
+            for col in table.c:
+                if col.key == 'pk':
+                    row['pk'] = pk
+                elif col.key in kw:
+                    row[col.key] = kw[col.key]
+                elif col.default is None:
+                    row[col.key] = None
+                elif col.default.is_scalar:
+                    row[col.key] = col.default.arg
+                # SQL expression defaults - i.e. func.now() for created and updated - are
+                # left to the INSERT statement.
+            self._buffers.setdefault(table, []).append(row)
+        self.counts[model.__name__] += 1
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+        return pk
+
+    def flush(self):
+        """Write all buffered rows, referenced tables first.
+
+        Rows are written in the dependency order of the tables, not in the order the
+        tables were first added to, so rows may reference rows of a later added model.
+        """
+        if not self._buffers:
+            return
+        order = next(iter(self._buffers)).metadata.sorted_tables
+        for table in sorted(self._buffers, key=order.index):
+            rows = self._buffers[table]
+            if rows:
+                if self.connection.dialect.name == 'postgresql':
+                    self._copy(table, rows)
+                else:
+                    self.connection.execute(table.insert(), rows)
+                del rows[:]
+        if self.connection.dialect.name == 'postgresql':
+            self._set_sequences()
+        self._pending = 0
+
+    def _set_sequences(self):
+        # Primary keys are only assigned for the base tables, the others reference them.
+        for name, pk in self._next_pk.items():
+            self.connection.execute(
+                sa.text("SELECT setval(pg_get_serial_sequence(:table, 'pk'), :pk)"),
+                dict(table=name, pk=pk))
+
+    def _copy(self, table, rows):
+        cols = list(table.c)
+        processors = [c.type.bind_processor(self.connection.dialect) for c in cols]
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for row in rows:
+            out = []
+            for col, proc in zip(cols, processors):
+                # COPY does not evaluate column defaults, so we fill in timestamps.
+                v = row.get(col.key, self._now)
+                v = proc(v) if proc else v
+                out.append('\\N' if v is None else v)
+            writer.writerow(out)
+        buf.seek(0)
+        cursor = self.connection.connection.cursor()
+        cursor.copy_expert(
+            "COPY {0} ({1}) FROM STDIN WITH (FORMAT csv, NULL '\\N')".format(
+                table.name, ', '.join(c.name for c in cols)),
+            buf)
@@ -0,0 +1,258 @@
+"""Load the OOA CLDF dataset into the database of an app.
+
+The `initializedb` scripts of wals3 and ooaclld add their `common.Dataset` and call `main`
+and `prime_cache` with the prefix of their settings, e.g. ``wals3.load_batch_size``.
+"""
+import time
+from collections import defaultdict
+
+from tqdm import tqdm
+import sqlalchemy
+from zope.sqlalchemy import mark_changed
+
+from clld.cliutil import Data, bibtex2source
+from clld.db.meta import DBSession
+from clld.db.models import common
+
+from ooa import models
+from ooa import fulltext
+from ooa import samples
+from ooa.adapters import Matrix
+from ooa.scripts.bulkload import BulkLoader
+from ooa.scripts.parsing import TableReader, SOURCES, record
+from ooa.scripts import references
+from ooa.scripts.references import Resolver
+from ooa.util import bump_data_version, with_icons
+
+__all__ = [
+    'BATCH_SIZE', 'FEATURESETS', 'main', 'prime_cache',
+    'parameter', 'language', 'code_id', 'code', 'unit', 'contributor', 'featureset']
+
+# Number of rows buffered before they are written with one executemany (or COPY).
+BATCH_SIZE = 5000
+#: The feature sets are the domain of a single unit parameter.
+FEATURESETS = dict(id='featuresets', name='Feature sets')
+
+
+def main(args, ds, prefix, icons):
+    """Load the CLDF dataset `ds`.
+
+    :param prefix: Prefix of the ``load_*`` settings of the app.
+    :param icons: Marker icons for the codes of a parameter, in order.
+    """
+    start = time.time()
+    settings = getattr(args, 'settings', None) or {}
+    data = Data()
+
+    loader = BulkLoader(DBSession, batch_size=int(settings.get(
+        prefix + '.load_batch_size', BATCH_SIZE)))
+    pks = defaultdict(dict)
+    # Tables are read in-process, unless a pool of parser processes is configured.
+    processes = int(settings.get(prefix + '.load_processes', 1))
+
+    with TableReader(
+            ds,
+            [
+                (SOURCES, None),
+                ('ParameterTable', parameter),
+                ('LanguageTable', language),
+                ('codes.csv', code),
+                ('ValueTable', unit),
+                ('contributors.csv', contributor),
+                ('featuresets.csv', featureset),
+            ],
+            processes=processes,
+            cache_dir=settings.get(prefix + '.load_cache')) as reader:
+        for rec in tqdm(reader.rows(SOURCES), desc='Processing sources'):
+            ns = bibtex2source(record(rec), common.Source)
+            data.add(common.Source, ns.id, _obj=ns)
+        DBSession.flush()
+
+        # From here on we only need primary keys, so we don't keep ORM objects around.
+        resolver = Resolver((s.pk, s.id, s.author, s.year) for s in data['Source'].values())
+        DBSession.expunge_all()
+        del data
+
+        for kw in tqdm(reader.rows('ParameterTable'), desc="Processing parameters"):
+            pks['OOAParameter'][kw['id']] = loader.add(models.OOAParameter, **kw)
+        loader.flush()
+
+        # Languages are only loaded if they have values. To avoid a second pass over the
+        # ValueTable, we keep the language rows - bounded by the size of the
+        # LanguageTable - around and insert each language when it is first referenced by
+        # a value.
+        languages = {
+            kw['id']: kw
+            for kw in tqdm(reader.rows('LanguageTable'), desc='Processing languages')}
+
+        for kw in with_icons(tqdm(reader.rows('codes.csv'), desc="Processing codes"), icons):
+            kw['parameter_pk'] = pks['OOAParameter'][kw['parameter_pk']]
+            pks['DomainElement'][kw['id']] = loader.add(models.OOACode, **kw)
+        loader.flush()
+
+        # read value table
+        for kw in tqdm(reader.rows('ValueTable'), desc="Processing values"):
+            if kw['language_id'] not in pks['OOALanguage']:
+                pks['OOALanguage'][kw['language_id']] = loader.add(
+                    models.OOALanguage, **languages.pop(kw['language_id']))
+            kw['language_pk'] = pks['OOALanguage'][kw['language_id']]
+            kw['parameter_id'] = pks['OOAParameter'][kw['parameter_id']]
+            refs = resolver('OOAUnit', kw['id'], kw.pop('references'))
+            upk = loader.add(models.OOAUnit, **kw)
+            for spk, ref in refs:
+                loader.add(
+                    models.OOAUnitReference,
+                    unit_pk=upk,
+                    source_pk=spk,
+                    key=ref.key,
+                    description=ref.pages)
+        loader.flush()
+
+        for kw in tqdm(reader.rows('contributors.csv'), desc="Processing contributors"):
+            loader.add(common.Contributor, **kw)
+
+        featuresets_pk = loader.add(common.UnitParameter, **FEATURESETS)
+        for kw in tqdm(reader.rows('featuresets.csv'), desc='Processing featuresets'):
+            loader.add(models.OOAFeatureSet, unitparameter_pk=featuresets_pk, **kw)
+        loader.flush()
+
+    fulltext.rebuild(loader.connection)
+
+    resolver.report(args.log, settings.get(prefix + '.load_diagnostics'))
+    bump_data_version()
+    args.log.info('Loaded {0} in {1:.1f}s'.format(
+        ', '.join('{0} {1}'.format(n, k) for k, n in sorted(loader.counts.items())),
+        time.time() - start))
+
+
+def prime_cache(args, prefix):
+    """Store the counts of the loaded objects and write the download matrix.
+
+    :param prefix: Name of the app, also the prefix of its ``download_dir`` setting.
+    """
+    # Counts are written through the connection, bypassing the ORM, so we must tell the
+    # transaction manager to commit.
+    mark_changed(DBSession())
+    de = common.DomainElement.__table__
+    fs = common.UnitDomainElement.__table__
+    language_count = sqlalchemy.func.count(sqlalchemy.distinct(models.OOAUnit.language_pk))
+
+    # One GROUP BY query per count, instead of one query per object.
+    _store_counts(models.OOAParameter, 'representation', DBSession.query(
+        models.OOAUnit.parameter_id, language_count).group_by(models.OOAUnit.parameter_id))
+    _store_counts(models.OOACode, 'representation', DBSession.query(
+        de.c.pk, sqlalchemy.func.count(models.OOAUnit.pk))
+        .select_from(models.OOAUnit)
+        .join(de, de.c.id == models.OOAUnit.code_id)
+        .group_by(de.c.pk))
+    _store_counts(models.OOALanguage, 'representation', DBSession.query(
+        models.OOAUnit.language_pk, sqlalchemy.func.count(models.OOAUnit.pk))
+        .select_from(models.OOAUnit)
+        .group_by(models.OOAUnit.language_pk))
+    _store_counts(models.OOAFeatureSet, 'count_parameters', DBSession.query(
+        fs.c.pk, sqlalchemy.func.count(models.OOAParameter.pk))
+        .select_from(models.OOAParameter)
+        .join(fs, fs.c.id == models.OOAParameter.feature_set)
+        .group_by(fs.c.pk))
+    _store_counts(models.OOAFeatureSet, 'representation', DBSession.query(
+        fs.c.pk, language_count)
+        .select_from(models.OOAUnit)
+        .join(models.OOAParameter, models.OOAParameter.pk == models.OOAUnit.parameter_id)
+        .join(fs, fs.c.id == models.OOAParameter.feature_set)
+        .group_by(fs.c.pk))
+    bump_data_version()
+
+    settings = getattr(args, 'settings', None) or {}
+    Matrix(common.Language, prefix, directory=settings.get(prefix + '.download_dir'))\
+        .create(None, verbose=False)
+
+
+def _store_counts(model, column, query):
+    """Set `column` of all rows of `model` to the counts per pk returned by `query`."""
+    table = model.__table__
+    DBSession.execute(table.update().values({column: 0}))
+    counts = [{'_pk': pk, '_count': n} for pk, n in query]
+    if counts:
+        DBSession.execute(
+            table.update()
+            .where(table.c.pk == sqlalchemy.bindparam('_pk'))
+            .values({column: sqlalchemy.bindparam('_count')}),
+            counts)
+
+
+# Converters from CLDF rows to keyword arguments for BulkLoader.add. They run in the
+# parser processes, so foreign keys are passed as CLDF IDs, to be resolved by the writer.
+def parameter(row):
+    return dict(
+        id=row["ParameterID"],
+        # parameter_id=row["ParameterID"],
+        # unitparameter_pk=row["ParameterID"],
+        feature_set=row["FeatureSet"],
+        question=row["Question"],
+        datatype=row["datatype"],
+        visualization=row["VisualizationOnly"],
+    )
+
+
+def language(row):
+    # Boolean columns are read as True, False or None.
+    flags = {name: bool(row[col]) for name, col in samples.SAMPLES.items()}
+    return dict(
+        id=row['Glottocode'],
+        glottocode=row['Glottocode'],
+        name=row['Name'],
+        latitude=row['Latitude'],
+        longitude=row['Longitude'],
+        macroarea=row['Macroarea'],
+        iso=row["ISO639P3code"],
+        family_id=row["Family_ID"],
+        language_id=row["Language_ID"],
+        family_name=row["Family_Name"],
+        samples=samples.mask(name for name, flag in flags.items() if flag),
+        **flags
+    )
+
+
+def code_id(s):
+    """The ID of a code, as used for the code itself and for the units referring to it."""
+    return (s or "").replace(".", "").replace("]", "")
+
+
+def code(row):
+    return dict(
+        id=code_id(row['CodeID']),
+        description=row['Description'],
+        jsondata={'Visualization': row['Visualization']},
+        parameter_pk=row['ParameterID'].replace(".", ""))
+
+
+def unit(row):
+    return dict(
+        # TODO: this would be the way to refer to another resource from a table
+        # parameter = relationship('Parameter', innerjoin=True, backref='valuesets')
+        # then accessable via self.parameter.(...)
+        id=row["ID"],
+        language_id=row["LanguageID"],
+        # TODO: don't do this, acces language table via language_pk to display languages
+        parameter_id=row["ParameterID"].replace(".", ""),
+        code_id=code_id(row["CodeID"]),
+        value=row["Value"],
+        remark=row["Remark"],
+        references=references.parse(row["Source"]),
+        coder=row["Coder"],
+    )
+
+
+def contributor(row):
+    return dict(id=row['ContributorID'], name=row['Name'])
+
+
+def featureset(row):
+    return dict(
+        id=row['FeatureSetID'],
+        name=row['Name'],
+        domains=row['Domain'],
+        authors=";".join(row['Authors']),
+        contributors=";".join(row['Contributors'] or [""]),
+        filename=row['Filename'] or ""
+    )
@@ -0,0 +1,200 @@
+"""Read and convert CLDF tables in worker processes.
+
+`pycldf.Dataset.iter_rows` does per-cell type conversion and is the most expensive part of
+a database load. `TableReader` runs one parsing job per table in a process pool; each job
+passes its converted rows back in chunks through a bounded queue. The database writer
+consumes the tables one after another in the main process, so parsing of later tables
+overlaps with writing earlier ones, while the bounded queues keep memory use flat.
+
+If a cache directory is given, the converted rows of each table are also pickled to disk,
+keyed by the SHA-256 of the table file, the metadata, the source of the module defining the
+converter and `CACHE_VERSION`, so unchanged tables are not parsed again on the next load.
+"""
+import os
+import sys
+import queue
+import pickle
+import hashlib
+import pathlib
+import multiprocessing
+import concurrent.futures
+
+import pycldf
+from clld.lib.bibtex import Database, Record
+
+__all__ = ['TableReader', 'SOURCES', 'record']
+
+#: Pseudo table name to read the BibTeX file of a dataset.
+SOURCES = 'sources'
+#: Version of the cached rows - to be increased whenever the conversion changes in a way the
+#: source of the converter modules does not show, e.g. in the code they call.
+CACHE_VERSION = 1
+
+
+def iter_records(ds):
+    for rec in Database.from_file(ds.bibpath):
+        # Record instances cannot be pickled, so we pass their constituents.
+        yield rec.genre.value, rec.id, list(rec.items())
+
+
+def record(item):
+    genre, id_, fields = item
+    return Record(genre, id_, **dict(fields))
+
+
+def _sha256(p, h=None):
+    h = h or hashlib.sha256()
+    with pathlib.Path(p).open('rb') as f:
+        for block in iter(lambda: f.read(2 ** 16), b''):
+            h.update(block)
+    return h
+
+
+def cache_path(cache_dir, ds, table, converter):
+    """Path of the cache file for the converted rows of `table`.
+
+    The name changes whenever the table file, the metadata, the module of the converter -
+    including the helpers it calls there - or `CACHE_VERSION` changes, which invalidates the
+    cache.
+    """
+    fname = ds.bibpath if table == SOURCES else ds.directory / str(ds[table].url)
+    h = _sha256(ds.tablegroup._fname, _sha256(fname))
+    h.update(str(CACHE_VERSION).encode('utf8'))
+    if converter:
+        h.update('{0.__module__}.{0.__qualname__}'.format(converter).encode('utf8'))
+        _sha256(sys.modules[converter.__module__].__file__, h)
+    return pathlib.Path(cache_dir) / '{0}-{1}.pickle'.format(
+        pathlib.Path(str(fname)).stem, h.hexdigest())
+
+
+def iter_chunks(ds, table, converter, chunksize, cache_dir=None):
+    """Yield lists of converted rows, read from the cache if possible."""
+    if cache_dir:
+        p = cache_path(cache_dir, ds, table, converter)
+        if p.exists():
+            with p.open('rb') as f:
+                while True:
+                    try:
+                        yield pickle.load(f)
+                    except EOFError:
+                        return
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.parent / '{0}.{1}'.format(p.name, os.getpid())
+        try:
+            with tmp.open('wb') as f:
+                for chunk in iter_chunks(ds, table, converter, chunksize):
+                    pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    yield chunk
+        except BaseException:
+            # Incomplete - e.g. because the consumer stopped early - so not cached.
+            tmp.unlink()
+            raise
+        # Stale cache files for the same table are removed.
+        for stale in p.parent.glob('{0}-*.pickle'.format(p.name.rpartition('-')[0])):
+            stale.unlink()
+        tmp.replace(p)
+        return
+
+    rows = iter_records(ds) if table == SOURCES else ds.iter_rows(table)
+    chunk = []
+    for row in rows:
+        chunk.append(converter(row) if converter else row)
+        if len(chunk) >= chunksize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _parse(metadata, table, converter, q, chunksize, cache_dir):
+    try:
+        ds = pycldf.Dataset.from_metadata(metadata)
+        for chunk in iter_chunks(ds, table, converter, chunksize, cache_dir=cache_dir):
+            q.put(chunk)
+    except Exception as e:  # pragma: no cover
+        q.put(e)
+        raise
+    q.put(None)
+
+
+class TableReader(object):
+
+    """Parse CLDF tables in parallel, yielding converted rows per table.
+
+    >>> with TableReader(ds, [('ParameterTable', parameter)], processes=4) as reader:
+    ...     for row in reader.rows('ParameterTable'):
+    ...         loader.add(models.OOAParameter, **row)
+
+    :param tables: `list` of pairs (table name, converter function). Converters are called\
+    in the worker processes, so they must be picklable, i.e. module level functions.
+    :param processes: Size of the process pool. With `processes <= 1` tables are read\
+    lazily in the calling process.
+    :param maxsize: Maximal number of chunks buffered per table.
+    :param cache_dir: Directory to cache converted rows in, or `None` to disable caching.
+    """
+
+    def __init__(self, ds, tables, processes=None, maxsize=20, chunksize=1000, cache_dir=None):
+        self.ds = ds
+        self.tables = tables
+        self.processes = multiprocessing.cpu_count() if processes is None else processes
+        self.maxsize = maxsize
+        self.chunksize = chunksize
+        self.cache_dir = cache_dir
+        self._manager = None
+        self._executor = None
+        self._jobs = {}
+
+    def __enter__(self):
+        if self.processes > 1:
+            self._manager = multiprocessing.Manager()
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=min(self.processes, len(self.tables)))
+            # Jobs are submitted in the order the tables will be consumed. Thus, a table
+            # the writer waits for is either being parsed or will be, once the tables
+            # before it are done.
+            for table, converter in self.tables:
+                q = self._manager.Queue(maxsize=self.maxsize)
+                self._jobs[table] = (q, self._executor.submit(
+                    _parse,
+                    str(self.ds.tablegroup._fname),
+                    table,
+                    converter,
+                    q,
+                    self.chunksize,
+                    self.cache_dir))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._executor:
+            for _, future in self._jobs.values():
+                future.cancel()
+            # Shutting down the manager first unblocks workers still waiting to put rows
+            # of tables which have not been consumed.
+            self._manager.shutdown()
+            self._executor.shutdown()
+
+    def rows(self, table):
+        converter = dict(self.tables)[table]
+        if self._executor is None:
+            for chunk in iter_chunks(
+                    self.ds, table, converter, self.chunksize, cache_dir=self.cache_dir):
+                for row in chunk:
+                    yield row
+            return
+
+        q, future = self._jobs.pop(table)
+        while True:
+            try:
+                chunk = q.get(timeout=1)
+            except queue.Empty:
+                if future.done():
+                    # The worker died without signalling the end of the table.
+                    future.result()
+                    raise ValueError('Parsing {0} stopped unexpectedly'.format(table))
+                continue
+            if chunk is None:
+                break
+            if isinstance(chunk, Exception):
+                raise chunk
+            for row in chunk:
+                yield row
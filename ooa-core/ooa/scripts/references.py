@@ -0,0 +1,125 @@
+"""Parse the references in Source cells and resolve them to sources.
+
+Source cells in the ValueTable list one or more references, separated by semicolons, in
+one of two forms:
+
+- BibTeX key with optional page spec, e.g. ``fleck2003[1163]``,
+- author-year citation, e.g. ``(Fleck 2003, 1163)`` or ``Fleck 2003: 1163``.
+
+Parsing happens in the converters, i.e. in the parser processes; resolution needs the
+sources and happens in the database writer. References which cannot be resolved are
+collected as `Diagnostic` records.
+"""
+import re
+import csv
+import collections
+
+__all__ = ['Reference', 'Diagnostic', 'parse', 'Resolver']
+
+Reference = collections.namedtuple('Reference', 'key author year pages')
+Diagnostic = collections.namedtuple('Diagnostic', 'table id reference reason')
+
+KEY_PATTERN = re.compile(r'^(?P<key>[^\s\[\]();,]+)\s*(\[(?P<pages>[^\]]*)\]?)?$')
+AUTHOR_YEAR_PATTERN = re.compile(
+    r'^\(?\s*(?P<author>[^\d(),:;]+?)\s*(et al\.?)?\s*\(?(?P<year>\d{4}[a-z]?)\)?'
+    r'\s*([,:]\s*(?P<pages>[^)]*?))?\s*\)?$')
+
+
+def _split(cell):
+    """Split a cell on semicolons which are not enclosed in brackets or parentheses."""
+    depth, chunk = 0, []
+    for c in cell:
+        if c in '[(':
+            depth += 1
+        elif c in '])':
+            depth = max(depth - 1, 0)
+        elif c == ';' and not depth:
+            yield ''.join(chunk).strip()
+            chunk = []
+            continue
+        chunk.append(c)
+    yield ''.join(chunk).strip()
+
+
+def parse(cell):
+    """
+    :return: `list` of `Reference` - unparseable references have neither key nor author.
+    """
+    res = []
+    for ref in _split(cell or ''):
+        if not ref:
+            continue
+        match = KEY_PATTERN.match(ref)
+        if match:
+            res.append(Reference(match.group('key'), None, None, match.group('pages')))
+            continue
+        match = AUTHOR_YEAR_PATTERN.match(ref)
+        if match:
+            res.append(Reference(
+                ref, match.group('author').strip(), match.group('year'), match.group('pages')))
+        else:
+            res.append(Reference(ref, None, None, None))
+    return res
+
+
+def surname(author):
+    """The surname of the first author in a BibTeX author field - or of a citation."""
+    author = re.split(r'\s+and\s+|\s*&\s*', author.strip())[0]
+    if ',' in author:
+        return author.split(',')[0].strip().lower()
+    return author.split()[-1].lower() if author.split() else ''
+
+
+class Resolver(object):
+
+    """Map references to source pks, keeping track of what could not be resolved.
+
+    >>> resolver = Resolver((s.pk, s.id, s.author, s.year) for s in sources)
+    >>> [pk for pk, ref in resolver('OOAUnit', '1', parse('(Fleck 2003, 1163)'))]
+    """
+
+    def __init__(self, sources):
+        self.keys = {}
+        self.author_year = collections.defaultdict(set)
+        for pk, key, author, year in sources:
+            self.keys[key] = pk
+            if author and year:
+                self.author_year[(surname(author), str(year).strip())].add(pk)
+        self.diagnostics = []
+
+    def __call__(self, table, id_, references):
+        """
+        :return: `list` of pairs (source pk, `Reference`) for the resolved references.
+        """
+        res = []
+        for ref in references:
+            if ref.author:
+                pks = self.author_year.get((surname(ref.author), ref.year), set())
+                if len(pks) == 1:
+                    res.append((list(pks)[0], ref))
+                    continue
+                reason = 'ambiguous citation' if pks else 'no source for citation'
+            elif ref.key in self.keys:
+                res.append((self.keys[ref.key], ref))
+                continue
+            else:
+                reason = 'missing source key' \
+                    if KEY_PATTERN.match(ref.key) else 'unparseable reference'
+            self.diagnostics.append(Diagnostic(table, id_, ref.key, reason))
+        return res
+
+    def report(self, log, fname=None):
+        """Log the number of diagnostics per reason and write all of them to a CSV file."""
+        if not self.diagnostics:
+            return
+        counts = collections.Counter(d.reason for d in self.diagnostics)
+        log.warning('{0} unresolved references in {1} rows: {2}{3}'.format(
+            len(self.diagnostics),
+            len(set((d.table, d.id) for d in self.diagnostics)),
+            ', '.join('{0} {1}'.format(n, reason) for reason, n in sorted(counts.items())),
+            ' - see {0}'.format(fname) if fname else ''))
+        if fname:
+            with open(str(fname), 'w', encoding='utf8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(Diagnostic._fields)
+                writer.writerows(self.diagnostics)
@@ -0,0 +1,118 @@
+"""Code distributions of the OOA features, per macroarea, family and sample.
+
+All coded units - deduplicated to one per language and code - are loaded at once into a
+columnar snapshot of `numpy` arrays: parameter, language and code of each unit, sorted by
+parameter, plus the macroarea, family and sample membership of each language. The units of
+a parameter are then a slice, and each breakdown is a single `numpy.bincount`.
+
+The snapshot is kept per process and rebuilt when the data version changes.
+"""
+import threading
+import collections
+
+import numpy
+
+from clld.db.meta import DBSession
+
+from ooa.models import OOALanguage, OOAUnit
+from ooa.samples import SAMPLES
+from ooa.util import data_version
+
+__all__ = ['Snapshot', 'snapshot']
+
+SNAPSHOT = {}
+_snapshot_lock = threading.Lock()
+
+
+def _factorize(values):
+    """Integer codes for `values` and the sorted unique values, with `None` mapped to -1."""
+    labels = sorted(set(v for v in values if v))
+    index = {v: i for i, v in enumerate(labels)}
+    return numpy.array([index.get(v, -1) for v in values], dtype=numpy.int32), labels
+
+
+class Snapshot(object):
+
+    """Columnar snapshot of the coded units.
+
+    :param languages: Iterable of (pk, macroarea, family_id, samples bitmask) tuples.
+    :param units: Iterable of (parameter pk, language pk, code id) triples.
+    """
+
+    def __init__(self, languages, units):
+        languages = list(languages)
+        index = {row[0]: i for i, row in enumerate(languages)}
+        self.macroarea, self.macroareas = _factorize([row[1] for row in languages])
+        self.family, self.families = _factorize([row[2] for row in languages])
+        # One column per sample, from the bits of the masks.
+        masks = numpy.array([row[3] or 0 for row in languages], dtype=numpy.int64)
+        self.samples = (masks[:, None] >> numpy.arange(len(SAMPLES))) & 1 == 1
+
+        units = sorted(set((p, index[l], c) for p, l, c in units if l in index))
+        self.parameter = numpy.array([u[0] for u in units], dtype=numpy.int64)
+        self.language = numpy.array([u[1] for u in units], dtype=numpy.int32)
+        self.code, self.codes = _factorize([u[2] for u in units])
+
+    def _slice(self, parameter_pk):
+        return slice(*numpy.searchsorted(self.parameter, [parameter_pk, parameter_pk + 1]))
+
+    def _counts(self, groups, labels, codes, columns):
+        """Matrix of unit counts per group and code, as nested `dict` of non-zero counts."""
+        valid = groups >= 0
+        matrix = numpy.bincount(
+            groups[valid] * len(columns) + codes[valid],
+            minlength=len(labels) * len(columns)).reshape((len(labels), len(columns)))
+        res = collections.OrderedDict()
+        for i, j in zip(*numpy.nonzero(matrix)):
+            res.setdefault(labels[i], collections.OrderedDict())[columns[j]] = int(
+                matrix[i, j])
+        return res
+
+    def stats(self, parameter_pk):
+        """Code distributions for a parameter.
+
+        Languages without macroarea or family are only counted in the totals.
+        """
+        s = self._slice(parameter_pk)
+        languages = self.language[s]
+        # Renumber the codes of the parameter to 0..n-1.
+        code_indices, codes = numpy.unique(self.code[s], return_inverse=True)
+        columns = [self.codes[i] for i in code_indices]
+        total = numpy.bincount(codes, minlength=len(columns))
+        samples = collections.OrderedDict()
+        for k, name in enumerate(SAMPLES):
+            members = self.samples[languages, k]
+            counts = numpy.bincount(codes[members], minlength=len(columns))
+            samples[name] = collections.OrderedDict(
+                (c, int(n)) for c, n in zip(columns, counts) if n)
+        return collections.OrderedDict([
+            ('codes', columns),
+            ('languages', int(numpy.unique(languages).size)),
+            ('total', collections.OrderedDict(
+                (c, int(n)) for c, n in zip(columns, total))),
+            ('macroarea', self._counts(
+                self.macroarea[languages], self.macroareas, codes, columns)),
+            ('family', self._counts(
+                self.family[languages], self.families, codes, columns)),
+            ('sample', samples),
+        ])
+
+
+def snapshot(req):
+    """The `Snapshot` for the current data version."""
+    version = data_version(req)
+    with _snapshot_lock:
+        if version and version in SNAPSHOT:
+            return SNAPSHOT[version]
+        res = Snapshot(
+            DBSession.query(
+                OOALanguage.pk, OOALanguage.macroarea, OOALanguage.family_id,
+                OOALanguage.samples),
+            DBSession.query(OOAUnit.parameter_id, OOAUnit.language_pk, OOAUnit.code_id)
+            .filter(OOAUnit.code_id.isnot(None))
+            .filter(OOAUnit.code_id != ''))
+        if version:
+            # Only the snapshot for the current data version is kept.
+            SNAPSHOT.clear()
+            SNAPSHOT[version] = res
+        return res
@@ -0,0 +1,41 @@
+<%inherit file="${context.get('request').registry.settings.get('clld.app_template', 'app.mako')}"/>
+<%! active_menu_item = "parameters" %>
+<%block name="title">Combination ${ctx.name}</%block>
+
+<h2>Combination of features</h2>
+
+<ul>
+    % for parameter in ctx.parameters:
+    <li>${h.link(request, parameter, label=parameter.id)}: ${parameter.question or parameter.name}</li>
+    % endfor
+</ul>
+
+${map.render()}
+
+<h3>Languages per combination of codes</h3>
+<% others = ctx.codes[2] if len(ctx.codes) > 2 else [None] %>
+% for k, other in enumerate(others):
+<table class="table table-condensed table-nonfluid">
+    <thead>
+        <tr>
+            <th>${ctx.parameters[0].id} \ ${ctx.parameters[1].id}${' ({0})'.format(other) if other else ''}</th>
+            % for code in ctx.codes[1]:
+            <th>${code}</th>
+            % endfor
+        </tr>
+    </thead>
+    <tbody>
+        % for i, code in enumerate(ctx.codes[0]):
+        <tr>
+            <th>${code}</th>
+            % for j, _ in enumerate(ctx.codes[1]):
+            <td>${ctx.table[i, j, k] if other else ctx.table[i, j]}</td>
+            % endfor
+        </tr>
+        % endfor
+    </tbody>
+</table>
+% endfor
+<p>
+    <a href="${request.route_url('ooacombination_alt', ids=ctx.id)}">JSON</a>
+</p>
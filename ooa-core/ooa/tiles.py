@@ -0,0 +1,152 @@
+"""Clustered language points for map tiles.
+
+Tiles are addressed as in slippy maps - by zoom level `z` and column `x` and row `y` of the
+Web Mercator grid of 2^z x 2^z tiles, see
+https://wiki.openstreetmap.org/wiki/Slippy_map_tilenames. Up to zoom level `MAX_ZOOM` each
+tile is divided into `GRID` x `GRID` cells, and the languages in a cell are merged into one
+cluster, placed at their mean position. Above `MAX_ZOOM` languages are served one by one.
+
+The index - clusters per tile and zoom level, and the languages per tile at `MAX_ZOOM` - is
+computed from the coordinates of all languages at once and cached per data version - and
+combination of samples, see `ooa.samples` - so a tile request is a lookup.
+"""
+import math
+import threading
+import collections
+
+from clld.db.meta import DBSession
+
+from ooa.models import OOALanguage
+from ooa.util import data_version
+from ooa import samples
+
+__all__ = ['TileIndex', 'tile_index']
+
+#: Highest zoom level with clusters.
+MAX_ZOOM = 8
+#: Cells per tile and dimension - a power of 2, so that cells nest across zoom levels.
+GRID = 8
+#: Decimal places of coordinates, i.e. a precision of about 100m.
+PRECISION = 3
+#: Latitude limit of Web Mercator.
+MAX_LATITUDE = 85.0511
+
+INDEX = {}
+_index_lock = threading.Lock()
+
+
+def world(latitude, longitude):
+    """Web Mercator coordinates of a point, scaled to [0, 1)."""
+    lat = math.radians(max(min(latitude, MAX_LATITUDE), -MAX_LATITUDE))
+    x = (longitude + 180) / 360
+    y = (1 - math.log(math.tan(lat) + 1 / math.cos(lat)) / math.pi) / 2
+    return min(max(x, 0), 1 - 1e-12), min(max(y, 0), 1 - 1e-12)
+
+
+def coordinates(x, y):
+    """GeoJSON coordinates, i.e. (longitude, latitude), of world coordinates."""
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+    return [round(x * 360 - 180, PRECISION), round(lat, PRECISION)]
+
+
+class TileIndex(object):
+
+    """Clusters and languages per tile.
+
+    >>> index = TileIndex([('abcd1234', 'Abc', 10.5, 20.25)])
+    >>> index.tile(0, 0, 0)['features'][0]['properties']
+    {'count': 1, 'language': {'id': 'abcd1234', 'name': 'Abc'}}
+
+    :param languages: Iterable of (id, name, latitude, longitude) tuples.
+    """
+
+    def __init__(self, languages, max_zoom=MAX_ZOOM, grid=GRID):
+        self.max_zoom = max_zoom
+        self.shift = int(math.log2(grid))
+        # Clusters are lists [count, sum of x, sum of y, language], where language is the
+        # (id, name) pair of a single language and None for bigger clusters.
+        cells = {}
+        self.points = collections.defaultdict(list)
+        n = 2 ** max_zoom
+        for id_, name, latitude, longitude in languages:
+            x, y = world(latitude, longitude)
+            self.points[int(x * n), int(y * n)].append((x, y, (id_, name)))
+            cell = (int(x * n * grid), int(y * n * grid))
+            if cell in cells:
+                cluster = cells[cell]
+                cluster[0] += 1
+                cluster[1] += x
+                cluster[2] += y
+                cluster[3] = None
+            else:
+                cells[cell] = [1, x, y, (id_, name)]
+        self.clusters = {}
+        for z in range(max_zoom, -1, -1):
+            for (cx, cy), cluster in cells.items():
+                self.clusters.setdefault((z, cx >> self.shift, cy >> self.shift), [])\
+                    .append(cluster)
+            if z:
+                # The cells of the next lower zoom level each cover 2 x 2 cells.
+                parents = {}
+                for (cx, cy), (count, x, y, language) in cells.items():
+                    parent = parents.get((cx >> 1, cy >> 1))
+                    if parent:
+                        parent[0] += count
+                        parent[1] += x
+                        parent[2] += y
+                        parent[3] = None
+                    else:
+                        parents[cx >> 1, cy >> 1] = [count, x, y, language]
+                cells = parents
+
+    def tile(self, z, x, y):
+        """The GeoJSON FeatureCollection for a tile."""
+        features = []
+        if z <= self.max_zoom:
+            for count, sx, sy, language in self.clusters.get((z, x, y), []):
+                features.append(self._feature(sx / count, sy / count, count, language))
+        else:
+            n, shift = 2 ** z, z - self.max_zoom
+            for px, py, language in self.points.get((x >> shift, y >> shift), []):
+                if int(px * n) == x and int(py * n) == y:
+                    features.append(self._feature(px, py, 1, language))
+        return {
+            'type': 'FeatureCollection',
+            'properties': {'z': z, 'x': x, 'y': y},
+            'features': features}
+
+    @staticmethod
+    def _feature(x, y, count, language):
+        properties = {'count': count}
+        if language:
+            properties['language'] = {'id': language[0], 'name': language[1]}
+        return {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': coordinates(x, y)},
+            'properties': properties}
+
+
+def tile_index(req, mask=0):
+    """The `TileIndex` of all languages with coordinates, for the current data version.
+
+    :param mask: Bitmask of samples - only languages in all these samples are included.
+    """
+    version = data_version(req)
+    # The index is built under the lock, so concurrent requests build it only once.
+    with _index_lock:
+        if version and (version, mask) in INDEX:
+            return INDEX[version, mask]
+        pks = set(samples.index(req).pks(mask)) if mask else None
+        query = DBSession.query(
+            OOALanguage.pk, OOALanguage.id, OOALanguage.name, OOALanguage.latitude,
+            OOALanguage.longitude)\
+            .filter(OOALanguage.latitude.isnot(None))\
+            .filter(OOALanguage.longitude.isnot(None))\
+            .order_by(OOALanguage.pk)
+        index = TileIndex(row[1:] for row in query if pks is None or row[0] in pks)
+        if version:
+            # Only indexes for the current data version are kept.
+            for key in [k for k in INDEX if k[0] != version]:
+                del INDEX[key]
+            INDEX[version, mask] = index
+        return index
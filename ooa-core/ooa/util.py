@@ -0,0 +1,89 @@
+"""Helpers shared by the OOA apps."""
+import datetime
+import functools
+import collections
+
+from clldutils import svg
+from clld.db.meta import DBSession
+from clld.db.models.common import Dataset
+
+__all__ = [
+    'data_version', 'bump_data_version', 'normalized_icon', 'icon_url', 'pie_url',
+    'with_icons']
+
+
+def data_version(req=None):
+    """The data version stamp of the database, or `None` if it has none.
+
+    Caches of data derived from the database are keyed by this stamp; it changes whenever
+    `initializedb` or `prime_cache` runs.
+    """
+    dataset = getattr(req, 'dataset', None) or Dataset.first()
+    return (dataset.jsondata or {}).get('data_version') if dataset else None
+
+
+def bump_data_version():
+    """Assign a new data version stamp to the dataset."""
+    dataset = Dataset.first()
+    if dataset:
+        dataset.update_jsondata(
+            data_version=datetime.datetime.now(datetime.timezone.utc).isoformat())
+        DBSession.flush()
+        return dataset.jsondata['data_version']
+
+
+@functools.lru_cache(maxsize=1024)
+def normalized_icon(spec):
+    """Normalize an icon spec - from jsondata or the URL - to shape and 6-digit colour.
+
+    >>> normalized_icon("c00d'")
+    'c0000dd'
+    """
+    if "'" in spec:
+        spec = spec.split("'")[0]
+    if len(spec) > 4 and len(spec) != 7:
+        spec = spec[:4]
+    if len(spec) == 4:
+        spec = spec[0] + 2 * spec[1] + 2 * spec[2] + 2 * spec[3]
+    return spec
+
+
+@functools.lru_cache(maxsize=1024)
+def icon_url(spec):
+    """The data URL of the SVG marker for a normalized icon spec, or '' if it is invalid.
+
+    Maps ask for the same few markers for each of their points, so the SVG is built and
+    encoded only once per spec.
+    """
+    if spec.startswith('a'):
+        return svg.data_url(svg.icon('c000000', opacity='0'))
+    try:
+        return svg.data_url(svg.icon(spec))
+    except KeyError:
+        return ''
+
+
+@functools.lru_cache(maxsize=1024)
+def pie_url(specs):
+    """The data URL of a pie chart with one slice in the colour of each icon spec.
+
+    :param specs: `tuple` of normalized icon specs.
+    """
+    return svg.data_url(svg.pie([1] * len(specs), [spec[1:] for spec in specs]))
+
+
+def with_icons(codes, icons):
+    """Number the codes of each parameter and assign them a marker icon, in this order.
+
+    The maps take the marker of a code from its jsondata, so a code looks the same on all
+    maps, whichever other codes are shown.
+
+    :param codes: Keyword arguments of `OOACode` objects.
+    :param icons: `list` of icon specs.
+    """
+    numbers = collections.Counter()
+    for kw in codes:
+        numbers[kw['parameter_pk']] += 1
+        kw['number'] = numbers[kw['parameter_pk']]
+        kw['jsondata'] = dict(kw.get('jsondata') or {}, icon=icons[(kw['number'] - 1) % len(icons)])
+        yield kw
@@ -0,0 +1,134 @@
+"""Views of the OOA data shared by the wals3 and ooaclld apps.
+
+The apps add the routes - with their own URL patterns - and include this module.
+"""
+from pyramid.view import view_config
+from pyramid.response import FileResponse, Response
+from pyramid.httpexceptions import HTTPNotFound
+
+from clld.db.meta import DBSession
+from clld.db.models.common import Language
+
+from ooa import fulltext, maplayers, tiles, combinations, stats, samples
+from ooa.adapters import Matrix
+from ooa.maps import OOACombinationMap
+from ooa.models import OOAParameter
+
+
+@view_config(route_name='fulltext', renderer='json')
+def search(req):
+    """Ranked full-text search over features, codes, values and languages.
+
+    Parameters: `q` - the search string, `kind` - a comma separated list of kinds of
+    objects to search, see `ooa.fulltext.KINDS`, `limit` - maximal number of results.
+    """
+    q = req.params.get('q', '')
+    kinds = fulltext.request_kinds(req)
+    try:
+        limit = min(max(int(req.params.get('limit', 20)), 1), 100)
+    except ValueError:
+        limit = 20
+    hits = fulltext.search(q, kinds=kinds, limit=limit)
+    objects = {}
+    for kind in set(kind for kind, _, _ in hits):
+        model = fulltext.KINDS[kind][0]
+        for obj in DBSession.query(model).filter(
+                model.pk.in_([pk for k, pk, _ in hits if k == kind])):
+            objects[kind, obj.pk] = obj
+    return {
+        'query': q,
+        'results': [
+            {
+                'kind': kind,
+                'id': objects[kind, pk].id,
+                'name': objects[kind, pk].name,
+                'url': req.resource_url(objects[kind, pk]),
+                'snippet': snippet,
+            } for kind, pk, snippet in hits if (kind, pk) in objects],
+    }
+
+
+@view_config(route_name='matrix')
+def matrix(req):
+    """The language x parameter matrix built by `prime_cache`, with ETag."""
+    pkg = req.registry.package_name
+    m = Matrix(Language, pkg, directory=req.registry.settings.get('{0}.download_dir'.format(pkg)))
+    ext = req.matchdict['ext']
+    info = m.manifest(req).get(ext)
+    if ext not in m.formats or not info:
+        return HTTPNotFound()
+    response = FileResponse(
+        str(m.files(req)[ext]), request=req, content_type=m.formats[ext])
+    response.etag = info['sha256']
+    return response
+
+
+@view_config(route_name='parameter_geojson')
+def parameter_geojson(req):
+    """GeoJSON for the map of a parameter, gzipped and cached, see `ooa.maplayers`.
+
+    With parameter `layer` - as requested by the map for each of its layers - the
+    FeatureCollection of one code, otherwise the list of all layers.
+    """
+    parameter = DBSession.query(OOAParameter)\
+        .filter(OOAParameter.id == req.matchdict['id']).first()
+    if not parameter:
+        return HTTPNotFound()
+    doc = maplayers.layers(req, parameter, samples.request_mask(req))\
+        .get(req.params.get('layer'))
+    if not doc:
+        return HTTPNotFound()
+    response = Response(
+        body=doc.body, content_type='application/geo+json', conditional_response=True)
+    response.content_encoding = 'gzip'
+    response.vary = 'Accept-Encoding'
+    response.etag = doc.etag
+    if not req.accept_encoding.acceptable_offers(['gzip']):
+        response.decode_content()
+        response.etag = doc.etag + '-identity'
+    return response
+
+
+@view_config(route_name='parameter_stats', renderer='json')
+def parameter_stats(req):
+    """Code distributions of a parameter per macroarea, family and sample, see
+    `ooa.stats`."""
+    parameter = DBSession.query(OOAParameter)\
+        .filter(OOAParameter.id == req.matchdict['id']).first()
+    if not parameter:
+        return HTTPNotFound()
+    res = stats.snapshot(req).stats(parameter.pk)
+    res['parameter'] = parameter.id
+    res.move_to_end('parameter', last=False)
+    return res
+
+
+@view_config(route_name='language_tiles', renderer='json')
+def language_tiles(req):
+    """Clustered languages in a map tile, see `ooa.tiles`."""
+    z, x, y = [int(req.matchdict[k]) for k in 'zxy']
+    if z > 20 or x >= 2 ** z or y >= 2 ** z:
+        return HTTPNotFound()
+    return tiles.tile_index(req, samples.request_mask(req)).tile(z, x, y)
+
+
+@view_config(route_name='ooacombination', renderer='ooacombination.mako')
+def combination(req):
+    """Map and contingency table of the codes of 2 or 3 parameters.
+
+    The parameters are given by their ids, separated by `_`, e.g. ``Appr-01_Attr-01``.
+    """
+    ctx = combinations.combination(req, req.matchdict['ids'].split('_'))
+    if not ctx:
+        return HTTPNotFound()
+    return {'ctx': ctx, 'map': OOACombinationMap(ctx, req)}
+
+
+@view_config(route_name='ooacombination_alt', renderer='json')
+def combination_json(req):
+    """The contingency table of the codes of 2 or 3 parameters, see `combination`."""
+    return combinations.combination(req, req.matchdict['ids'].split('_')) or HTTPNotFound()
+
+
+def includeme(config):
+    config.scan('ooa.views')
@@ -0,0 +1,31 @@
+from setuptools import setup, find_packages
+
+
+setup(
+    name='ooa-core',
+    version='0.0',
+    description='The OOA data model and the code working on it, shared by wals3 and ooaclld',
+    classifiers=[
+        "Programming Language :: Python",
+        "Framework :: Pyramid",
+    ],
+    author='',
+    author_email='',
+    url='',
+    keywords='web pyramid pylons',
+    packages=find_packages(),
+    include_package_data=True,
+    zip_safe=False,
+    install_requires=[
+        'clld',
+        'clldutils',
+        'tqdm',
+        'numpy',
+        'pycldf',
+        'sqlalchemy',
+        'zope.sqlalchemy',
+    ],
+    extras_require={
+        'test': ['pytest'],
+    },
+)
@@ -2,17 +2,19 @@ import collections
 
 from pyramid.config import Configurator
 
-from clld_glottologfamily_plugin import util
+from clld_glottologfamily_plugin import util as family_util
 
-from clldutils import svg
 from clld.interfaces import IMapMarker, IValueSet, IValue, IDomainElement, ILanguage, IParameter
 from clldutils.svg import pie, icon, data_url
 from clld.web.adapters.base import adapter_factory
 from clld.web.app import ClldRequest
+from clld.db.models.common import Language
 
 # we must make sure custom models are known at database initialization!
 from ooaclld import models
 from ooaclld.interfaces import IFeatureSet
+from ooa.adapters import Matrix
+from ooa.util import icon_url, normalized_icon
 
 
 def map_marker(ctx, req):
@@ -27,7 +29,7 @@ def map_marker(ctx, req):
             'v%s' % ctx.domainelement.number,
             ctx.domainelement.jsondata['icon'])
     elif IDomainElement.providedBy(ctx):
-        icon = req.params.get('v%s' % ctx.number, ctx.jsondata['icon'])
+        icon = req.params.get('v%s' % ctx.number, ctx.jsondata.get('icon', 'c000000'))
     elif ILanguage.providedBy(ctx):
         # hard coded icon
         icon = req.params.get(ctx.id, 'c0000dd')
@@ -36,21 +38,10 @@ def map_marker(ctx, req):
         icon = req.params.get(ctx.id, ctx.icon)
 
     if icon:
-        if "'" in icon:
-            icon = icon.split("'")[0]
-        if len(icon) > 4 and len(icon) != 7:
-            icon = icon[:4]
-        if len(icon) == 4:
-            icon = icon[0] + 2*icon[1] + 2*icon[2] + 2*icon[3]
-        if icon.startswith('a'):
-            return svg.data_url(svg.icon('c000000', opacity='0'))
-        try:
-            return svg.data_url(svg.icon(icon))
-        except KeyError:
-            return ''
-
-
-class LanguageByFamilyMapMarker(util.LanguageByFamilyMapMarker):
+        return icon_url(normalized_icon(icon))
+
+
+class LanguageByFamilyMapMarker(family_util.LanguageByFamilyMapMarker):
     def __call__(self, ctx, req):
     
         return super(LanguageByFamilyMapMarker, self).__call__(ctx, req)
@@ -66,9 +57,25 @@ def main(global_config, **settings):
     config.include('clld.web.app')
 
     config.include('clldmpg')
+    config.include('ooa.instrumentation')
+    config.include('ooa.datatables')
+    config.include('ooa.httpcache')
+    # The map of all languages is not loaded tile by tile, as in wals3.
+    config.scan('ooa.views', ignore=['ooa.views.language_tiles'])
 
     config.register_resource('featureset', models.OOAFeatureSet, IFeatureSet, with_index=True)
 
     config.registry.registerUtility(LanguageByFamilyMapMarker(), IMapMarker)
+    config.add_route('fulltext', '/search')
+    config.add_route('parameter_geojson', '/parameters/{id}/geojson')
+    config.add_route('parameter_stats', '/parameters/{id}/stats')
+    config.add_route('ooacombination', r'/ooacombinations/{ids:[^/\.]+}')
+    config.add_route('ooacombination_alt', r'/ooacombinations/{ids:[^/\.]+}.json')
+    config.add_route('matrix', '/ooamatrix.{ext}')
+    config.register_download(Matrix(
+        Language,
+        'ooaclld',
+        directory=settings.get('ooaclld.download_dir'),
+        description="Feature values CSV"))
 
     return config.make_wsgi_app()
@@ -11,9 +11,13 @@ from clld.web.util.helpers import linked_contributors, link, contactmail
 from clld.web.util.htmllib import HTML
 
 from ooaclld.models import OOALanguage, OOAParameter, OOAUnit, OOAFeatureSet
+from ooa import samples
+from ooa.datatables import FullTextCol, FullTextLinkCol, SamplesCol, CountCache, KeysetPagination
 
 
-class Features(datatables.Parameters):
+class Features(CountCache, KeysetPagination, datatables.Parameters):
+    keyset_cols = (OOAParameter.id,)
+
     # def base_query(self, query):
     #     return query.join(Chapter).join(Area)\
     #         .options(contains_eager(Feature.chapter, Chapter.area))
@@ -31,13 +35,16 @@ class Features(datatables.Parameters):
         return [
             IdCol(self, 'id', sClass='left'),
             Col(self, 'FeatureSet', model_col=OOAParameter.feature_set),
-            Col(self, 'Questions', model_col=OOAParameter.question),
+            FullTextCol(self, 'Questions', 'parameter', model_col=OOAParameter.question),
             Col(self, 'Visualization', model_col=OOAParameter.visualization),
             Col(self, 'Datatype', model_col=OOAParameter.datatype),
+            Col(self, 'Languages', model_col=OOAParameter.representation),
         ]
 
 
-class Featuresets(datatables.Unitparameters):
+class Featuresets(CountCache, KeysetPagination, datatables.Unitparameters):
+    keyset_cols = (OOAFeatureSet.id,)
+
     def col_defs(self):
         return [
             IdCol(self, 'id', sClass='left'),
@@ -45,30 +52,45 @@ class Featuresets(datatables.Unitparameters):
             Col(self, 'Authors', model_col=OOAFeatureSet.authors),
             Col(self, 'Contributors', model_col=OOAFeatureSet.contributors),
             Col(self, 'Filename', model_col=OOAFeatureSet.filename),
+            Col(self, 'Features', model_col=OOAFeatureSet.count_parameters),
+            Col(self, 'Languages', model_col=OOAFeatureSet.representation),
         ]
 
 
-class Languages(datatables.Languages):
+class Languages(CountCache, KeysetPagination, datatables.Languages):
+    keyset_cols = (OOALanguage.id,)
+
+    def base_query(self, query):
+        # Restrict the table to a combination of samples passed as URL parameter.
+        mask = samples.request_mask(self.req)
+        return query.filter(samples.condition(mask)) if mask else query
+
     def col_defs(self):
         return [
             IdCol(self, 'id', sTitle='glottocode', sClass='left'),
+            FullTextLinkCol(self, 'name', 'language'),
             Col(self, 'macroarea', model_col=OOALanguage.macroarea),
-            Col(self, 'family_id', model_col=OOALanguage.family_id)
+            Col(self, 'family_id', model_col=OOALanguage.family_id),
+            SamplesCol(self, 'samples'),
+            Col(self, 'Datapoints', model_col=OOALanguage.representation),
         ]
 
 
-class Units(Units):
+class Units(CountCache, KeysetPagination, Units):
+    # parameter_id is always set by the loader.
+    keyset_cols = (OOAUnit.id, OOAUnit.parameter_id)
 
     def base_query(self, query):
         if self.language:
-            query = query.join(OOALanguage, self.language_pk == self.language.pk)
+            query = query.filter(OOAUnit.language_pk == self.language.pk)
         return query
 
     def col_defs(self):
         return [
             IdCol(self, 'id', sTitle='id'),
             Col(self, 'parameter_id', model_col=OOAUnit.parameter_id),
-            Col(self, 'language_id', model_col=OOAUnit.language_pk)
+            Col(self, 'language_id', model_col=OOAUnit.language_pk),
+            FullTextCol(self, 'remark', 'unit', model_col=OOAUnit.remark),
         ]
 # class Languages(datatables.Languages):
 #     def base_query(self, query):
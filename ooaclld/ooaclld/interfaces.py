@@ -1,6 +1,2 @@
-from zope.interface import Interface
-
-
-class IFeatureSet(Interface):
-
-    """marker."""
\ No newline at end of file
+# The interface of the OOA feature sets is shared with wals3, see `ooa.models`.
+from ooa.interfaces import IFeatureSet  # noqa: F401
@@ -0,0 +1,5 @@
+from ooa.maps import OOAParameterMap
+
+
+def includeme(config):
+    config.register_map('parameter', OOAParameterMap)
@@ -0,0 +1,159 @@
+"""Compute and apply the difference between CLDF rows and the rows in the database.
+
+Rows are matched by `id`, i.e. by the CLDF ID of the object. New rows are inserted through
+a `BulkLoader`, changed columns are updated and rows which are no longer in the CLDF data
+are deleted - all within the current transaction.
+"""
+import json
+import decimal
+import collections
+
+import sqlalchemy as sa
+
+__all__ = ['Delta', 'LinkDelta']
+
+
+def normalized(v):
+    """Make CLDF values comparable to what we read back from the database."""
+    if v is None:
+        return None
+    if isinstance(v, bool):
+        return str(int(v))
+    if isinstance(v, (float, decimal.Decimal)):
+        return repr(float(v))
+    if isinstance(v, (dict, list)):
+        return json.dumps(v, sort_keys=True)
+    return str(v)
+
+
+class Delta(object):
+
+    """Inserts, updates and deletes for the rows of one model.
+
+    >>> delta = Delta(models.OOAParameter, loader)
+    >>> pk = delta.diff(dict(id='Appr-01', feature_set='Appr', question='?'))
+    >>> loader.flush()
+    >>> delta.apply_updates()
+    >>> delta.apply_deletes()
+    """
+
+    def __init__(self, model, loader):
+        self.model = model
+        self.loader = loader
+        self.tables = [
+            m.local_table for m in reversed(list(sa.inspect(model).iterate_to_root()))]
+        self.columns, self.current = [], None
+        self.inserted, self.updates, self.seen = 0, [], set()
+
+    def _load(self, columns):
+        """Read id, pk and the columns we compare for all rows in the database."""
+        self.columns = columns
+        base = self.tables[0]
+        cols = [base.c.pk, base.c.id]
+        for c in self.columns:
+            cols.append([t.c[c] for t in self.tables if c in t.c][0])
+        fromclause = base
+        for table in self.tables[1:]:
+            fromclause = fromclause.join(table, base.c.pk == table.c.pk)
+        self.current = {}
+        for row in self.loader.connection.execute(sa.select(cols).select_from(fromclause)):
+            self.current[row[1]] = (int(row[0]), [normalized(v) for v in row[2:]])
+
+    def __contains__(self, id_):
+        return id_ in self.seen
+
+    def diff(self, kw):
+        """Register the CLDF data for one object.
+
+        :return: The primary key of the - possibly newly inserted - object.
+        """
+        if self.current is None:
+            self._load([k for k in kw if k != 'id'])
+        self.seen.add(kw['id'])
+        if kw['id'] not in self.current:
+            self.inserted += 1
+            return self.loader.add(self.model, **kw)
+        pk, old = self.current[kw['id']]
+        changed = {
+            col: kw.get(col) for col, value in zip(self.columns, old)
+            if normalized(kw.get(col)) != value}
+        if changed:
+            self.updates.append((pk, changed))
+        return pk
+
+    @property
+    def deletes(self):
+        if self.current is None:
+            self._load([])
+        return [pk for id_, (pk, _) in self.current.items() if id_ not in self.seen]
+
+    def apply_updates(self):
+        for pk, changed in self.updates:
+            for table in self.tables:
+                values = {k: v for k, v in changed.items() if k in table.c}
+                if values:
+                    self.loader.connection.execute(
+                        table.update().where(table.c.pk == pk).values(**values))
+
+    def apply_deletes(self):
+        deletes = self.deletes
+        for table in reversed(self.tables):
+            for i in range(0, len(deletes), 500):
+                self.loader.connection.execute(
+                    table.delete().where(table.c.pk.in_(deletes[i:i + 500])))
+
+    @property
+    def report(self):
+        return [self.model.__name__, self.inserted, len(self.updates), len(self.deletes)]
+
+
+class LinkDelta(object):
+
+    """Inserts and deletes for the rows of an association table, grouped by owner.
+
+    The links of an owner are replaced as a whole if they changed.
+
+    >>> delta = LinkDelta(models.OOAUnitReference, 'unit_pk', ['source_pk'], loader)
+    >>> delta.diff(upk, [dict(source_pk=1)])
+    """
+
+    def __init__(self, model, owner, columns, loader):
+        self.model = model
+        self.owner = owner
+        self.columns = list(columns)
+        self.loader = loader
+        self.table = model.__table__
+        self.current = collections.defaultdict(lambda: (set(), []))
+        for row in loader.connection.execute(sa.select(
+                [self.table.c.pk, self.table.c[owner]] + [self.table.c[c] for c in columns])):
+            links, pks = self.current[row[1]]
+            links.add(tuple(normalized(v) for v in row[2:]))
+            pks.append(row[0])
+        self.inserted, self.stale = 0, []
+
+    def diff(self, owner_pk, links):
+        """Register the links of one owner.
+
+        :param links: `list` of `dict`s with values for the compared columns.
+        """
+        old, pks = self.current.pop(owner_pk, (set(), []))
+        if {tuple(normalized(link.get(c)) for c in self.columns) for link in links} != old:
+            self.stale.extend(pks)
+            for link in links:
+                self.inserted += 1
+                self.loader.add(self.model, **dict(link, **{self.owner: owner_pk}))
+
+    @property
+    def deletes(self):
+        # Links of owners we have not seen belong to deleted objects.
+        return self.stale + [pk for _, pks in self.current.values() for pk in pks]
+
+    def apply_deletes(self):
+        deletes = self.deletes
+        for i in range(0, len(deletes), 500):
+            self.loader.connection.execute(
+                self.table.delete().where(self.table.c.pk.in_(deletes[i:i + 500])))
+
+    @property
+    def report(self):
+        return [self.model.__name__, self.inserted, 0, len(self.deletes)]
@@ -1,31 +1,40 @@
 from pathlib import Path
-import datetime
+import time
+import collections
 from collections import defaultdict
 
 import pycldf
-from tqdm import tqdm
-import sqlalchemy
+from clldutils.markup import Table
+from zope.sqlalchemy import mark_changed
 
-from clld.cliutil import Data, slug, bibtex2source, add_language_codes
 from clld.db.meta import DBSession
 from clld.db.models import common
-from clld.lib.bibtex import Database
-
+from clld.web.icon import ORDERED_ICONS
 
 import ooaclld
 from ooaclld import models
+from ooa import fulltext
+from ooa.scripts import initializedb
+from ooa.scripts.bulkload import BulkLoader
+from ooa.scripts.parsing import TableReader
+from ooa.scripts.initializedb import (
+    BATCH_SIZE, FEATURESETS, parameter, language, code, unit, contributor, featureset,
+)
+from ooa.scripts.references import Resolver
+from ooaclld.scripts.delta import Delta, LinkDelta
+from ooa.util import bump_data_version, with_icons
 
+#: Marker icons of the codes of a parameter, in the order of the icons of the app.
+ICONS = [icon.name for icon in ORDERED_ICONS]
 
-def main(args):
 
+def main(args):
     #assert args.glottolog, 'The --glottolog option is required!'
     cldf_dir = Path(__file__).parent.parent.parent.parent / "cldf"
     # args.log.info('Loading dataset')
-    ds = list(pycldf.iter_datasets(cldf_dir))[0]
-    data = Data()
-    data.add(
-        common.Dataset,
-        ooaclld.__name__,
+    ds = args.cldf or list(pycldf.iter_datasets(cldf_dir))[0]
+
+    DBSession.add(common.Dataset(
         id=ooaclld.__name__,
         domain='ooaclld',
 
@@ -37,95 +46,10 @@ def main(args):
             'license_icon': 'cc-by.png',
             'license_name': 'Creative Commons Attribution 4.0 International License'},
 
-    )
-    #DBSession.add(dataset)
+    ))
     DBSession.flush()
 
-    for rec in tqdm(Database.from_file(ds.bibpath), desc='Processing sources'):
-        ns = bibtex2source(rec, common.Source)
-        data.add(common.Source, ns.id, _obj=ns)
-    DBSession.flush()
-
-    for row in tqdm(ds.iter_rows('ParameterTable'), desc="Processing parameters"):
-        data.add(models.OOAParameter, row["ParameterID"],
-                 id=row["ParameterID"],
-                 # parameter_id=row["ParameterID"],
-                 # unitparameter_pk=row["ParameterID"],
-                 feature_set=row["FeatureSet"],
-                 question=row["Question"],
-                 datatype=row["datatype"],
-                 visualization=row["VisualizationOnly"],
-                 )
-    DBSession.flush()
-
-    all_languages = {row["LanguageID"] for row in ds.iter_rows('ValueTable')}
-
-    for row in tqdm(ds.iter_rows('LanguageTable'), desc='Processing languages'):
-        if row["Glottocode"] not in all_languages:
-            continue
-        data.add(models.OOALanguage, row['Glottocode'],
-                 id=row['Glottocode'],
-                 glottocode=row['Glottocode'],
-                 name=row['Name'],
-                 latitude=row['Latitude'],
-                 longitude=row['Longitude'],
-                 macroarea=row['Macroarea'],
-                 iso=row["ISO639P3code"],
-                 family_id=row["Family_ID"],
-                 language_id=row["Language_ID"],
-                 family_name=row["Family_Name"],
-                 balanced=row["Isolates_Balanced_Sample"],
-                 isolates=row["Isolates_Sample"],
-                 american=row["American_Sample"],
-                 world=row["Worldwide_Sample"],
-                 north_america="North_America_25_Sample",
-                 noun=row["Noun_Poss_Sample"],
-                 )
-        DBSession.flush()
-
-    for row in tqdm(ds.iter_rows('codes.csv'), desc="Processing codes"):
-        data.add(common.DomainElement, row['CodeID'].replace(".", "").replace("]", ""),
-                 id=row['CodeID'].replace(".", "").replace("]", ""),
-                 description=row['Description'],
-                 jsondata={'Visualization': row['Visualization']},
-                 parameter_pk=data['OOAParameter'][row['ParameterID'].replace(".", "")].pk)
-    DBSession.flush()
-
-    # read value table
-    for row in tqdm(ds.iter_rows('ValueTable'), desc="Processing values"):
-        data.add(models.OOAUnit, row["ID"],
-                 # TODO: this would be the way to refer to another resource from a table
-                 # parameter = relationship('Parameter', innerjoin=True, backref='valuesets')
-                 # then accessable via self.parameter.(...)
-                 id=row["ID"],
-                 language_pk=data["OOALanguage"][row["LanguageID"]].pk,
-                 language_id=row["LanguageID"],
-                 # TODO: don't do this, acces language table via language_pk to display languages
-                 parameter_id=data["OOAParameter"][row["ParameterID"].replace(".", "")].pk,
-                 code_id=row["CodeID"] or "",
-                 value=row["Value"],
-                 remark=row["Remark"],
-                 source=row["Source"],
-                 coder=row["Coder"],
-                 )
-    DBSession.flush()
-
-    for row in tqdm(ds.iter_rows('contributors.csv'), desc="Processing contributors"):
-        data.add(common.Contributor, row["ContributorID"],
-                 id=row['ContributorID'],
-                 name=row['Name'],
-                 )
-
-    for row in tqdm(ds.iter_rows('featuresets.csv'), desc='Processing featuresets'):
-        data.add(models.OOAFeatureSet, row["FeatureSetID"],
-                 unitparameter_pk=row["FeatureSetID"],
-                 id=row['FeatureSetID'],
-                 name=row['Name'],
-                 domains=row['Domain'],
-                 authors=";".join(row['Authors']),
-                 contributors=";".join(row['Contributors'] or [""]),
-                 filename=row['Filename'] or ""
-                 )
+    initializedb.main(args, ds, 'ooaclld', ICONS)
 
     # contrib = data.add(
     #     common.Contribution,
@@ -167,9 +91,104 @@ def main(args):
     # )
 
 
+def update(args):
+    """Bring an existing database in line with a changed CLDF dataset.
+
+    Objects are matched by their CLDF IDs; new rows are inserted, changed columns updated
+    and rows missing from the CLDF data deleted, all in the current transaction. Sources and
+    the dataset metadata are left untouched.
+
+    :return: `list` of (model, inserted, updated, deleted) rows.
+    """
+    start = time.time()
+    settings = getattr(args, 'settings', None) or {}
+    cldf_dir = Path(__file__).parent.parent.parent.parent / "cldf"
+    ds = args.cldf or list(pycldf.iter_datasets(cldf_dir))[0]
+    # All changes are written through the connection, bypassing the ORM, so we must tell
+    # the transaction manager to commit.
+    mark_changed(DBSession())
+
+    loader = BulkLoader(DBSession, batch_size=int(settings.get(
+        'ooaclld.load_batch_size', BATCH_SIZE)))
+    deltas = collections.OrderedDict((model.__name__, Delta(model, loader)) for model in [
+        models.OOAParameter,
+        models.OOALanguage,
+        models.OOACode,
+        models.OOAUnit,
+        common.Contributor,
+        common.UnitParameter,
+        models.OOAFeatureSet,
+    ])
+    links = LinkDelta(
+        models.OOAUnitReference, 'unit_pk', ['source_pk', 'key', 'description'], loader)
+    resolver = Resolver(DBSession.query(
+        common.Source.pk, common.Source.id, common.Source.author, common.Source.year))
+    pks = defaultdict(dict)
+    processes = int(settings.get('ooaclld.load_processes', 1))
+
+    with TableReader(
+            ds,
+            [
+                ('ParameterTable', parameter),
+                ('LanguageTable', language),
+                ('codes.csv', code),
+                ('ValueTable', unit),
+                ('contributors.csv', contributor),
+                ('featuresets.csv', featureset),
+            ],
+            processes=processes,
+            cache_dir=settings.get('ooaclld.load_cache')) as reader:
+        for kw in reader.rows('ParameterTable'):
+            pks['OOAParameter'][kw['id']] = deltas['OOAParameter'].diff(kw)
+
+        languages = {kw['id']: kw for kw in reader.rows('LanguageTable')}
+
+        for kw in with_icons(reader.rows('codes.csv'), ICONS):
+            kw['parameter_pk'] = pks['OOAParameter'][kw['parameter_pk']]
+            deltas['OOACode'].diff(kw)
+
+        # As in `main`, only languages with values are kept.
+        for kw in reader.rows('ValueTable'):
+            if kw['language_id'] not in deltas['OOALanguage']:
+                pks['OOALanguage'][kw['language_id']] = deltas['OOALanguage'].diff(
+                    languages.pop(kw['language_id']))
+            kw['language_pk'] = pks['OOALanguage'][kw['language_id']]
+            kw['parameter_id'] = pks['OOAParameter'][kw['parameter_id']]
+            refs = resolver('OOAUnit', kw['id'], kw.pop('references'))
+            links.diff(deltas['OOAUnit'].diff(kw), [
+                dict(source_pk=spk, key=ref.key, description=ref.pages) for spk, ref in refs])
+
+        for kw in reader.rows('contributors.csv'):
+            deltas['Contributor'].diff(kw)
+
+        featuresets_pk = deltas['UnitParameter'].diff(FEATURESETS)
+        for kw in reader.rows('featuresets.csv'):
+            deltas['OOAFeatureSet'].diff(dict(kw, unitparameter_pk=featuresets_pk))
+    loader.flush()
+
+    for delta in deltas.values():
+        delta.apply_updates()
+    # Rows referencing other rows must be deleted first.
+    links.apply_deletes()
+    for name in ['OOAUnit', 'OOACode', 'OOALanguage', 'OOAParameter']:
+        deltas[name].apply_deletes()
+    deltas['Contributor'].apply_deletes()
+    deltas['OOAFeatureSet'].apply_deletes()
+    fulltext.rebuild(loader.connection)
+
+    report = [delta.report for delta in deltas.values()] + [links.report]
+    table = Table('table', 'inserted', 'updated', 'deleted')
+    table.extend(report)
+    print(table.render(tablefmt='simple'))
+    resolver.report(args.log, settings.get('ooaclld.load_diagnostics'))
+    bump_data_version()
+    args.log.info('Updated database in {0:.1f}s'.format(time.time() - start))
+    return report
+
 
 def prime_cache(args):
     """If data needs to be denormalized for lookup, do that here.
     This procedure should be separate from the db initialization, because
     it will have to be run periodically whenever data has been updated.
     """
+    initializedb.prime_cache(args, 'ooaclld')
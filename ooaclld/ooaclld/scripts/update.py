@@ -0,0 +1,50 @@
+"""Update an existing ooaclld database from a changed CLDF dataset.
+
+Run from the ooaclld directory, with the config of the ooaclld app - i.e. an ini file with
+``use = egg:ooaclld`` - which is not kept in the repository::
+
+    python -m ooaclld.scripts.update development.ini [--cldf path/to/metadata.json]
+
+Unlike `clld initdb`, the database is not recreated; only the rows which differ from the
+CLDF data are written (see `ooaclld.scripts.initializedb.update`). `prime_cache` is run
+afterwards.
+"""
+import sys
+
+import transaction
+from clldutils.clilib import PathType
+from clldutils.loglib import Logging, get_colorlog
+from clld.cliutil import SessionContext, BootstrappedAppConfig
+from pycldf import Dataset
+
+from ooaclld.scripts import initializedb
+
+
+def main(args=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument(
+        "config-uri",
+        action=BootstrappedAppConfig,
+        help="ini file providing app config",
+    )
+    parser.add_argument(
+        '--cldf',
+        type=PathType(type='file'),
+        default=None,
+    )
+    args = parser.parse_args(args=args)
+    args.log = get_colorlog(__name__)
+    if args.cldf:
+        args.cldf = Dataset.from_metadata(args.cldf)
+
+    with Logging(args.log), SessionContext(args.settings):
+        with transaction.manager:
+            initializedb.update(args)
+        with transaction.manager:
+            initializedb.prime_cache(args)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main() or 0)
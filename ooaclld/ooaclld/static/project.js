@@ -1 +1,19 @@
+// The GeoJSON of the parameter maps sets the marker icon once, on the FeatureCollection of
+// a layer, rather than on each feature - see ooa/maplayers.py.
+(function () {
+    var addData = L.GeoJSON.prototype.addData;
 
+    L.GeoJSON.include({
+        addData: function (geojson) {
+            var icon = geojson.properties === undefined ? undefined : geojson.properties.icon;
+            if (geojson.type === 'FeatureCollection' && icon !== undefined) {
+                $.each(geojson.features, function (_, feature) {
+                    if (feature.properties.icon === undefined) {
+                        feature.properties.icon = icon;
+                    }
+                });
+            }
+            return addData.call(this, geojson);
+        }
+    });
+})();
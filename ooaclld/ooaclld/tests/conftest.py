@@ -1,2 +1,30 @@
 from ooaclld import models
+import pathlib
+
 import pytest
+
+pytest_plugins = ['ooa.pytest_plugin']
+
+CLDF = pathlib.Path(__file__).parent.parent.parent.parent / 'cldf'
+
+
+@pytest.fixture
+def fresh_db(db):
+    """The session-scoped test database, emptied."""
+    from clld.db.meta import Base, DBSession
+
+    DBSession.remove()
+    Base.metadata.drop_all(db)
+    Base.metadata.create_all(db)
+    yield db
+    DBSession.remove()
+
+
+@pytest.fixture
+def settings_prefix():
+    return 'ooaclld'
+
+
+@pytest.fixture
+def cldf_metadata():
+    return CLDF / 'StructureDataset-metadata.json'
@@ -0,0 +1,56 @@
+from sqlalchemy import event
+
+from clld.db.meta import DBSession
+from clld.db.models import common
+
+from ooaclld import models
+from ooa.scripts.bulkload import BulkLoader
+
+
+def test_BulkLoader(fresh_db):
+    loader = BulkLoader(DBSession, batch_size=2)
+    ppk = loader.add(models.OOAParameter, id='Appr-01', feature_set='Appr')
+    lpk = loader.add(models.OOALanguage, id='abcd1234', name='Abc', macroarea='Africa')
+    loader.add(common.DomainElement, id='yes_Appr-01', parameter_pk=ppk)
+    loader.add(models.OOAUnit, id='1', language_pk=lpk, parameter_id=ppk, code_id='x')
+    loader.flush()
+    assert loader.counts['OOAUnit'] == 1
+
+    lang = DBSession.query(common.Language).filter(common.Language.pk == lpk).one()
+    assert isinstance(lang, models.OOALanguage)
+    assert lang.macroarea == 'Africa' and lang.jsondata == {}
+    assert lang.active and lang.created
+    unit = DBSession.query(models.OOAUnit).filter_by(id='1').one()
+    assert unit.language.id == 'abcd1234'
+    assert DBSession.query(common.DomainElement).one().parameter.id == 'Appr-01'
+    assert BulkLoader(DBSession).add(models.OOAParameter, id='Appr-02') == ppk + 1
+
+
+def test_BulkLoader_flush_order(fresh_db):
+    tables = []
+
+    def record(conn, cursor, statement, *args):
+        if statement.startswith('INSERT INTO'):
+            tables.append(statement.split()[2])
+
+    loader = BulkLoader(DBSession)
+    # The unit is buffered before the language it references.
+    loader.add(models.OOAUnit, id='1', language_pk=1, code_id='x')
+    assert loader.add(models.OOALanguage, id='abcd1234', name='Abc') == 1
+    event.listen(fresh_db, 'before_cursor_execute', record)
+    try:
+        loader.flush()
+    finally:
+        event.remove(fresh_db, 'before_cursor_execute', record)
+    assert tables.index('language') < tables.index('unit')
+
+
+def test_BulkLoader_orm_insert(fresh_db):
+    loader = BulkLoader(DBSession)
+    pk = loader.add(common.Contributor, id='DI', name='David Inman')
+    loader.flush()
+    # On PostgreSQL this relies on the serial sequence being advanced past `pk`.
+    contributor = common.Contributor(id='NCP', name='Natalia Chousou-Polydouri')
+    DBSession.add(contributor)
+    DBSession.flush()
+    assert contributor.pk > pk
@@ -0,0 +1,19 @@
+import transaction
+from pyramid.testing import DummyRequest, testConfig
+
+from ooaclld import models
+from ooaclld.datatables import Units
+from ooaclld.scripts import initializedb
+
+
+def test_Units_of_language(fresh_db, initializedb_args):
+    with transaction.manager:
+        initializedb.main(initializedb_args)
+
+    with testConfig():
+        req = DummyRequest(params={'language': 'efgh1234'})
+        req.translate = lambda s: s
+        dt = Units(req, models.OOAUnit)
+        assert dt.language.id == 'efgh1234'
+        assert sorted(u.id for u in dt.get_query()) == ['1', '2']
+        assert dt.count_all == 2
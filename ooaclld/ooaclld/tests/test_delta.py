@@ -0,0 +1,26 @@
+from clld.db.meta import DBSession
+
+from ooaclld import models
+from ooa.scripts.bulkload import BulkLoader
+from ooaclld.scripts.delta import Delta
+
+
+def test_Delta(fresh_db):
+    loader = BulkLoader(DBSession)
+    for id_ in ['Appr-01', 'Appr-02']:
+        loader.add(models.OOAParameter, id=id_, feature_set='Appr', question='?')
+    loader.flush()
+
+    delta = Delta(models.OOAParameter, loader)
+    ppk = delta.diff(dict(id='Appr-01', feature_set='Appr', question='What?'))
+    delta.diff(dict(id='Appr-03', feature_set='Appr', question='?'))
+    assert 'Appr-03' in delta and 'Appr-02' not in delta
+    loader.flush()
+    delta.apply_updates()
+    delta.apply_deletes()
+    assert delta.report == ['OOAParameter', 1, 1, 1]
+
+    DBSession.expire_all()
+    assert {p.id: p.question for p in DBSession.query(models.OOAParameter)} == \
+        {'Appr-01': 'What?', 'Appr-03': '?'}
+    assert DBSession.query(models.OOAParameter).filter_by(id='Appr-01').one().pk == ppk
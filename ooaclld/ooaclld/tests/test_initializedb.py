@@ -0,0 +1,49 @@
+import transaction
+
+from clld.db.meta import DBSession
+
+from ooaclld import models
+from ooaclld.scripts import initializedb
+
+
+def test_update(fresh_db, initializedb_args, cldf_dir):
+    with transaction.manager:
+        initializedb.main(initializedb_args)
+    units = {u.id: u.pk for u in DBSession.query(models.OOAUnit)}
+    DBSession.remove()
+
+    # A changed value, a new value of a new language, and a deleted value, whose language
+    # has no other values.
+    cldf_dir.joinpath('values.csv').write_text("""\
+ID,LanguageID,ParameterID,Value,CodeID,Remark,Source,Coder
+1,efgh1234,Appr-01,yes,yes_Appr-01,,meier2000,DI
+2,efgh1234,Attr-01,4,,a remark,meier2000[12],DI
+4,unus1234,Appr-01,no,no._Appr-01,,,NCP
+""", encoding='utf8')
+    with transaction.manager:
+        report = initializedb.update(initializedb_args)
+    report = {row[0]: tuple(row[1:]) for row in report}
+    assert report['OOAUnit'] == (1, 1, 1)
+    assert report['OOALanguage'] == (1, 0, 1)
+    assert report['OOAParameter'] == (0, 0, 0)
+    assert report['OOAFeatureSet'] == (0, 0, 0)
+    # The references of unit 3 are gone, those of unit 2 are unchanged.
+    assert report['OOAUnitReference'][2] == 1
+
+    res = {u.id: u for u in DBSession.query(models.OOAUnit)}
+    assert set(res) == {'1', '2', '4'}
+    assert res['2'].value == '4' and res['2'].pk == units['2']
+    assert res['4'].language.name == 'Unused' and res['4'].language_id == 'unus1234'
+    assert {lg.id for lg in DBSession.query(models.OOALanguage)} == {'efgh1234', 'unus1234'}
+    DBSession.remove()
+
+    # The counts are recomputed from the updated rows.
+    with transaction.manager:
+        initializedb.prime_cache(initializedb_args)
+    assert {p.id: p.representation for p in DBSession.query(models.OOAParameter)} == \
+        {'Appr-01': 2, 'Attr-01': 1}
+    assert {c.id: c.representation for c in DBSession.query(models.OOACode)} == \
+        {'yes_Appr-01': 1, 'no_Appr-01': 1}
+    assert {fs.id: fs.representation for fs in DBSession.query(models.OOAFeatureSet)} == \
+        {'Appr': 2, 'Attr': 1}
+    DBSession.remove()
@@ -26,10 +26,16 @@ setup(
 
 
         'clldmpg',
+        'numpy',
+        # The OOA models, loaders and caches, shared with wals3. Not on PyPI, it's installed
+        # from the ooa-core directory, see requirements.txt.
+        'ooa-core',
 
 ],
 extras_require={
         'dev': ['flake8', 'waitress'],
+        # Parquet version of the matrix download.
+        'parquet': ['pyarrow'],
         'test': [
             'mock',
             'pytest>=5.4',
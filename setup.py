@@ -27,14 +27,22 @@ setup(
         'csvw>=1.8.1',
         'BeautifulSoup4>=4.9.1',
         'html5lib>=1.1',
+        'numpy',
         'sqlalchemy>=1.3.20',
-        'waitress'
+        'waitress',
+        # The OOA models and the code working on them, shared with ooaclld. Not on PyPI, it's
+        # installed from the ooa-core directory, see requirements.txt.
+        'ooa-core',
     ],
     extras_require={
         'dev': [
             'flake8',
             'tox',
         ],
+        # Parquet version of the matrix download.
+        'parquet': [
+            'pyarrow',
+        ],
         'test': [
             'mock>=4.0.2',
             'psycopg2-binary',
@@ -1,3 +1,83 @@
 #from wals3 import models
+import pathlib
+
 import pytest
 
+pytest_plugins = ['ooa.pytest_plugin']
+
+CLDF = pathlib.Path(__file__).parent.parent / 'cldf'
+
+
+@pytest.fixture
+def settings_prefix():
+    return 'wals3'
+
+
+@pytest.fixture
+def cldf_metadata():
+    return CLDF / 'StructureDataset-metadata.json'
+
+
+@pytest.fixture
+def engine():
+    """An empty in-memory database, bound to `DBSession` for the duration of a test.
+
+    Other fixtures - e.g. `env` of pytest-clld - bind `DBSession` to other databases, so
+    the binding is restored afterwards, and tests do not depend on the order they run in.
+    """
+    from sqlalchemy import create_engine
+    from clld.db.meta import Base, DBSession
+    from wals3 import models  # noqa: F401 - registers the tables of the app
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    bind = DBSession.session_factory.kw.get('bind')
+    DBSession.remove()
+    DBSession.configure(bind=engine)
+    yield engine
+    DBSession.remove()
+    DBSession.configure(bind=bind)
+    engine.dispose()
+
+
+@pytest.fixture
+def initializedb(engine, initializedb_args):
+    """A fresh database loaded from the `cldf_dir` dataset."""
+    import transaction
+    from wals3.scripts import initializedb
+
+    with transaction.manager:
+        initializedb.main(initializedb_args)
+    yield initializedb
+
+
+@pytest.fixture
+def webapp(initializedb, engine):
+    """The app, serving the `initializedb` database, with a counter of SQL statements.
+
+    `webapp.statements` lists the statements of the last request.
+    """
+    from pyramid.paster import get_appsettings
+    from sqlalchemy import event
+    from webtest import TestApp
+    from clld.db.meta import DBSession
+    from wals3 import main
+
+    settings = get_appsettings(str(CLDF.parent / 'development.ini'))
+    settings['sqlalchemy.url'] = 'sqlite://'
+    app = TestApp(main({}, **settings))
+    DBSession.remove()
+    DBSession.configure(bind=engine)
+    app.statements = []
+
+    def count(conn, cursor, statement, *args):
+        app.statements.append(statement)
+
+    def get(url, **kw):
+        del app.statements[:]
+        return TestApp.get(app, url, **kw)
+
+    app.get = get
+    event.listen(engine, 'before_cursor_execute', count)
+    yield app
+    event.remove(engine, 'before_cursor_execute', count)
@@ -3,3 +3,116 @@ from wals3.scripts import initializedb_wals
 
 def test_init():
     assert initializedb
+
+
+def test_initializedb(initializedb):
+    from clld.db.meta import DBSession
+    from clld.db.models.common import Source, DomainElement
+    from wals3.models import OOALanguage, OOAParameter, OOAUnit, OOAFeatureSet
+
+    # Only languages with values are loaded:
+    assert {l.id for l in DBSession.query(OOALanguage)} == {'abcd1234', 'efgh1234'}
+    assert DBSession.query(OOAParameter).count() == 2
+    assert {de.id: (de.number, de.jsondata['icon']) for de in DBSession.query(DomainElement)} \
+        == {'yes_Appr-01': (1, initializedb.ICONS[0]), 'no_Appr-01': (2, initializedb.ICONS[1])}
+    assert {fs.parameter.id for fs in DBSession.query(OOAFeatureSet)} == {'featuresets'}
+    assert DBSession.query(OOAFeatureSet).count() == 2
+    assert DBSession.query(Source).one().id == 'meier2000'
+    units = {u.id: u for u in DBSession.query(OOAUnit)}
+    assert units['2'].language.name == 'Efg' and units['2'].remark == 'a remark'
+    assert units['3'].language.id == 'abcd1234'
+
+
+def test_prime_cache(initializedb, initializedb_args):
+    import transaction
+    from clld.db.meta import DBSession
+    from wals3.models import OOALanguage, OOAParameter, OOACode, OOAFeatureSet
+
+    with transaction.manager:
+        initializedb.prime_cache(initializedb_args)
+
+    assert {p.id: p.representation for p in DBSession.query(OOAParameter)} == \
+        {'Appr-01': 2, 'Attr-01': 1}
+    assert {c.id: c.representation for c in DBSession.query(OOACode)} == \
+        {'yes_Appr-01': 1, 'no_Appr-01': 1}
+    assert {l.id: l.representation for l in DBSession.query(OOALanguage)} == \
+        {'abcd1234': 1, 'efgh1234': 2}
+    assert {
+        fs.id: (fs.count_parameters, fs.representation)
+        for fs in DBSession.query(OOAFeatureSet)} == {'Appr': (1, 2), 'Attr': (1, 1)}
+
+
+def test_initializedb_in_process(engine, initializedb_args, monkeypatch):
+    import transaction
+    from clld.db.meta import DBSession
+    from wals3.models import OOAUnit
+    from wals3.scripts import initializedb
+    from ooa.scripts import initializedb as loader
+
+    readers = []
+
+    class TableReader(loader.TableReader):
+        def __init__(self, *args, **kw):
+            super(TableReader, self).__init__(*args, **kw)
+            readers.append(self)
+
+    monkeypatch.setattr(loader, 'TableReader', TableReader)
+    del initializedb_args.settings['wals3.load_processes']
+    with transaction.manager:
+        initializedb.main(initializedb_args)
+    # Without setting ``wals3.load_processes`` no process pool is started.
+    assert [r.processes for r in readers] == [1]
+    assert DBSession.query(OOAUnit).count() == 3
+
+
+def test_initializedb_references(initializedb, initializedb_args, caplog):
+    import csv
+    from clld.db.meta import DBSession
+    from wals3.models import OOAUnit, OOAUnitReference
+    from ooa.scripts import references
+
+    refs = {
+        (r.unit.id, r.source.id, r.description) for r in DBSession.query(OOAUnitReference)}
+    assert refs == {('1', 'meier2000', None), ('2', 'meier2000', '12'), ('3', 'meier2000', '5')}
+    assert len(DBSession.query(OOAUnit).filter_by(id='3').one().references) == 1
+
+    with open(initializedb_args.settings['wals3.load_diagnostics'], encoding='utf8') as f:
+        assert list(csv.DictReader(f)) == [dict(
+            table='OOAUnit', id='3', reference='unknown1999', reason='missing source key')]
+
+    # Only a summary is logged, the details are in the diagnostics file.
+    resolver = references.Resolver([])
+    resolver('OOAUnit', '1', references.parse('a;b;(Meier 2000)'))
+    resolver('OOAUnit', '2', references.parse('a'))
+    caplog.clear()
+    resolver.report(initializedb_args.log)
+    assert [r.getMessage() for r in caplog.records] == [
+        '4 unresolved references in 2 rows: 3 missing source key, 1 no source for citation']
+
+
+def test_prime_cache_matrix(initializedb, initializedb_args):
+    import csv
+    import gzip
+    import json
+    import transaction
+    from ooa import adapters
+
+    with transaction.manager:
+        initializedb.prime_cache(initializedb_args)
+
+    d = initializedb_args.settings['wals3.download_dir']
+    with open(d + '/ooa-matrix.csv', encoding='utf8') as f:
+        rows = list(csv.reader(f))
+    assert rows[0][-2:] == ['Appr-01', 'Attr-01']
+    assert [(r[0], r[1], r[-2], r[-1]) for r in rows[1:]] == [
+        ('abcd1234', 'Abc', 'no', ''), ('efgh1234', 'Efg', 'yes', '3')]
+    with gzip.open(d + '/ooa-matrix.csv.gz', 'rt', encoding='utf8') as f:
+        assert list(csv.reader(f)) == rows
+    with open(d + '/ooa-matrix.json', encoding='utf8') as f:
+        manifest = json.load(f)
+    assert manifest['csv']['size'] > 0 and len(manifest['csv.gz']['sha256']) == 64
+    if adapters.pyarrow:
+        import pyarrow.parquet
+
+        table = pyarrow.parquet.read_table(d + '/ooa-matrix.parquet')
+        assert table.column('Attr-01').to_pylist() == [None, '3']
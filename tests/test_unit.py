@@ -1,17 +1,626 @@
+import pytest
+
 from clld.db.models.common import Language
 
 
-def test_Matrix(env, tmp_path):
-    from wals3.adapters import Matrix
+def test_Matrix(initializedb, tmp_path):
+    import csv
+    from pyramid.registry import Registry
+    from pyramid.testing import DummyRequest, testConfig
+    from ooa.adapters import Matrix
+    from ooa.views import matrix
+
+    # With chunks of one row, the rows of a language are not split across chunks.
+    m = Matrix(Language, 'wals3', directory=str(tmp_path), chunksize=1)
+    manifest = m.create(None, verbose=False)
+    with m.files(None)['csv'].open(encoding='utf8') as f:
+        assert [r[0] for r in csv.reader(f)] == ['glottocode', 'abcd1234', 'efgh1234']
+    assert m.manifest(None) == manifest
+
+    # The files are served as built by prime_cache, with their digest as ETag.
+    with testConfig(registry=Registry('wals3'), settings={'wals3.download_dir': str(tmp_path)}):
+        res = matrix(DummyRequest(matchdict={'ext': 'csv.gz'}))
+        assert res.etag == manifest['csv.gz']['sha256']
+        assert res.content_type == 'application/gzip'
+        assert matrix(DummyRequest(matchdict={'ext': 'xlsx'})).status_int == 404
+
+
+
+def test_TableReader(cldf_dir):
+    import pycldf
+    from ooa.scripts.parsing import TableReader, SOURCES, record
+    from ooa.scripts.initializedb import unit
+
+    ds = pycldf.Dataset.from_metadata(cldf_dir / 'StructureDataset-metadata.json')
+    tables = [(SOURCES, None), ('ValueTable', unit)]
+    res = []
+    for processes in [1, 2]:
+        with TableReader(ds, tables, processes=processes, maxsize=1, chunksize=1) as reader:
+            assert record(next(reader.rows(SOURCES))).id == 'meier2000'
+            res.append(list(reader.rows('ValueTable')))
+    assert res[0] == res[1]
+    assert [v['language_id'] for v in res[0]] == ['efgh1234', 'efgh1234', 'abcd1234']
+
+
+def test_TableReader_cache(cldf_dir, tmp_path, monkeypatch):
+    import pycldf
+    from ooa.scripts import parsing
+    from ooa.scripts.parsing import TableReader
+    from ooa.scripts.initializedb import unit
+
+    ds = pycldf.Dataset.from_metadata(cldf_dir / 'StructureDataset-metadata.json')
+    cache = tmp_path / 'cache'
+
+    def rows():
+        with TableReader(ds, [('ValueTable', unit)], processes=1, cache_dir=cache) as r:
+            return list(r.rows('ValueTable'))
+
+    res = rows()
+    cached = list(cache.glob('values-*.pickle'))
+    assert len(cached) == 1
+    assert rows() == res
+
+    with cldf_dir.joinpath('values.csv').open('a', encoding='utf8') as f:
+        f.write('4,abcd1234,Attr-01,2,,,,NCP\n')
+    assert len(rows()) == len(res) + 1
+    assert list(cache.glob('values-*.pickle')) != cached
+    assert len(list(cache.glob('values-*'))) == 1
+
+    # Changes of the conversion outside the converter module are marked by the version.
+    cached = list(cache.glob('values-*.pickle'))
+    monkeypatch.setattr(parsing, 'CACHE_VERSION', parsing.CACHE_VERSION + 1)
+    assert len(rows()) == len(res) + 1
+    assert list(cache.glob('values-*.pickle')) != cached
+
+
+@pytest.mark.parametrize(
+    'model,filters,index',
+    [
+        ('OOAUnit', dict(parameter_id='1', code_id='no'), 'ix_ooaunit_parameter_id_code_id'),
+        # Served by either index on (parameter_id, ...).
+        ('OOAUnit', dict(parameter_id='1'), 'ix_ooaunit_parameter_id_'),
+        ('OOAUnit', dict(language_id='abcd1234'), 'ix_ooaunit_language_id_parameter_id'),
+        ('OOAUnit', dict(code_id='yes_Appr-01'), 'ix_ooaunit_code_id'),
+        ('OOALanguage', dict(macroarea='Africa'), 'ix_ooalanguage_macroarea'),
+        ('OOALanguage', dict(family_id='fam11234'), 'ix_ooalanguage_family_id'),
+        ('OOALanguage', dict(glottocode='abcd1234'), 'ix_ooalanguage_glottocode'),
+        ('OOAParameter', dict(feature_set='Appr'), 'ix_ooaparameter_feature_set'),
+    ]
+)
+def test_query_plans(initializedb, model, filters, index):
+    from clld.db.meta import DBSession
+    from wals3 import models
+
+    query = DBSession.query(getattr(models, model)).filter_by(**filters)
+    sql = str(query.statement.compile(
+        dialect=DBSession.bind.dialect, compile_kwargs={'literal_binds': True}))
+    plan = ' '.join(row[-1] for row in DBSession.execute('EXPLAIN QUERY PLAN ' + sql))
+    assert index in plan
+
+
+def test_references():
+    from ooa.scripts.references import parse, Resolver
+
+    refs = parse('fleck2003[1163; 1170]; (Fleck 2003, 12); Silva 2011: 3ff.; see above')
+    assert [(r.key, r.pages) for r in refs][:2] == \
+        [('fleck2003', '1163; 1170'), ('(Fleck 2003, 12)', '12')]
+    assert (refs[2].author, refs[2].year, refs[2].pages) == ('Silva', '2011', '3ff.')
+
+    resolver = Resolver([(1, 'fleck2003', 'Fleck, David W.', '2003')])
+    assert [pk for pk, _ in resolver('OOAUnit', '1', refs)] == [1, 1]
+    assert [d.reason for d in resolver.diagnostics] == \
+        ['no source for citation', 'unparseable reference']
+
+
+@pytest.mark.parametrize(
+    'sort',
+    [
+        {},
+        dict(iSortingCols='1', iSortCol_0='0', sSortDir_0='desc'),
+        dict(iSortingCols='1', iSortCol_0='1', sSortDir_0='asc'),
+        dict(iSortingCols='2', iSortCol_0='1', sSortDir_0='desc', iSortCol_1='0'),
+        dict(iSortingCols='1', iSortCol_0='2', sSortDir_0='asc'),
+    ]
+)
+def test_KeysetPagination(engine, initializedb, sort):
+    from sqlalchemy import event
+    from pyramid.testing import DummyRequest, testConfig
+    from ooa.datatables import KeysetPagination, BOUNDARIES
+    from wals3.datatables import Units
+    from wals3.models import OOAUnit
+
+    def page(start, keyset=True):
+        req = DummyRequest(params=dict(sort, iDisplayStart=str(start), iDisplayLength='1'))
+        req.translate = lambda s: s
+        dt = Units(req, OOAUnit)
+        query = dt.get_query() if keyset else super(KeysetPagination, dt).get_query()
+        return [u.id for u in query]
+
+    def rows_read(conn, cursor, statement, params, *args):
+        # Only the rows of the page - and the counts - select the remark, the key lookups
+        # do not. SQLite adds an OFFSET to every LIMIT.
+        if 'ooaunit.remark' in statement and 'count(' not in statement:
+            offsets.append(params[-1] if 'OFFSET' in statement else 0)
+
+    keyset = sort.get('iSortCol_0') != '2'
+    with testConfig():
+        expected = [page(i, keyset=False) for i in range(3)]
+        BOUNDARIES.clear()
+        # Without a known boundary, the key of the first row of a page is looked up, and the
+        # rows are read from there. Orderings other than by the keyset columns are always
+        # paged with OFFSET.
+        offsets = []
+        event.listen(engine, 'before_cursor_execute', rows_read)
+        try:
+            assert page(2) == expected[2]
+        finally:
+            event.remove(engine, 'before_cursor_execute', rows_read)
+        assert offsets == ([0] if keyset else [2])
+        assert sorted(k for b in BOUNDARIES.values() for k in b) == ([2] if keyset else [])
+        assert all(expected) and [page(i) for i in range(3)] == expected
+        # Paging forward, the first row of each next page is known.
+        assert sorted(k for b in BOUNDARIES.values() for k in b) == ([1, 2] if keyset else [])
+        # Pages requested again, in any order.
+        assert [page(i) for i in [2, 0, 1]] == [expected[i] for i in [2, 0, 1]]
+        assert page(3) == []
+
+
+def test_Units_of_language(initializedb):
+    from pyramid.testing import DummyRequest, testConfig
+    from wals3.datatables import Units
+    from wals3.models import OOAUnit
+
+    with testConfig():
+        req = DummyRequest(params={'language': 'efgh1234'})
+        req.translate = lambda s: s
+        dt = Units(req, OOAUnit)
+        assert dt.language.id == 'efgh1234'
+        assert sorted(u.id for u in dt.get_query()) == ['1', '2']
+        assert dt.count_all == 2
+
+
+def test_CountCache(initializedb):
+    from pyramid.testing import DummyRequest, testConfig
+    from ooa.datatables import count_cache_stats
+    from wals3 import datatables
+    from wals3.models import OOAUnit
+    from wals3.util import bump_data_version
+
+    def counts(**params):
+        req = DummyRequest(params=dict(params, sEcho='1'))
+        req.translate = lambda s: s
+        dt = datatables.Units(req, OOAUnit)
+        dt.get_query().all()
+        return dt.count_all, dt.count_filtered
+
+    with testConfig():
+        stats = count_cache_stats()
+        assert counts(sSearch_0='2') == (3, 1)
+        assert counts(sSearch_0='2', iDisplayStart='1') == (3, 1)
+        assert counts(sSearch_0='3') == (3, 1)
+        new = count_cache_stats()
+        assert new['hits'] - stats['hits'] == 3
+        assert new['misses'] - stats['misses'] == 3
+
+        bump_data_version()
+        assert counts() == (3, 3)
+        # Without filters, both counts run the same query.
+        assert count_cache_stats()['misses'] - new['misses'] == 1
+
+
+def test_count_cache_stats(webapp):
+    from pyramid.testing import testConfig
+
+    webapp.get('/ooaunits')
+    assert set(webapp.get('/_datatables/counts').json) == {'hits', 'misses', 'size'}
+
+    # Without setting ``ooa.count_cache_stats`` the statistics are not served.
+    with testConfig(settings={}) as config:
+        config.include('ooa.datatables')
+        assert config.get_routes_mapper().get_route('count_cache') is None
+
+
+def test_fulltext(initializedb):
+    from clld.db.meta import DBSession
+    from ooa import fulltext
+    from wals3.models import OOAParameter, OOAUnit
+
+    assert [(k, DBSession.query(OOAParameter).get(pk).id) for k, pk, _ in fulltext.search(
+        'apprehens MORPH')] == [('parameter', 'Appr-01')]
+    assert [k for k, _, _ in fulltext.search('a', kinds=['unit'])] == ['unit']
+    assert fulltext.search('?') == []
+    assert fulltext.match('unit', ' ') is None
+    assert [u.id for u in DBSession.query(OOAUnit).filter(fulltext.match('unit', 'remar'))] \
+        == ['2']
+
+
+def test_search(webapp):
+    res = webapp.get('/search?q=apprehens&kind=parameter,code').json
+    assert [r['id'] for r in res['results']] == ['Appr-01']
+    assert webapp.get('/search?q=a&kind=unit,feature', status=400).status_int == 400
+
+
+def test_TabIndex(initializedb):
+    from pyramid.testing import DummyRequest
+    from wals3.adapters import UnitsTab, LanguagesTab
+
+    tab = UnitsTab(None)
+    tab.chunksize = 2
+    res = tab.render_to_response(None, DummyRequest())
+    assert res.content_type == 'text/plain' and res.charset == 'utf-8'
+    chunks = list(res.app_iter)
+    assert len(chunks) == 2
+    lines = b''.join(chunks).decode('utf8').split('\n')
+    assert lines[0].split('\t')[:3] == ['id', 'language', 'feature']
+    assert len(lines) == 4 and lines[1].startswith('1\t')
+    assert tab.render(None, DummyRequest()) == b''.join(chunks).decode('utf8')
+    assert len(LanguagesTab(None).render(None, DummyRequest()).split("\n")) == 3
+
+
+def test_maplayers(initializedb):
+    import gzip
+    import json
+    from pyramid.testing import DummyRequest, testConfig
+    from clld.interfaces import IIconList
+    from clld.web.icon import ORDERED_ICONS
+    from ooa import maplayers
+    from wals3.models import OOAParameter
+    from wals3.util import bump_data_version, icon_url, normalized_icon
+
+    with testConfig() as config:
+        config.registry.registerUtility(ORDERED_ICONS, IIconList)
+        req = DummyRequest()
+        parameter = OOAParameter.get('Appr-01')
+        stats = maplayers.cache_stats()
+        docs = maplayers.layers(req, parameter)
+        assert set(docs) == {None, 'no_Appr-01', 'yes_Appr-01'}
+        # Layers are keyed by the ids of the codes, also for ids normalized on load.
+        assert set(docs) - {None} == {de.id for de in parameter.domain}
+        fc = json.loads(gzip.decompress(docs['yes_Appr-01'].body).decode('utf8'))
+        assert fc['properties']['parameter'] == 'Appr-01'
+        # Each layer has the marker of its code, whatever other layers there are:
+        yes = [de for de in parameter.domain if de.id == 'yes_Appr-01'][0]
+        assert fc['properties']['icon'] == icon_url(normalized_icon(yes.jsondata['icon']))
+        assert [f['geometry']['coordinates'] for f in fc['features']] == [[151.5, -5.0]]
+        assert set(fc['features'][0]['properties']) == {'language'}
+        assert len(json.loads(gzip.decompress(docs[None].body).decode('utf8'))) == 2
+
+        assert maplayers.layers(req, parameter) is docs
+        bump_data_version()
+        assert maplayers.layers(req, parameter)[None].etag == docs[None].etag
+        new = maplayers.cache_stats()
+        assert (new['hits'] - stats['hits'], new['misses'] - stats['misses']) == (1, 2)
+
+        # Codes of upgraded databases have no icon.
+        yes.jsondata = {}
+        bump_data_version()
+        fc = json.loads(gzip.decompress(
+            maplayers.layers(req, parameter)['yes_Appr-01'].body).decode('utf8'))
+        assert fc['properties']['icon'] == icon_url(normalized_icon('c000000'))
+
+
+def test_TileIndex():
+    from ooa.tiles import TileIndex
+
+    index = TileIndex([
+        ('a', 'A', 10.5, 20.25), ('b', 'B', 10.51, 20.26), ('c', 'C', -5, 151.5)],
+        max_zoom=4)
+
+    def counts(z, x, y):
+        return sorted(f['properties']['count'] for f in index.tile(z, x, y)['features'])
+
+    assert counts(0, 0, 0) == [1, 2]
+    assert counts(4, 8, 7) == [2]
+    # Above max_zoom, languages are not clustered.
+    assert counts(12, 2278, 1927) == [1, 1]
+    assert counts(12, 2278, 1928) == []
+    feature = index.tile(0, 0, 0)['features'][-1]
+    assert feature['geometry']['coordinates'] == [151.5, -5.0]
+    assert feature['properties']['language'] == {'id': 'c', 'name': 'C'}
+
+
+def test_IconTable(initializedb):
+    from pyramid.testing import DummyRequest, testConfig
+    from clld.db.meta import DBSession
+    from clld.interfaces import IMapMarker
+    from wals3 import map_marker
+    from wals3.adapters import GeoJsonLects
+    from wals3.models import OOALanguage
+    from wals3.util import icon_url, normalized_icon
+
+    assert normalized_icon("c00d'") == normalized_icon('c0000dd') == 'c0000dd'
+    assert icon_url('c0000dd').startswith('data:') and icon_url('x') == ''
+    hits = icon_url.cache_info().hits
+    assert icon_url('c0000dd') is icon_url('c0000dd')
+    assert icon_url.cache_info().hits == hits + 2
+
+    class Ctx(object):
+        languages = DBSession.query(OOALanguage).all()
+
+    with testConfig() as config:
+        config.registry.registerUtility(map_marker, IMapMarker)
+        req = DummyRequest(params={'efgh1234': 'sff0'})
+        res = GeoJsonLects(None).render(Ctx(), req, dump=False)
+        icons = res['properties']['icons']
+        assert sorted(icons.values()) == sorted([icon_url('c0000dd'), icon_url('sffff00')])
+        assert {f['properties']['icon'] for f in res['features']} == set(icons)
+        # The keys are shared by all GeoJSON of the request.
+        assert GeoJsonLects(None).render(Ctx(), req, dump=False)['properties']['icons'] \
+            == icons
+
+
+def test_combinations(initializedb):
+    import numpy
+    from pyramid.testing import DummyRequest, testConfig
+    from clld.interfaces import IIconList
+    from clld.web.icon import ORDERED_ICONS
+    from ooa import combinations
+    from ooa.util import pie_url
+
+    with testConfig() as config:
+        config.registry.registerUtility(ORDERED_ICONS, IIconList)
+        req = DummyRequest()
+        for ids in [['Appr-01'], ['Appr-01', 'xyz'], ['Appr-01', 'Appr-01']]:
+            assert combinations.combination(req, ids) is None
+
+        comb = combinations.combination(req, ['Appr-01', 'Attr-01'])
+        # Attr-01 has a unit without code only.
+        assert comb.codes == [['no_Appr-01', 'yes_Appr-01'], []]
+        assert comb.table.shape == (2, 0) and comb.cells() == []
+        assert comb.__json__(req)['parameters'] == ['Appr-01', 'Attr-01']
+
+        # Three languages, three parameters; the third language has two codes for the first.
+        languages = combinations.Languages([
+            (1, 'a', 'A', 1.0, 2.0), (2, 'b', 'B', None, None), (3, 'c', 'C', 3.0, 4.0)])
+        matrices = [
+            combinations.CodeMatrix(
+                ['x', 'y'], numpy.array([[1, 0], [0, 1], [1, 1]], bool), ['c0000dd', 'cff0000']),
+            combinations.CodeMatrix(['u'], numpy.array([[1], [1], [1]], bool), ['c0000dd']),
+            combinations.CodeMatrix(
+                ['s', 't'], numpy.array([[1, 0], [1, 0], [0, 1]], bool), ['c0000dd', 'cff0000']),
+        ]
+        comb = combinations.Combination([], matrices, languages)
+        assert comb.table.tolist() == [[[1, 1]], [[1, 1]]]
+        assert comb.cells()[0] == (('x', 'u', 's'), 1)
+        assert list(comb.rows(('y', 'u', 't'))) == [2]
+        layers = {fc['properties']['layer']: fc for fc in comb.layers(req)}
+        assert len(layers) == 4 and layers['y_u_s']['features'] == []
+        assert layers['x_u_t']['features'][0]['geometry']['coordinates'] == [4.0, 3.0]
+        # The marker of a combination is made from the colours of its codes:
+        assert layers['x_u_t']['properties']['icon'] == \
+            pie_url(('c0000dd', 'c0000dd', 'cff0000')) == comb.icon(('x', 'u', 't'))
+        assert layers['y_u_s']['properties']['icon'] != layers['x_u_t']['properties']['icon']
+
+
+def test_stats(initializedb):
+    from pyramid.testing import DummyRequest
+    from clld.db.meta import DBSession
+    from wals3.models import OOAParameter
+    from ooa import stats
+
+    res = stats.snapshot(DummyRequest()).stats(
+        DBSession.query(OOAParameter).filter(OOAParameter.id == 'Appr-01').one().pk)
+    assert res['codes'] == ['no_Appr-01', 'yes_Appr-01']
+    assert res['languages'] == 2
+    assert res['macroarea'] == {'Africa': {'no_Appr-01': 1}, 'Eurasia': {'yes_Appr-01': 1}}
+    assert res['family'] == {'fam11234': {'yes_Appr-01': 1}}
+    assert res['sample']['balanced'] == {'no_Appr-01': 1}
+    assert res['sample']['north_america'] == {'yes_Appr-01': 1}
+    assert res['sample']['noun'] == {}
+
+    snapshot = stats.Snapshot(
+        [(1, 'Africa', None, 63), (2, None, 'f', 0)],
+        [(5, 1, 'a'), (5, 1, 'a'), (5, 2, 'b'), (5, 1, 'b'), (6, 2, 'c')])
+    res = snapshot.stats(5)
+    assert res['total'] == {'a': 1, 'b': 2}
+    assert res['family'] == {'f': {'b': 1}}
+    assert snapshot.stats(7)['codes'] == []
+
+
+def test_samples(initializedb):
+    from pyramid.httpexceptions import HTTPBadRequest
+    from pyramid.testing import DummyRequest, testConfig
+    from clld.db.meta import DBSession
+    from ooa import samples, tiles
+    from wals3 import datatables
+    from wals3.adapters import LanguagesTab
+    from wals3.models import OOALanguage
+
+    abcd, efgh = DBSession.query(OOALanguage).order_by(OOALanguage.id)
+    assert (abcd.balanced, abcd.world, abcd.north_america) == (True, True, False)
+    assert efgh.north_america is True and efgh.noun is False
+    assert samples.names(abcd.samples) == ['balanced', 'world']
+    assert samples.names(efgh.samples) == ['north_america']
+
+    with testConfig():
+        index = samples.index(DummyRequest())
+        assert index.pks(0) == sorted([abcd.pk, efgh.pk])
+        assert index.pks(samples.mask(['world'])) == [abcd.pk]
+        assert index.count(samples.mask(['world', 'north_america'])) == 0
+        assert samples.request_mask(DummyRequest(params={'samples': 'world, balanced'})) == 9
+        with pytest.raises(HTTPBadRequest):
+            samples.request_mask(DummyRequest(params={'samples': 'nope'}))
+
+        req = DummyRequest(params={'samples': 'north_america'})
+        assert DBSession.query(OOALanguage).filter(
+            samples.condition(samples.request_mask(req))).one() == efgh
+        assert LanguagesTab(None).render(None, req).split('\n')[1].startswith('efgh1234\t')
+        assert len(tiles.tile_index(req, 8).tile(0, 0, 0)['features']) == 1
+
+        req = DummyRequest(params={'samples': 'world', 'sEcho': '1'})
+        req.translate = lambda s: s
+        dt = datatables.Languages(req, OOALanguage)
+        assert [l.id for l in dt.get_query()] == ['abcd1234']
+        assert dt.cols[4].format(abcd) == 'balanced, world'
+
+
+def test_contexts(initializedb):
+    import json
+    from pyramid.testing import DummyRequest
+    from wals3 import contexts, codes_sample_factory, sample_factory
+
+    ctx = codes_sample_factory(DummyRequest())
+    assert 'rows' not in ctx.__dict__
+    assert [c.id for c in ctx] == ['no_Appr-01', 'yes_Appr-01']
+    assert json.loads(b''.join(ctx.iter_json()).decode('utf8')) == ctx.__json__(None)
+    assert codes_sample_factory(DummyRequest()).rows is ctx.rows
+
+    ctx = contexts.Codes(DummyRequest(params={'page': '5'}))
+    ctx.page_size = 1
+    assert (ctx.pages, ctx.page, [c.id for c in ctx.items()]) == (2, 2, ['yes_Appr-01'])
+    ctx.chunksize = 1
+    assert json.loads(b''.join(ctx.iter_json()).decode('utf8'))['codes'][1]['id'] == \
+        'yes_Appr-01'
+
+    ctx = sample_factory(DummyRequest(params={'samples': 'world'}))
+    res = json.loads(b''.join(ctx.iter_json()).decode('utf8'))
+    assert res == ctx.__json__(None) and res['name'] == 'world sample'
+    assert [l['id'] for l in res['languages']] == ['abcd1234']
+    assert len(sample_factory(DummyRequest())) == 2
+
+
+#: Maximal number of SQL statements for a detail page.
+QUERY_BUDGET = 3
+
+
+@pytest.mark.parametrize('path', [
+    '/ooalanguages/abcd1234',
+    '/ooalanguages/abcd1234.json',
+    '/ooafeatures/Appr-01',
+    '/ooaunits/1',
+    '/ooacodess/yes_Appr-01.json',
+    '/ooafeaturesetss/Appr',
+    '/ooafeaturesetss/Appr.json',
+])
+def test_query_budget(webapp, path):
+    res = webapp.get(path)
+    assert res.status_int == 200
+    assert 0 < len(webapp.statements) <= QUERY_BUDGET, '\n'.join(webapp.statements)
+
+
+def test_sql_instrumentation(webapp, caplog):
+    from pyramid.testing import testConfig
+    from ooa import instrumentation
+
+    res = webapp.get('/ooalanguages/abcd1234')
+    timing = res.headers['Server-Timing']
+    assert timing.startswith('db;dur=')
+    assert '"{0} statements"'.format(len(webapp.statements)) in timing
+    stats = webapp.get('/_sql').json
+    assert stats['routes']['language']['requests'] >= 1
+    assert stats['slowest']
+
+    t = instrumentation.Timing(None, threshold=0, slowest=2)
+    for i, statement in enumerate(['a', 'b', 'c']):
+        t.add(statement, i)
+    assert [s['statement'] for s in t.__json__()['slowest']] == ['c', 'b']
+    assert 'slow query' in caplog.text
+
+    # Without setting ``ooa.sql_stats`` the statistics are not served.
+    with testConfig(settings={}) as config:
+        config.include('ooa.instrumentation')
+        assert config.get_routes_mapper().get_route('sql_stats') is None
+
+
+def test_http_cache(webapp):
+    import importlib.metadata
+    from types import SimpleNamespace
+    import transaction
+    from clld.db.meta import DBSession
+    from ooa import maplayers
+    from pyramid.request import Request
+    from pyramid.response import Response
+    from ooa.httpcache import app_version, http_cache_tween_factory
+    from wals3.models import OOAParameter
+    from wals3.util import bump_data_version
+
+    res = webapp.get('/ooalanguages/abcd1234.json')
+    tag, modified = res.headers['ETag'], res.headers['Last-Modified']
+    assert webapp.get('/ooalanguages/efgh1234.json').headers['ETag'] != tag
+    assert webapp.get(
+        '/ooalanguages/abcd1234.json', headers={'If-None-Match': tag}).status_int == 304
+    assert webapp.get('/ooalanguages/abcd1234.json', headers={
+        'If-Modified-Since': modified}).status_int == 304
+    # Conditions are evaluated against the response of the view:
+    assert webapp.get('/ooalanguages/nope1234.json', headers={
+        'If-Modified-Since': modified}, status=404).status_int == 404
+    assert webapp.get('/_sql').headers.get('ETag') is None
+    res = webapp.get('/ooalanguages/abcd1234.json', headers={'Accept-Encoding': 'gzip'})
+    assert res.headers['ETag'] != tag
+    assert res.headers['Vary'] == 'Accept, Accept-Encoding, X-Requested-With'
+
+    # Validators of the view are kept, and its Vary header is extended:
+    res = webapp.get('/ooafeatures/Appr-01/geojson', headers={'Accept-Encoding': 'gzip'})
+    doc = maplayers.layers(None, OOAParameter.get('Appr-01'))[None]
+    assert res.headers['ETag'] == '"{0}"'.format(doc.etag)
+    assert res.headers['Vary'] == 'Accept-Encoding, Accept, X-Requested-With'
+    assert webapp.get('/ooafeatures/Appr-01/geojson', headers={
+        'Accept-Encoding': 'gzip', 'If-None-Match': res.headers['ETag']}).status_int == 304
+
+    # ... as is its Cache-Control:
+    assert webapp.get('/ooalanguages/abcd1234.json').headers['Cache-Control'] == \
+        'public, max-age=0'
+    registry = webapp.app.registry
+    tween = http_cache_tween_factory(
+        lambda req: Response(json_body={}, cache_control='private'), registry)
+    req = Request.blank('/ooalanguages/abcd1234.json')
+    req.registry = registry
+    assert tween(req).headers['Cache-Control'] == 'private'
+
+    assert app_version(SimpleNamespace(settings={'ooa.app_version': 'a1'})) == 'a1'
+    assert app_version(SimpleNamespace(settings={}, package_name='wals3')) == \
+        importlib.metadata.version('wals3')
+
+    with transaction.manager:
+        bump_data_version()
+    DBSession.remove()
+    res = webapp.get('/ooalanguages/abcd1234.json', headers={'If-None-Match': tag})
+    assert res.status_int == 200 and res.headers['ETag'] != tag
+
+
+@pytest.mark.parametrize('cache', ['memory', 'disk'])
+def test_response_cache(tmp_path, cache):
+    from ooa.httpcache import MemoryCache, DiskCache
+
+    c = MemoryCache(size=1) if cache == 'memory' else DiskCache(tmp_path)
+    c.set('v1', 'a', ('200 OK', [], b'a'))
+    assert c.get('v1', 'a') == ('200 OK', [], b'a')
+    assert c.get('v2', 'a') is None
+    c.set('v2', 'b', ('200 OK', [], b'b'))
+    assert c.get('v1', 'a') is None and c.get('v2', 'b')
+
 
-    class TestMatrix(Matrix):
-        def abspath(self, req):
-            return tmp_path / 'test'
+def test_snapshot(webapp, tmp_path):
+    import transaction
+    from clld.db.meta import DBSession
+    from wals3.models import OOALanguage
+    from wals3.scripts.snapshot import Snapshot, filename
 
-        def query(self, req):
-            return Matrix.query(self, req).filter(Language.pk < 100)
+    with transaction.manager:
+        DBSession.add(OOALanguage(id='gone1234', name='Gone'))
+    DBSession.remove()
+    snapshot = Snapshot(tmp_path)
+    manifest = snapshot.run(webapp.app)
+    assert 'ooalanguages/abcd1234/index.html' in manifest['changed']
+    assert 'ooacodess/yes_Appr-01.json' in manifest['files']
+    assert tmp_path.joinpath('ooalanguages', 'abcd1234', 'index.html.gz').exists()
+    assert 'ooafeatures/Appr-01/index.html' in manifest['files']
+    # Units have no alternate representations:
+    assert manifest['errors']['/ooaunits/1.json'] == 404
+    assert filename('/') == 'index.html'
 
-    m = TestMatrix(Language, 'wals3', description="Feature values CSV")
-    m.create(env['request'], verbose=False)
-    assert tmp_path.joinpath('test').exists()
+    manifest = snapshot.run(webapp.app, chunksize=2)
+    assert not manifest['changed'] and not manifest['removed']
 
+    # Only files of the resources rendered are removed, if they are gone:
+    with transaction.manager:
+        DBSession.delete(OOALanguage.get('gone1234'))
+    DBSession.remove()
+    snapshot.resources = ['ooalanguage']
+    manifest = snapshot.run(webapp.app)
+    assert 'ooalanguages/gone1234/index.html' in manifest['removed']
+    assert all(name.startswith('ooalanguages/gone1234') for name in manifest['removed'])
+    assert not tmp_path.joinpath('ooalanguages', 'gone1234', 'index.html').exists()
+    assert 'ooacodess/yes_Appr-01.json' in manifest['files']
+    assert '/ooaunits/1.json' in manifest['errors']
+    assert tmp_path.joinpath('ooacodess', 'yes_Appr-01.json').exists()
@@ -1,13 +1,12 @@
-import string
+import functools
 import itertools
 
 from sqlalchemy import true
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, undefer
 from pyramid.httpexceptions import HTTPNotFound, HTTPMovedPermanently
 from pyramid.config import Configurator
 from pyramid.response import Response
 
-from clldutils import svg
 from clld.interfaces import (
     IParameter, IMapMarker, IDomainElement, IValue, ILanguage,
     ICtxFactoryQuery, IIconList, IUnit, IUnitParameter
@@ -17,11 +16,18 @@ from clld.web.adapters.base import adapter_factory
 from clld.web.icon import Icon
 from clld.web.app import CtxFactoryQuery, ClldRequest
 from clld.db.models.common import Contribution, ContributionReference, Parameter, Language, Source, DomainElement
+from clld.db.models.common import (
+    LanguageIdentifier, Unit, UnitValue, UnitDomainElement,
+)
 
-from wals3.adapters import Matrix
 from wals3.models import Family, Country, Genus, OOALanguage, OOAParameter, OOAUnit, OOAFeatureSet
+from wals3.models import OOACode
 from wals3.interfaces import IFamily, ICountry, IGenus, IFeatureSet
 from wals3.datatables import Featuresets
+from wals3.util import icon_url, normalized_icon
+from wals3 import contexts
+from ooa import samples
+from ooa.adapters import Matrix
 
 COLORS = [
     '00d', '000', '6f3', '9ff', '090', '99f', '909', 'a00', 'ccc', 'd00', 'f6f', 'f40', 'f60',
@@ -53,7 +59,7 @@ def map_marker(ctx, req):
             'v%s' % ctx.domainelement.number,
             ctx.domainelement.jsondata['icon'])
     elif IDomainElement.providedBy(ctx):
-        icon = req.params.get('v%s' % ctx.number, ctx.jsondata['icon'])
+        icon = req.params.get('v%s' % ctx.number, ctx.jsondata.get('icon', 'c000000'))
     elif ILanguage.providedBy(ctx):
         # hard coded icon
         icon = req.params.get(ctx.id, 'c0000dd')
@@ -62,27 +68,54 @@ def map_marker(ctx, req):
         icon = req.params.get(ctx.id, ctx.icon)
 
     if icon:
-        if "'" in icon:
-            icon = icon.split("'")[0]
-        if len(icon) > 4 and len(icon) != 7:
-            icon = icon[:4]
-        if len(icon) == 4:
-            icon = icon[0] + 2*icon[1] + 2*icon[2] + 2*icon[3]
-        if icon.startswith('a'):
-            return svg.data_url(svg.icon('c000000', opacity='0'))
-        try:
-            return svg.data_url(svg.icon(icon))
-        except KeyError:
-            return ''
+        return icon_url(normalized_icon(icon))
+
+
+@functools.lru_cache(maxsize=None)
+def eager_loading():
+    """What the detail pages of the OOA resources need, to be loaded with the object itself.
+
+    Routes of the generic clld resources query the base class, so the OOA subclass is
+    loaded with it. Options can only be created once the mappers are configured - i.e. on
+    first use.
+
+    :return: `dict` mapping the model of a route to a pair (subclass, loader options).
+    """
+    res = {
+        Language: (OOALanguage, [
+            joinedload(Language.languageidentifier)
+            .joinedload(LanguageIdentifier.identifier),
+            joinedload(Language.sources),
+        ]),
+        Parameter: (OOAParameter, [joinedload(Parameter.domain.of_type(OOACode))]),
+        DomainElement: (OOACode, []),
+        Unit: (OOAUnit, [
+            joinedload(Unit.language),
+            joinedload(OOAUnit.parameter),
+            joinedload(Unit.data),
+            joinedload(Unit.unitvalues).joinedload(UnitValue.unitparameter),
+        ]),
+        UnitDomainElement: (OOAFeatureSet, []),
+    }
+    for cls, options in list(res.values()):
+        res[cls] = (None, options)
+    return res
 
 
 class WalsCtxFactoryQuery(CtxFactoryQuery):
     def refined_query(self, query, model, req):
+        cls, options = eager_loading().get(model, (None, []))
+        if cls:
+            # `with_polymorphic` must be called before the query is filtered.
+            query = req.db.query(model).with_polymorphic([cls])\
+                .filter(model.id == req.matchdict['id'])
+        # Every context is checked for `active`, a deferred column.
+        query = query.options(undefer('active'), *options)
         if model == Contribution:
             return query.options(
                 joinedload(Contribution.references).joinedload(ContributionReference.source))
         if model == Parameter:
-            if req.matchdict['id'][-1] not in string.ascii_uppercase:
+            if req.matchdict['id'].isdigit():
                 # route match for 2008-style URL: redirect!
                 raise HTTPMovedPermanently(
                     req.route_url('parameters', id=req.matchdict['id']))
@@ -101,31 +134,14 @@ class WalsCtxFactoryQuery(CtxFactoryQuery):
 
 
 def sample_factory(req):
-    class Sample(object):
-       # name = '%s-language sample' % req.matchdict['count']
-        languages = req.db.query(OOALanguage).all()
-            # .filter(col == true())\
-            # .options(joinedload(WalsLanguage.genus).joinedload(Genus.family))\
-            # .order_by(WalsLanguage.name)
-
-        def __json__(self, req):
-            return {'name': self.name, 'languages': list(self.languages)}
-
-    return Sample()
+    """The languages of the samples requested with parameter ``samples``, see
+    `wals3.contexts`."""
+    return contexts.Languages(req, samples.request_mask(req))
 
 
 def codes_sample_factory(req):
-    class Sample(object):
-        codes = req.db.query(DomainElement).all()
-
-        # .filter(col == true())\
-        # .options(joinedload(WalsLanguage.genus).joinedload(Genus.family))\
-        # .order_by(WalsLanguage.name)
-
-        def __json__(self, req):
-            return {'codes': list(self.codes)}
-
-    return Sample()
+    """All codes, see `wals3.contexts`."""
+    return contexts.Codes(req)
 
 
 # def featureset_sample_factory(req: ClldRequest):
@@ -140,7 +156,7 @@ def codes_sample_factory(req):
 
 class WalsIcon(Icon):
     def url(self, req):
-        return svg.data_url(svg.icon(self.name))
+        return icon_url(self.name)
 
 
 def main(global_config, **settings):
@@ -178,6 +194,10 @@ def main(global_config, **settings):
     #config = Configurator(**dict(settings=settings))
     config = Configurator(**dict(settings=settings))
     config.include('clldmpg')
+    config.include('ooa.instrumentation')
+    config.include('ooa.datatables')
+    config.include('ooa.httpcache')
+    config.include('ooa.views')
     for utility, interface in [
         (WalsCtxFactoryQuery(), ICtxFactoryQuery),
         (map_marker, IMapMarker),
@@ -208,9 +228,17 @@ def main(global_config, **settings):
     # TODO: so what does settings even do?
     config.add_route('features', '/ooafeatures')
     config.add_route('codes', '/domainelement', factory=codes_sample_factory)
+    config.add_route('codes_alt', '/domainelement.json', factory=codes_sample_factory)
     config.add_route('featuresets', '/ooafeaturesets',)
     # this is required to display the featuresets as they are mapped to unitdomainelements
     config.add_route('unitdomainelements', '/ooafeaturesets')
+    config.add_route('fulltext', '/search')
+    config.add_route('parameter_geojson', '/ooafeatures/{id}/geojson')
+    config.add_route('parameter_stats', '/ooafeatures/{id}/stats')
+    config.add_route('language_tiles', r'/ooalanguages/tiles/{z:\d+}/{x:\d+}/{y:\d+}')
+    config.add_route('ooacombination', r'/ooacombinations/{ids:[^/\.]+}')
+    config.add_route('ooacombination_alt', r'/ooacombinations/{ids:[^/\.]+}.json')
+    config.add_route('matrix', '/ooamatrix.{ext}')
     # for spec in [
     #     dict(
     #         template='parameter/detail_tab.mako',
@@ -316,8 +344,11 @@ def main(global_config, **settings):
     # config.add_410("/experimental/{id}")
     #
     #
-    # config.register_download(
-    #     Matrix(Language, 'wals3', description="Feature values CSV"))
+    config.register_download(Matrix(
+        Language,
+        'wals3',
+        directory=settings.get('wals3.download_dir'),
+        description="Feature values CSV"))
     # config.register_download(
     #     Download(Source, 'wals3', ext='bib', description="Sources as BibTeX"))
 
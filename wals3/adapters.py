@@ -1,26 +1,44 @@
-from itertools import groupby
 
-from sqlalchemy.orm import joinedload, subqueryload
+from sqlalchemy.orm import joinedload, Session
+from pyramid.response import Response
+from pyramid.renderers import render as pyramid_render
+from clldutils import svg
 
-from clldutils.misc import lazyproperty
-from clld.interfaces import ILanguage, IParameter, IIndex, ICldfConfig
+from clld.interfaces import ILanguage, IParameter, IUnit, IIndex, ICldfConfig
 from clld.web.adapters.base import Index
 from clld.web.adapters.cldf import CldfConfig
 from clld.web.adapters.geojson import GeoJsonParameter, GeoJson
-from clld.web.adapters.download import CsvDump
-from clld.web.maps import SelectedLanguagesMap, Layer
-from clld.web.util.helpers import map_marker_img
+from clld.web.maps import Map
+from clld.web.util.helpers import JS
 from clld.db.meta import DBSession
 from clld.db.models.common import (
-    Value, DomainElement, ValueSet, Language, Parameter, LanguageIdentifier,
+    Value, DomainElement, ValueSet, Language, LanguageIdentifier,
 )
 
-from wals3.models import Genus, OOALanguage, OOAParameter
+from wals3.models import OOALanguage, OOAParameter, OOAUnit
+from wals3.util import IconTable
+from ooa import samples
 
 # TODO: DOcumentation
 # https://muthukadan.net/docs/zca.html#adapters
 
-class GeoJsonFeature(GeoJsonParameter):
+class IconTableMixin(object):
+
+    """GeoJSON with features referencing their icon by key, see `wals3.util.IconTable`."""
+
+    def render(self, ctx, req, dump=True):
+        res = super(IconTableMixin, self).render(ctx, req, dump=False)
+        table, icons = IconTable.for_request(req), {}
+        for feature in res['features']:
+            url = feature['properties'].get('icon')
+            if url:
+                key = feature['properties']['icon'] = table.key(url)
+                icons[key] = url
+        res['properties']['icons'] = icons
+        return pyramid_render('json', res, request=req) if dump else res
+
+
+class GeoJsonFeature(IconTableMixin, GeoJsonParameter):
     def feature_iterator(self, ctx, req):
         return DBSession.query(Value).join(DomainElement)\
             .filter(DomainElement.id == req.params.get('domainelement'))\
@@ -37,72 +55,34 @@ class GeoJsonFeature(GeoJsonParameter):
             'value_name': value.domainelement.name}
 
 
-class GeoJsonLects(GeoJson):
+class GeoJsonLects(IconTableMixin, GeoJson):
     def feature_properties(self, ctx, req, language):
         if hasattr(ctx, 'icon_url'):  # pragma: no cover
             # special handling for domain elements of feature combinations
             return {'icon': ctx.icon_url}
 
 
-class Matrix(CsvDump):
-    md_fields = [
-        ('wals_code', lambda p: p.id),
-        ('iso_code', lambda p: p.iso_code),
-        ('glottocode', lambda p: p.glottocode),
-        ('Name', lambda p: p.name),
-        ('latitude', lambda p: p.latitude),
-        ('longitude', lambda p: p.longitude),
-        ('genus', lambda p: p.genus.name),
-        ('family', lambda p: p.genus.family.name),
-        ('macroarea', lambda p: p.macroarea),
-        ('countrycodes', lambda p: ' '.join(c.id for c in p.countries)),
-    ]
-    _fields = []
+class LanguageTileMap(Map):
 
-    @lazyproperty
-    def _parameters(self):
-        return DBSession.query(Parameter).order_by(Parameter.pk).all()
+    """Map of all languages, loaded tile by tile as the map is moved - see `ooa.tiles`."""
+
+    def get_options(self):
+        # A combination of samples requested for the map is passed on to the tiles.
+        mask = samples.request_mask(self.req)
+        url = self.req.route_url(
+            'language_tiles', z='__z__', x='__x__', y='__y__',
+            _query={'samples': ','.join(samples.names(mask))} if mask else {})
+        return {
+            'icon_size': 20,
+            'hash': True,
+            'max_zoom': 12,
+            'center': [20, 0],
+            'zoom': 2,
+            'on_init': JS("WALS3.languageTiles('{0}', '{1}')".format(
+                url, svg.data_url(svg.icon('c0000dd'))))}
 
-    #which object to return from database
-    def query(self, req):
-        self._domainelements = DBSession.query(DomainElement).all()
-        return DBSession.query(Language)\
-            .order_by(Language.id)\
-            .options(
-                subqueryload('languageidentifier').subqueryload('identifier'),
-                subqueryload('countries'),
-                joinedload(Language.valuesets).joinedload(ValueSet.values),
-                joinedload(WalsLanguage.genus).joinedload(Genus.family))
-
-    def get_fields(self, req):  # pragma: no cover
-        if not self._fields:
-            self._fields = [f[0] for f in self.md_fields]
-            self._fields.extend(['{0.id} {0.name}'.format(p) for p in self._parameters])
-        return self._fields
-    # displays one row from query
-    def row(self, req, fp, item, index):  # pragma: no cover
-        values = {
-            '{0.id} {0.name}'.format(v.parameter):
-            '{0.number} {0.name}'.format(v.values[0].domainelement)
-            for v in item.valuesets}
-        for name, getter in self.md_fields:
-            value = getter(item)
-            values[name] = value if value is not None else ''
-        values['URL'] = req.resource_url(item)
-        return [values.get(p, '') for p in self.get_fields(req)]
-
-
-class _SelectedLanguagesMap(SelectedLanguagesMap):
     def get_layers(self):
-        for genus, languages in groupby(
-                sorted(self.languages, key=lambda l: l.genus_pk), key=lambda l: l.genus):
-            languages = list(languages)
-            yield Layer(
-                genus.id,
-                genus.name,
-                self.geojson_impl(languages).render(self.ctx, self.req, dump=False),
-                marker=map_marker_img(self.req, genus),
-                representation=len(languages))
+        return []
 
 
 class MapView(Index):
@@ -112,57 +92,82 @@ class MapView(Index):
     template = 'language/map_html.mako'
 
     def template_context(self, ctx, req):
-        langs = list(ctx.get_query(limit=8000))
-        return {'map': _SelectedLanguagesMap(ctx, req, langs), 'languages': langs}
+        return {'map': LanguageTileMap(ctx, req)}
+
 
+class TabIndex(Index):
 
-class LanguagesTab(Index):
+    """TSV export of all objects of a model, streamed to the client.
+
+    Rows are fetched in batches of `chunksize` with `Query.yield_per` and sent as chunks of
+    the response body, so time-to-first-byte and memory use do not depend on the size of
+    the table. Subclasses define `fields` - `list` of pairs (column name, getter) - and the
+    `model` whose objects are listed, in order of primary key, or override `query`.
+
+    The rows are read after the view returned, i.e. after the request transaction ended, so
+    they are read in a session of their own.
+    """
     extension = str('tab')
     mimetype = str('text/vnd.clld.text+tsv')
     send_mimetype = str('text/plain')
+    fields = []
+    model = None
+    chunksize = 1000
+
+    def query(self, ctx, req):
+        return DBSession.query(self.model).order_by(self.model.pk)
+
+    def iter_chunks(self, ctx, req):
+        """Iterator over the encoded TSV, `chunksize` lines at a time.
+
+        The query is built - i.e. request parameters are checked - right away, so errors
+        are raised before the response starts.
+        """
+        return self._chunks(self.query(ctx, req))
+
+    def _chunks(self, query):
+        session = Session(bind=DBSession.bind)
+        try:
+            lines = ['\t'.join(f[0] for f in self.fields)]
+            query = query.with_session(session).yield_per(self.chunksize)
+            for item in query:
+                lines.append('\t'.join(['%s' % f[1](item) for f in self.fields]))
+                if len(lines) > self.chunksize:
+                    # Lines are separated, not terminated, by newlines, so the last line of
+                    # the chunk goes with the next one.
+                    yield ('\n'.join(lines[:-1]) + '\n').encode('utf8')
+                    lines = lines[-1:]
+            yield '\n'.join(lines).encode('utf8')
+        finally:
+            session.close()
 
     def render(self, ctx, req):
-        # fields = [
-        #     ('ooa code', lambda l: l.id),
-        #     ('glottocode', lambda l: l.glottocode),
-        #     ('name', lambda l: l.name),
-        #     ('latitude', lambda l: l.latitude),
-        #     ('longitude', lambda l: l.longitude),
-        #     ('macroarea', lambda l: l.macroarea),
-        #     ('family', lambda l: l.family_name),
-        #     ('sample 100', lambda l: l.samples_100),
-        #     ('sample 200', lambda l: l.samples_200),
-        # glottocode = Column(Unicode)
-        # macroarea = Column(Unicode)
-        # iso = Column(Unicode)
-        # family_id = Column(Unicode)
-        # language_id = Column(Unicode)
-        # family_name = Column(Unicode)
-        # balanced = Column(Unicode)
-        # isolates = Column(Unicode)
-        # american = Column(Unicode)
-        # world = Column(Unicode)
-        # north_america = Column(Unicode)
-        # noun = Column(Unicode)
-        # ]
-        fields = [
-            #('wals code', lambda l: l.id),
-            ('glottocode', lambda l: l.glottocode),
-            ('name', lambda l: l.name),
-            ('latitude', lambda l: l.latitude),
-            ('longitude', lambda l: l.longitude),
-            ('macroarea', lambda l: l.macroarea),
-            #('genus', lambda l: l.genus.name),
-            #('family', lambda l: l.genus.family.name),
-            #('sample 100', lambda l: l.samples_100),
-            #('sample 200', lambda l: l.samples_200),
-        ]
-        lines = [[f[0] for f in fields]]
-        for lang in DBSession.query(OOALanguage):#.options(
-            # joinedload(WalsLanguage.genus).joinedload(Genus.family),
-            # joinedload(Language.languageidentifier).joinedload(LanguageIdentifier.identifier))\:
-            lines.append([f[1](lang) for f in fields])
-        return '\n'.join('\t'.join(['%s' % l for l in line]) for line in lines)
+        return b''.join(self.iter_chunks(ctx, req)).decode('utf8')
+
+    def render_to_response(self, ctx, req):
+        # Without a content length, the body is sent with chunked transfer encoding.
+        res = Response(app_iter=self.iter_chunks(ctx, req))
+        res.vary = str('Accept')
+        res.content_type = str(self.send_mimetype or self.mimetype)
+        res.content_type += str('; charset=') + str(self.charset)
+        return res
+
+
+class LanguagesTab(TabIndex):
+    fields = [
+        ('glottocode', lambda l: l.glottocode),
+        ('name', lambda l: l.name),
+        ('latitude', lambda l: l.latitude),
+        ('longitude', lambda l: l.longitude),
+        ('macroarea', lambda l: l.macroarea),
+        ('samples', lambda l: ','.join(samples.names(l.samples))),
+    ]
+    model = OOALanguage
+
+    def query(self, ctx, req):
+        query = super(LanguagesTab, self).query(ctx, req)
+        mask = samples.request_mask(req)
+        return query.filter(samples.condition(mask)) if mask else query
 
 
 class WalsCldfConfig(CldfConfig):
@@ -184,26 +189,51 @@ class WalsCldfConfig(CldfConfig):
         return res
 
 
-class ParameterTab(Index):
-    extension = str('tab')
-    mimetype = str('text/vnd.clld.text+tsv')
-    send_mimetype = str('text/plain')
+class ParameterTab(TabIndex):
+    fields = [
+        ('id', lambda l: l.id),
+        ('featureset', lambda l: l.feature_set),
+        ('question', lambda l: l.question),
+        ('visualization', lambda l: l.visualization),
+        ('datatype', lambda l: l.datatype),
+    ]
+    model = OOAParameter
+
+
+class UnitsTab(TabIndex):
+    fields = [
+        ('id', lambda u: u.id),
+        ('language', lambda u: u.language_id),
+        ('feature', lambda u: u.feature),
+        ('code', lambda u: u.code_id),
+        ('value', lambda u: u.value),
+        ('remark', lambda u: u.remark),
+        ('coder', lambda u: u.coder),
+    ]
+
+    def query(self, ctx, req):
+        # Plain rows rather than objects - cheaper to load, and no identity map to fill.
+        query = DBSession.query(
+            OOAUnit.id,
+            OOAUnit.language_id,
+            OOAParameter.id.label('feature'),
+            OOAUnit.code_id,
+            OOAUnit.value,
+            OOAUnit.remark,
+            OOAUnit.coder)\
+            .join(OOAParameter, OOAParameter.pk == OOAUnit.parameter_id)\
+            .order_by(OOAUnit.pk)
+        mask = samples.request_mask(req)
+        if mask:
+            query = query\
+                .join(OOALanguage, OOALanguage.pk == OOAUnit.language_pk)\
+                .filter(samples.condition(mask))
+        return query
 
-    def render(self, ctx, req):
-        fields = [
-            ('id', lambda l: l.id),
-            ('featureset', lambda l: l.feature_set),
-            ('question', lambda l: l.question),
-            ('visualization', lambda l: l.visualization),
-            ('datatype', lambda l: l.datatype),
-        ]
-        lines = [[f[0] for f in fields]]
-        for lang in DBSession.query(OOAParameter):
-            lines.append([f[1](lang) for f in fields])
-        return '\n'.join('\t'.join(['%s' % l for l in line]) for line in lines)
 
 def includeme(config):
     config.registry.registerUtility(WalsCldfConfig(), ICldfConfig)
     config.register_adapter(ParameterTab, IParameter, IIndex)
     config.register_adapter(MapView, ILanguage, IIndex)
     config.register_adapter(LanguagesTab, ILanguage, IIndex)
+    config.register_adapter(UnitsTab, IUnit, IIndex)
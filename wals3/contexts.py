@@ -0,0 +1,157 @@
+"""Route contexts listing all codes or all languages.
+
+Pyramid creates the context of a route for every request it matches - before the view is
+looked up, and even if none is found. So these contexts do not query anything when they are
+created: Their rows are read on first access, as plain row tuples of a few columns, and
+kept per process and data version, so that all requests share one copy. Views render one
+page of rows at a time, and the JSON is written in chunks of rows.
+"""
+import json
+import threading
+
+from clldutils.misc import lazyproperty
+from clld.db.meta import DBSession
+from clld.db.models.common import DomainElement, Parameter
+
+from wals3.models import OOALanguage
+from wals3.util import data_version
+from ooa import samples
+
+__all__ = ['Listing', 'Codes', 'Languages']
+
+#: Rows per (listing, data version).
+ROWS = {}
+_rows_lock = threading.Lock()
+
+
+class Listing(object):
+
+    """A lazy list of rows, paginated with request parameter ``page``.
+
+    Subclasses define the `columns` of the rows and their `order`, and may refine the
+    `query`.
+    """
+
+    #: Key of the list of rows in the JSON.
+    key = None
+    columns = ()
+    order = ()
+    page_size = 100
+    chunksize = 500
+
+    def __init__(self, req):
+        self.req = req
+
+    def query(self):
+        return DBSession.query(*self.columns).order_by(*self.order)
+
+    def cache_key(self):
+        return (self.__class__.__name__,)
+
+    @lazyproperty
+    def rows(self):
+        version = data_version(self.req)
+        key = self.cache_key() + (version,)
+        with _rows_lock:
+            if version and key in ROWS:
+                return ROWS[key]
+        res = tuple(self.query())
+        if version:
+            with _rows_lock:
+                # Only rows for the current data version are kept.
+                for k in [k for k in ROWS if k[-1] != version]:
+                    del ROWS[k]
+                ROWS[key] = res
+        return res
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    @property
+    def pages(self):
+        return max(1, -(-len(self) // self.page_size))
+
+    @lazyproperty
+    def page(self):
+        try:
+            page = int(self.req.params.get('page', 1))
+        except ValueError:
+            page = 1
+        return min(max(page, 1), self.pages)
+
+    def items(self):
+        """The rows of the current page."""
+        start = (self.page - 1) * self.page_size
+        return self.rows[start:start + self.page_size]
+
+    def __json__(self, req):
+        return {self.key: [row._asdict() for row in self.rows]}
+
+    def iter_json(self):
+        """Iterator over the encoded JSON - the same as for `__json__` - in chunks of rows."""
+        yield '{{{0}: ['.format(json.dumps(self.key)).encode('utf8')
+        for i in range(0, len(self), self.chunksize):
+            chunk = ', '.join(
+                json.dumps(row._asdict()) for row in self.rows[i:i + self.chunksize])
+            yield ((', ' if i else '') + chunk).encode('utf8')
+        yield b']}'
+
+
+class Codes(Listing):
+
+    """All codes, ordered by parameter."""
+
+    key = 'codes'
+    columns = (
+        DomainElement.id,
+        DomainElement.name,
+        DomainElement.description,
+        Parameter.id.label('parameter'),
+    )
+    order = (Parameter.id, DomainElement.id)
+
+    def query(self):
+        return super(Codes, self).query()\
+            .join(Parameter, Parameter.pk == DomainElement.parameter_pk)
+
+
+class Languages(Listing):
+
+    """All languages - or the languages of a combination of samples, see `ooa.samples`."""
+
+    key = 'languages'
+    columns = (
+        OOALanguage.id,
+        OOALanguage.name,
+        OOALanguage.latitude,
+        OOALanguage.longitude,
+        OOALanguage.macroarea,
+        OOALanguage.family_id,
+    )
+    order = (OOALanguage.name, OOALanguage.id)
+
+    def __init__(self, req, mask=0):
+        super(Languages, self).__init__(req)
+        self.mask = mask
+        self.name = ' and '.join(samples.names(mask)) + ' sample' if mask else 'Languages'
+
+    def cache_key(self):
+        return (self.__class__.__name__, self.mask)
+
+    def query(self):
+        query = super(Languages, self).query()
+        return query.filter(samples.condition(self.mask)) if self.mask else query
+
+    def __json__(self, req):
+        return dict(super(Languages, self).__json__(req), name=self.name)
+
+    def iter_json(self):
+        yield '{{"name": {0}, '.format(json.dumps(self.name)).encode('utf8')
+        chunks = super(Languages, self).iter_json()
+        # Skip the opening brace of the inherited JSON.
+        yield next(chunks)[1:]
+        for chunk in chunks:
+            yield chunk
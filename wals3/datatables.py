@@ -11,6 +11,8 @@ from clld.web.util.helpers import linked_contributors, link, contactmail
 from clld.web.util.htmllib import HTML
 
 from wals3.models import Genus, Family, Chapter, Area, Country, OOALanguage, OOAParameter, OOAUnit, OOAFeatureSet
+from ooa import samples
+from ooa.datatables import FullTextCol, FullTextLinkCol, SamplesCol, CountCache, KeysetPagination
 
 
 # class FeatureIdCol(LinkCol):
@@ -112,7 +114,9 @@ class FeatureAreaCol(_AreaCol):
         return item.chapter.area.name
 
 
-class Features(datatables.Parameters):
+class Features(CountCache, KeysetPagination, datatables.Parameters):
+    keyset_cols = (OOAParameter.id,)
+
     # def base_query(self, query):
     #     return query.join(Chapter).join(Area)\
     #         .options(contains_eager(Feature.chapter, Chapter.area))
@@ -130,13 +134,16 @@ class Features(datatables.Parameters):
         return [
             IdCol(self, 'id', sClass='left'),
             Col(self, 'FeatureSet', model_col=OOAParameter.feature_set),
-            Col(self, 'Questions', model_col=OOAParameter.question),
+            FullTextCol(self, 'Questions', 'parameter', model_col=OOAParameter.question),
             Col(self, 'Visualization', model_col=OOAParameter.visualization),
             Col(self, 'Datatype', model_col=OOAParameter.datatype),
+            Col(self, 'Languages', model_col=OOAParameter.representation),
         ]
 
 
-class Featuresets(datatables.Unitparameters):
+class Featuresets(CountCache, KeysetPagination, datatables.Unitparameters):
+    keyset_cols = (OOAFeatureSet.id,)
+
     def base_query(self, query):
         return query(OOAFeatureSet)
 
@@ -147,6 +154,8 @@ class Featuresets(datatables.Unitparameters):
             Col(self, 'Authors', model_col=OOAFeatureSet.authors),
             Col(self, 'Contributors', model_col=OOAFeatureSet.contributors),
             Col(self, 'Filename', model_col=OOAFeatureSet.filename),
+            Col(self, 'Features', model_col=OOAFeatureSet.count_parameters),
+            Col(self, 'Languages', model_col=OOAFeatureSet.representation),
         ]
 
 
@@ -161,30 +170,43 @@ class CountriesCol(Col):
     #     return WalsLanguage.countries.any(icontains(Country.name, qs))
 
 
-class Languages(datatables.Languages):
+class Languages(CountCache, KeysetPagination, datatables.Languages):
+    keyset_cols = (OOALanguage.id,)
+
     def base_query(self, query):
-        return query
+        # Restrict the table to a combination of samples passed as URL parameter.
+        mask = samples.request_mask(self.req)
+        return query.filter(samples.condition(mask)) if mask else query
 
     def col_defs(self):
         return [
             IdCol(self, 'id', sTitle='glottocode', sClass='left'),
+            FullTextLinkCol(self, 'name', 'language'),
             Col(self, 'macroarea', model_col=OOALanguage.macroarea),
-            Col(self, 'family_id', model_col=OOALanguage.family_id)
+            Col(self, 'family_id', model_col=OOALanguage.family_id),
+            SamplesCol(self, 'samples'),
+            Col(self, 'Datapoints', model_col=OOALanguage.representation),
         ]
 
 
-class Units(Units):
+class Units(CountCache, KeysetPagination, Units):
+    # parameter_id is always set by the loader.
+    keyset_cols = (OOAUnit.id, OOAUnit.parameter_id)
+    __constraints__ = [common.Language, common.Parameter]
 
     def base_query(self, query):
         if self.language:
-            query = query.join(OOALanguage, self.language_pk == self.language.pk)
+            query = query.filter(OOAUnit.language_pk == self.language.pk)
+        if self.parameter:
+            query = query.filter(OOAUnit.parameter_id == self.parameter.pk)
         return query
 
     def col_defs(self):
         return [
             IdCol(self, 'id', sTitle='id'),
             Col(self, 'parameter_id', model_col=OOAUnit.parameter_id),
-            Col(self, 'language_id', model_col=OOAUnit.language_pk)
+            Col(self, 'language_id', model_col=OOAUnit.language_pk),
+            FullTextCol(self, 'remark', 'unit', model_col=OOAUnit.remark),
         ]
 # class Languages(datatables.Languages):
 #     def base_query(self, query):
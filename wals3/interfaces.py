@@ -16,7 +16,6 @@ class ICountry(Interface):
     """marker."""
 
 
-class IFeatureSet(Interface):
-
-    """marker."""
+# The interface of the OOA feature sets is shared with ooaclld.
+from ooa.interfaces import IFeatureSet  # noqa: F401, E402
 
@@ -1,17 +1,14 @@
 from clld.web.maps import ParameterMap, Map, Layer, CombinationMap
 from clld.web.util.helpers import JS, map_marker_img
 
+from ooa.maps import OOAParameterMap
 from wals3.adapters import GeoJsonLects
 
 
-class FeatureMap(ParameterMap):
+class FeatureMap(OOAParameterMap):
     def get_options(self):
-        return {
-            'icon_size': 20,
-            'max_zoom': 9,
-            'worldCopyJump': True,
-            'on_init': JS('wals_parameter_map_on_init'),
-            'info_query': {'parameter': self.ctx.pk}}
+        return dict(
+            super(FeatureMap, self).get_options(), on_init=JS('wals_parameter_map_on_init'))
 
 
 class WalsMap(Map):
@@ -24,6 +24,10 @@ from clld.db.models.common import (
     UnitDomainElement
 )
 from wals3 import interfaces as wals_interfaces
+# The OOA models are shared with ooaclld.
+from ooa.models import (  # noqa: F401
+    OOALanguage, OOAParameter, OOACode, OOAFeatureSet, OOAUnit, OOAUnitReference,
+)
 
 
 ValueSet.wp_slug = property(lambda self: 'datapoint-%s-wals_code_%s' % (
@@ -65,21 +69,6 @@ class Area(Base, IdNameDescriptionMixin):
 # ----------------------------------------------------------------------------
 # specialized common mapper classes
 # ----------------------------------------------------------------------------
-@implementer(interfaces.ILanguage)
-class OOALanguage(CustomModelMixin, Language):
-    pk = Column(Unicode, ForeignKey('language.pk'), primary_key=True)
-    glottocode = Column(Unicode)
-    macroarea = Column(Unicode)
-    iso = Column(Unicode)
-    family_id = Column(Unicode)
-    language_id = Column(Unicode)
-    family_name = Column(Unicode)
-    balanced = Column(Unicode)
-    isolates = Column(Unicode)
-    american = Column(Unicode)
-    world = Column(Unicode)
-    north_america = Column(Unicode)
-    noun = Column(Unicode)
 
 
 # @implementer(interfaces.ILanguage)
@@ -122,20 +111,6 @@ class Chapter(CustomModelMixin, Contribution):
             yield 'dcterms:subject', self.area.dbpedia_url
 
 
-@implementer(interfaces.IParameter)
-class OOAParameter(CustomModelMixin, Parameter):
-
-    """TODO"""
-
-    #__table_args__ = (UniqueConstraint('contribution_pk', 'ordinal_qualifier'),)
-
-    pk = Column(Unicode, ForeignKey('parameter.pk'), primary_key=True)
-    #parameter_id = Column(Unicode)
-    feature_set = Column(Unicode) # Column(Integer, ForeignKey('featureset.pk'))
-    question = Column(Unicode)
-    datatype = Column(Unicode)
-    visualization = Column(Unicode)
-
 # TODO: Implement featuresets like this
 # @implementer(wals_interfaces.IFeatureset)
 # class OOAFeatureSet((Base,
@@ -152,13 +127,6 @@ class OOAParameter(CustomModelMixin, Parameter):
 # class ValueSet_files(Base, Versioned, FilesMixin):
 #     pass
 
-@implementer(wals_interfaces.IFeatureSet)
-class OOAFeatureSet(CustomModelMixin, UnitDomainElement):
-    pk = Column(Unicode, ForeignKey('unitdomainelement.pk'), primary_key=True)
-    domains = Column(Unicode)
-    authors = Column(Unicode)
-    contributors = Column(Unicode)
-    filename = Column(Unicode)
 # @implementer(interfaces.IParameter)
 # class Feature(CustomModelMixin, Parameter):
 #
@@ -176,15 +144,3 @@ class OOAFeatureSet(CustomModelMixin, UnitDomainElement):
 #     def __rdf__(self, request):
 #         if self.chapter.area.dbpedia_url:
 #             yield 'dcterms:subject', self.chapter.area.dbpedia_url
-
-@implementer(interfaces.IUnit)
-class OOAUnit(CustomModelMixin, Unit):
-    pk = Column(Unicode, ForeignKey('unit.pk'), primary_key=True)
-
-    language_id = Column(Unicode, ForeignKey('language.pk'))
-    parameter_id = Column(Unicode, ForeignKey('parameter.pk'))
-    code_id = Column(Unicode)
-    value = Column(Unicode)
-    remark = Column(Unicode)
-    source = Column(Unicode, ForeignKey('source.pk'))
-    coder = Column(Unicode)
@@ -0,0 +1,260 @@
+"""Render the OOA resources into a directory of static files.
+
+Usage::
+
+    python -m wals3.scripts.snapshot development.ini site --base-url https://ooa.example.org
+
+Every resource of `RESOURCES` is rendered with the app - its HTML page and all its alternate
+representations - and written to a file named after the path of its URL, e.g.
+``ooalanguages/abcd1234/index.html`` and ``ooalanguages/abcd1234.json``, so a web server
+can serve the snapshot without the app. Each file gets a gzip - and, with the `brotli`
+package installed, a brotli - compressed sibling, for servers which serve precompressed
+files.
+
+Rendering runs in a pool of worker processes, each with its own instance of the app. Files
+are only rewritten if their content changed. ``manifest.json`` lists the SHA-1 of all
+files, the files changed and removed since the last run, and the paths which were not
+rendered, i.e. redirects and errors. A run rendering only some of the resources keeps the
+files and entries of the others.
+"""
+import os
+import sys
+import gzip
+import json
+import hashlib
+import pathlib
+import argparse
+import tempfile
+import multiprocessing
+import concurrent.futures
+
+from pyramid.paster import get_appsettings
+from pyramid.request import Request
+from pyramid.scripting import prepare
+from clld import RESOURCES as CLLD_RESOURCES
+from clld.db.meta import DBSession
+from clld.interfaces import IRepresentation
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+__all__ = ['Snapshot', 'RESOURCES']
+
+#: Names of the resources which are rendered, as registered in `wals3.main`.
+RESOURCES = ['ooalanguage', 'ooafeature', 'ooacodes', 'ooaunit', 'ooafeaturesets']
+MANIFEST = 'manifest.json'
+#: Smaller files are not compressed.
+MIN_COMPRESS_SIZE = 256
+
+# The app and snapshot of a worker process, see `_init_worker`.
+_worker = None
+
+
+def filename(path):
+    """The relative file name for a URL path.
+
+    >>> filename('/ooalanguages/abcd1234')
+    'ooalanguages/abcd1234/index.html'
+    """
+    path = path.strip('/')
+    if not path or '.' not in path.split('/')[-1]:
+        return '/'.join([path, 'index.html']).lstrip('/')
+    return path
+
+
+def canonical(response):
+    """The body of a response, with the statements of N-Triples sorted.
+
+    rdflib writes N-Triples in hash order, which differs between processes, so unchanged
+    resources would show up as changed files.
+    """
+    if response.content_type == 'text/nt':
+        return b''.join(sorted(response.body.splitlines(True)))
+    return response.body
+
+
+def _write(path, data):
+    # Written to a temporary file first, so the web server never serves partial files.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=str(path.parent))
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, str(path))
+
+
+class Snapshot(object):
+
+    """Render the resources of an app into `directory`.
+
+    :param base_url: The URL the snapshot is served from, used for links in the pages.
+    """
+
+    def __init__(self, directory, base_url='http://localhost', resources=None):
+        self.directory = pathlib.Path(directory)
+        self.base_url = base_url.rstrip('/')
+        self.resources = resources or RESOURCES
+
+    def prefixes(self):
+        """File names of the resources rendered in this run start with one of these."""
+        return tuple(
+            '{0}/'.format(rsc.plural) for rsc in CLLD_RESOURCES if rsc.name in self.resources)
+
+    def paths(self, app):
+        """URL paths of all resources and their alternate representations."""
+        env = prepare(registry=app.registry)
+        req = env['request']
+        try:
+            for name in self.resources:
+                rsc = [r for r in CLLD_RESOURCES if r.name == name][0]
+                extensions = sorted(set(
+                    getattr(adapter, 'extension', None) for _, adapter in
+                    app.registry.adapters.lookupAll([rsc.interface], IRepresentation)
+                ) - {None, 'html'})
+                for id_, in DBSession.query(rsc.model.id).order_by(rsc.model.pk):
+                    yield req.resource_path(id_, rsc=rsc)
+                    for ext in extensions:
+                        yield req.resource_path(id_, rsc=rsc, ext=ext)
+        finally:
+            env['closer']()
+
+    def write(self, name, body):
+        """Write a file and its compressed siblings, unless it is unchanged.
+
+        :return: SHA-1 of the content.
+        """
+        digest = hashlib.sha1(body).hexdigest()
+        path = self.directory / name
+        if path.exists() and hashlib.sha1(path.read_bytes()).hexdigest() == digest:
+            return digest
+        _write(path, body)
+        siblings = {}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            # With a fixed mtime, unchanged content results in identical gzip files.
+            siblings['.gz'] = gzip.compress(body, 9, mtime=0)
+            if brotli:
+                siblings['.br'] = brotli.compress(body)
+        for suffix in ['.gz', '.br']:
+            sibling = path.parent / (path.name + suffix)
+            if suffix in siblings:
+                _write(sibling, siblings[suffix])
+            elif sibling.exists():
+                sibling.unlink()
+        return digest
+
+    def render(self, app, paths):
+        """Render and write the resources at `paths`.
+
+        :return: `list` of triples (path, HTTP status, SHA-1 of the file or redirect location)
+        """
+        res = []
+        for path in paths:
+            response = Request.blank(path, base_url=self.base_url).get_response(app)
+            if response.status_int == 200:
+                res.append((path, 200, self.write(filename(path), canonical(response))))
+            else:
+                res.append((path, response.status_int, response.location))
+        DBSession.remove()
+        return res
+
+    def run(self, app, processes=1, config_uri=None, settings=None, chunksize=100):
+        """Render all resources.
+
+        :param processes: Number of worker processes. With `processes > 1` the workers\
+        create their app from `config_uri`, with `settings` overriding the settings in it.
+        :return: The manifest.
+        """
+        paths = list(self.paths(app))
+        chunks = [paths[i:i + chunksize] for i in range(0, len(paths), chunksize)]
+        if processes > 1:
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=processes,
+                    initializer=_init_worker,
+                    initargs=(config_uri, settings or {}, self)) as executor:
+                results = [r for rs in executor.map(_render, chunks) for r in rs]
+        else:
+            results = [r for chunk in chunks for r in self.render(app, chunk)]
+        return self.update_manifest(results)
+
+    def update_manifest(self, results):
+        """Write the manifest, comparing the files with those of the last run, and remove
+        files of resources which are gone.
+
+        Only files of the resources rendered in this run can be gone, entries for the other
+        resources are kept.
+        """
+        manifest_path = self.directory / MANIFEST
+        prefixes = self.prefixes()
+        last = {'files': {}, 'redirects': {}, 'errors': {}}
+        if manifest_path.exists():
+            last = json.loads(manifest_path.read_text(encoding='utf8'))
+        old = {k: v for k, v in last['files'].items() if k.startswith(prefixes)}
+        files, redirects, errors = [
+            {k: v for k, v in last[key].items() if not k.lstrip('/').startswith(prefixes)}
+            for key in ['files', 'redirects', 'errors']]
+        for path, status, value in results:
+            if status == 200:
+                files[filename(path)] = value
+            elif 300 <= status < 400:
+                redirects[path] = value
+            else:
+                errors[path] = status
+        removed = sorted(set(old) - set(files))
+        for name in removed:
+            for suffix in ['', '.gz', '.br']:
+                p = self.directory / (name + suffix)
+                if p.exists():
+                    p.unlink()
+        manifest = {
+            'files': files,
+            'changed': sorted(
+                name for name, digest in files.items()
+                if name.startswith(prefixes) and old.get(name) != digest),
+            'removed': removed,
+            'redirects': redirects,
+            'errors': errors,
+        }
+        _write(manifest_path, json.dumps(manifest, indent=1, sort_keys=True).encode('utf8'))
+        return manifest
+
+
+def _app(config_uri, settings):
+    from wals3 import main
+
+    s = get_appsettings(config_uri)
+    s.update(settings)
+    return main({}, **s)
+
+
+def _init_worker(config_uri, settings, snapshot):
+    global _worker
+    # A session inherited from the parent process must not be used.
+    DBSession.remove()
+    _worker = (_app(config_uri, settings), snapshot)
+
+
+def _render(paths):
+    app, snapshot = _worker
+    return snapshot.render(app, paths)
+
+
+def main(args=None):  # pragma: no cover
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('config_uri', help='path of the ini file of the app')
+    parser.add_argument('directory', help='directory to write the snapshot to')
+    parser.add_argument('--base-url', default='http://localhost')
+    parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument(
+        '--resource', action='append', choices=RESOURCES, help='render only these resources')
+    args = parser.parse_args(args)
+
+    snapshot = Snapshot(args.directory, base_url=args.base_url, resources=args.resource)
+    manifest = snapshot.run(
+        _app(args.config_uri, {}), processes=args.processes, config_uri=args.config_uri)
+    print('{0} files, {1} changed, {2} removed, {3} redirects, {4} errors'.format(
+        *[len(manifest[k]) for k in ['files', 'changed', 'removed', 'redirects', 'errors']]))
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main())
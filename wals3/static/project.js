@@ -14,3 +14,101 @@ WALS3.formatLanguoid = function (obj) {
     }
     return '<' + tag + '>' + obj.text + '</' + tag + '>';
 }
+
+// The map of all languages loads the languages - clustered on the server - for the visible
+// tiles only, whenever the map is moved - see ooa/tiles.py.
+WALS3.languageTiles = function (url, icon) {
+    return function (map) {
+        var layer = L.layerGroup().addTo(map.map),
+            loaded = {},
+            zoom;
+
+        function marker(feature) {
+            var latlng = L.latLng(feature.geometry.coordinates[1], feature.geometry.coordinates[0]),
+                count = feature.properties.count,
+                m;
+            if (count > 1) {
+                m = L.marker(latlng, {icon: L.divIcon({
+                    className: 'wals3-cluster',
+                    html: '<span>' + count + '</span>',
+                    iconSize: [30, 30]})});
+                m.bindTooltip(count + ' languages');
+                m.on('click', function () {
+                    map.map.setView(latlng, map.map.getZoom() + 2);
+                });
+            } else {
+                m = L.marker(latlng, {
+                    icon: CLLD.MapIcons.base(feature, map.options.icon_size, icon)});
+                m.feature = feature;
+                m.bindTooltip(feature.properties.language.name);
+                m.on('click', function () {
+                    map.showInfoWindow(m);
+                });
+            }
+            return m;
+        }
+
+        function add(data) {
+            if (data.properties.z === zoom) {
+                $.each(data.features, function (_, feature) {
+                    layer.addLayer(marker(feature));
+                });
+            }
+        }
+
+        function update() {
+            var bounds = map.map.getPixelBounds(),
+                min = bounds.min.divideBy(256).floor(),
+                max = bounds.max.divideBy(256).floor(),
+                n, x, y, tx, key;
+            if (map.map.getZoom() !== zoom) {
+                zoom = map.map.getZoom();
+                layer.clearLayers();
+                loaded = {};
+            }
+            n = Math.pow(2, zoom);
+            for (x = min.x; x <= max.x; x++) {
+                // Tiles left or right of the world are wrapped around.
+                tx = ((x % n) + n) % n;
+                for (y = Math.max(min.y, 0); y <= Math.min(max.y, n - 1); y++) {
+                    key = tx + '/' + y;
+                    if (!loaded[key]) {
+                        loaded[key] = true;
+                        $.getJSON(
+                            url.replace('__z__', zoom).replace('__x__', tx).replace('__y__', y),
+                            add);
+                    }
+                }
+            }
+        }
+
+        map.map.on('moveend', update);
+        update();
+    };
+};
+
+// The GeoJSON of the maps may list the marker icons once, on the FeatureCollection, rather
+// than repeating them for each feature: The parameter maps set the icon of a layer - see
+// ooa/maplayers.py - and other maps an icon table, referenced by key from the features -
+// see wals3.util.IconTable.
+(function () {
+    var addData = L.GeoJSON.prototype.addData;
+
+    L.GeoJSON.include({
+        addData: function (geojson) {
+            var properties = geojson.properties === undefined ? {} : geojson.properties;
+            if (geojson.type === 'FeatureCollection') {
+                $.each(geojson.features, function (_, feature) {
+                    if (properties.icons !== undefined) {
+                        if (properties.icons[feature.properties.icon] !== undefined) {
+                            feature.properties.icon = properties.icons[feature.properties.icon];
+                        }
+                    } else if (feature.properties.icon === undefined) {
+                        feature.properties.icon = properties.icon;
+                    }
+                });
+            }
+            return addData.call(this, geojson);
+        }
+    });
+})();
@@ -2,10 +2,37 @@
 <%namespace name="util" file="../util.mako"/>
 <%! active_menu_item = "codes" %>
 <%block name="title">Codes</%block>
-${type(ctx)}
-<h2>Features</h2>
+
+<h2>Codes</h2>
 <p>
     Those are the OOA Codes
+    - <a href="${request.route_url('codes_alt')}">JSON</a>
 </p>
 <div class="clearfix"> </div>
-${codes}
+
+<table class="table table-condensed table-nonfluid">
+    <thead>
+        <tr><th>Code</th><th>Feature</th><th>Description</th></tr>
+    </thead>
+    <tbody>
+        % for code in ctx.items():
+        <tr>
+            <td>${code.id}</td>
+            <td><a href="${request.route_url('parameter', id=code.parameter)}">${code.parameter}</a></td>
+            <td>${code.description or code.name or ''}</td>
+        </tr>
+        % endfor
+    </tbody>
+</table>
+
+% if ctx.pages > 1:
+<ul class="pager">
+    % if ctx.page > 1:
+    <li class="previous"><a href="${request.route_url('codes', _query={'page': ctx.page - 1})}">&larr; Previous</a></li>
+    % endif
+    <li>Page ${ctx.page} of ${ctx.pages}</li>
+    % if ctx.page < ctx.pages:
+    <li class="next"><a href="${request.route_url('codes', _query={'page': ctx.page + 1})}">Next &rarr;</a></li>
+    % endif
+</ul>
+% endif
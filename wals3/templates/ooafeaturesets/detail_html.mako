@@ -0,0 +1,33 @@
+<%inherit file="../${context.get('request').registry.settings.get('clld.app_template', 'app.mako')}"/>
+<%namespace name="util" file="../util.mako"/>
+<%! active_menu_item = "featuresets" %>
+<%block name="title">Feature set ${ctx.name}</%block>
+
+<h2>Feature set ${ctx.id}: ${ctx.name}</h2>
+
+<div>${h.alt_representations(req, ctx, doc_position='right')|n}</div>
+
+${util.dl_table(
+    ('Domains', ctx.domains or ''),
+    ('Authors', ctx.authors or ''),
+    ('Contributors', ctx.contributors or ''),
+    ('Languages', ctx.representation or 0))}
+
+<table class="table table-condensed">
+    <thead>
+        <tr>
+            <th>Feature</th>
+            <th>Question</th>
+            <th class="right">Languages</th>
+        </tr>
+    </thead>
+    <tbody>
+        % for feature in features:
+        <tr>
+            <td>${h.link(request, feature, label=feature.id)}</td>
+            <td>${feature.question}</td>
+            <td class="right">${feature.representation or 0}</td>
+        </tr>
+        % endfor
+    </tbody>
+</table>
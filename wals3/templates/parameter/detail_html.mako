@@ -1,6 +1,7 @@
 <%inherit file="../${context.get('request').registry.settings.get('clld.app_template', 'app.mako')}"/>
 <%namespace name="util" file="../util.mako"/>
 <%! active_menu_item = "parameters" %>
+<%! from wals3.models import OOAUnit %>
 <%block name="title">Feature ${ctx.id}: ${ctx.name}</%block>
 
 <%block name="head">
@@ -17,7 +18,7 @@
                     ${h.map_marker_img(req, de)}
                 </%util:iconselect>
                 <td>${de}</td>
-                <td class="right">${len(de.values)}</td>
+                <td class="right">${de.representation or 0}</td>
             </tr>
             % endfor
         </table>
@@ -29,23 +30,14 @@
 <div>${h.alt_representations(req, ctx, doc_position='right', exclude=['snippet.html'])|n}</div>
 
 <p>
-    This feature is described in the text of chapter ${ctx.chapter.id}
-    <a class="button btn" href="${request.resource_url(ctx.chapter)}">${ctx.chapter.name}</a>
-    by ${h.linked_contributors(request, ctx.chapter)}
-    ${h.cite_button(request, ctx.chapter)}
+    ${ctx.question}
 </p>
-<div>
-    <form action="${request.route_url('select_combination')}">
-        <fieldset>
-            <p>
-                You may combine this feature with another one. Start typing the
-                feature name or number in the field below.
-            </p>
-            ${select.render()}
-            <button class="btn" type="submit">Submit</button>
-        </fieldset>
-    </form>
-</div>
+% if ctx.feature_set:
+<p>
+    This feature belongs to the feature set
+    <a class="button btn" href="${request.route_url('ooafeaturesets', id=ctx.feature_set)}">${ctx.feature_set}</a>
+</p>
+% endif
 
 <br style="clear: right"/>
 
@@ -53,7 +45,7 @@
 ${request.map.render()}
 % endif
 
-${util.values_and_sentences()}
+${request.get_datatable('units', OOAUnit, parameter=ctx).render()}
 
 <%block name="javascript">
 wals_parameter_map_on_init = function (map) {
@@ -14,10 +14,10 @@
     <tbody>
         % for de in ctx.domain:
         <tr>
-            <% total += ctx.counts.get(de.pk, 0) if hasattr(ctx, 'counts') else len(de.values) %>
+            <% total += ctx.counts.get(de.pk, 0) if hasattr(ctx, 'counts') else de.representation or 0 %>
             <td>${h.map_marker_img(request, de)}</td>
             <td>${de.description or de.name}</td>
-            <td class="right">${ctx.counts.get(de.pk, 0) if hasattr(ctx, 'counts') else len(de.values)}</td>
+            <td class="right">${ctx.counts.get(de.pk, 0) if hasattr(ctx, 'counts') else de.representation or 0}</td>
         </tr>
         % endfor
         <tr>
@@ -16,6 +16,34 @@ from clld.web.icon import ICON_MAP
 
 import wals3
 from wals3.models import Genus, OOALanguage, OOAUnit, OOAParameter
+from ooa.util import (  # noqa: F401
+    data_version, bump_data_version, normalized_icon, icon_url, pie_url, with_icons,
+)
+
+
+class IconTable(object):
+
+    """The marker icons in the GeoJSON rendered for one request.
+
+    Features reference their icon by a short key, and each FeatureCollection lists the
+    icons it uses once, in its `icons` property - rather than repeating the data URL for
+    each feature.
+
+    >>> table = IconTable.for_request(req)
+    >>> feature['properties']['icon'] = table.key(map_marker(language, req))
+    """
+
+    def __init__(self):
+        self.keys = {}
+
+    @classmethod
+    def for_request(cls, req):
+        return req.environ.setdefault('wals3.icon_table', cls())
+
+    def key(self, url):
+        if url not in self.keys:
+            self.keys[url] = str(len(self.keys))
+        return self.keys[url]
 
 
 class LanguoidSelect(MultiSelect):
@@ -109,6 +137,13 @@ def parameter_detail_html(context=None, request=None, **kw):
     return {'ctx': context, 'request': request}
 
 
+def ooafeaturesets_detail_html(context=None, request=None, **kw):
+    return {'features': DBSession.query(OOAParameter)
+            .filter(OOAParameter.feature_set == context.id)
+            .order_by(OOAParameter.id)
+            .all()}
+
+
 def parameter_detail_georss(context=None, request=None, **kw):
     return dict(datapoints=_valuesets(context))
 
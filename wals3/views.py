@@ -1,5 +1,6 @@
 from sqlalchemy.orm import joinedload
 from pyramid.view import view_config
+from pyramid.response import Response
 from pyramid.httpexceptions import HTTPFound, HTTPNotFound
 
 from clld.db.meta import DBSession
@@ -195,4 +196,17 @@ from wals3.util import LanguoidSelect
 @view_config(route_name='featuresets', renderer=r'json')
 def featuresets(ctx, req):
     table = req.get_datatable('featuresets', OOAFeatureSet)
-    return {'ctx': ctx, 'table': table}
\ No newline at end of file
+    return {'ctx': ctx, 'table': table}
+
+
+@view_config(route_name='codes', renderer='codes/index_html.mako')
+def codes(ctx, req):
+    """A page of the list of all codes, see `wals3.contexts.Codes`."""
+    return {'ctx': ctx}
+
+
+@view_config(route_name='codes_alt')
+def codes_json(ctx, req):
+    """All codes as JSON, streamed in chunks of rows."""
+    return Response(
+        app_iter=ctx.iter_json(), content_type='application/json', charset='utf-8')
@@ -18,9 +18,9 @@ from clld.web.icon import Icon
 from clld.web.app import CtxFactoryQuery
 from clld.db.models.common import Contribution, ContributionReference, Parameter, Language, Source, DomainElement
 
-from wals3.adapters import Matrix
 from wals3.models import Family, Country, Genus, OOALanguage, OOAParameter, OOAValue
 from wals3.interfaces import IFamily, ICountry, IGenus
+from ooa.adapters import Matrix
 
 COLORS = [
     '00d', '000', '6f3', '9ff', '090', '99f', '909', 'a00', 'ccc', 'd00', 'f6f', 'f40', 'f60',